@@ -16,7 +16,7 @@ def read(filename):
         return f.read()
 
 
-test_deps = ['pytest']
+test_deps = ['numpy', 'pytest']
 install_deps = [
     'click',
     'monotonic;python_version<"3.3"',
@@ -52,7 +52,10 @@ setup(
     packages=find_packages(),
     install_requires=install_deps,
     tests_require=test_deps,
-    extras_require={'test': test_deps},
+    extras_require={
+        'test': test_deps,
+        'numpy': ['numpy'],
+    },
     setup_requires=['pytest-runner'],
     entry_points={
         'console_scripts': [
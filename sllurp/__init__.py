@@ -6,5 +6,5 @@ from pkg_resources import get_distribution
 
 
 __all__ = ('llrp', 'llrp_decoder', 'llrp_errors', 'llrp_proto', 'util',
-           'inventory')
+           'inventory', 'fleet', 'handoff', 'stream', 'tuning')
 __version__ = get_distribution('sllurp').version
@@ -4,6 +4,7 @@
 from __future__ import print_function, unicode_literals
 from collections import namedtuple
 import logging
+import os
 import click
 from . import __version__
 from . import log as loggie
@@ -11,6 +12,7 @@ from .verb import reset as _reset
 from .verb import inventory as _inventory
 from .verb import log as _log
 from .verb import access as _access
+from .verb import tune_mode as _tune_mode
 from .llrp_proto import Modulation_Name2Type
 
 # Disable Click unicode warning since we use unicode string exclusively
@@ -61,12 +63,23 @@ def cli(debug, logfile):
 @click.option('--impinj-fixed-freq', is_flag=True, default=False,
               help='Fix operating frequency (dependent '
               'on operating region if possible)')
+@click.option('--impinj-tune-channels', is_flag=True, default=False,
+              help='Impinj extension: choose fixed-frequency channels '
+              'by read yield (regions without hopping only)')
+@click.option('--gpi-trigger', type=int,
+              help='inventory only while this GPI is high (with -t, for at '
+              'most that many seconds each time)')
+@click.option('--period', type=float,
+              help='inventory for -t seconds every PERIOD seconds')
 def inventory(host, port, time, report_every_n_tags, antennas, tx_power,
               tari, session, mode_identifier,
               tag_population, reconnect, tag_filter_mask,
               impinj_extended_configuration,
-              impinj_search_mode, impinj_reports, impinj_fixed_freq):
+              impinj_search_mode, impinj_reports, impinj_fixed_freq,
+              impinj_tune_channels, gpi_trigger, period):
     """Conduct inventory (searching the area around the antennas)."""
+    if period is not None and (not time or gpi_trigger is not None):
+        raise click.UsageError('--period needs -t and no --gpi-trigger')
     # XXX band-aid hack to provide many args to _inventory.main
     Args = namedtuple('Args', ['host', 'port', 'time', 'every_n', 'antennas',
                                'tx_power', 'tari', 'session',
@@ -75,7 +88,9 @@ def inventory(host, port, time, report_every_n_tags, antennas, tx_power,
                                'impinj_extended_configuration',
                                'impinj_search_mode',
                                'impinj_reports',
-                               'impinj_fixed_freq'])
+                               'impinj_fixed_freq',
+                               'impinj_tune_channels', 'gpi_trigger',
+                               'period'])
     args = Args(host=host, port=port, time=time, every_n=report_every_n_tags,
                 antennas=antennas, tx_power=tx_power,
                 tari=tari, session=session, population=tag_population,
@@ -84,7 +99,9 @@ def inventory(host, port, time, report_every_n_tags, antennas, tx_power,
                 impinj_extended_configuration=impinj_extended_configuration,
                 impinj_search_mode=impinj_search_mode,
                 impinj_reports=impinj_reports,
-                impinj_fixed_freq=impinj_fixed_freq)
+                impinj_fixed_freq=impinj_fixed_freq,
+                impinj_tune_channels=impinj_tune_channels,
+                gpi_trigger=gpi_trigger, period=period)
     logger.debug('inventory args: %s', args)
     _inventory.main(args)
 
@@ -145,6 +162,44 @@ def access(host, port, time, report_every_n_tags, tx_power, tari,
     _access.main(args)
 
 
+@cli.command('tune-mode')
+@click.argument('host', type=str, nargs=-1)
+@click.option('-p', '--port', type=int, default=5084)
+@click.option('-t', '--time', type=float, default=10.0,
+              help='seconds to inventory with each mode (default 10)')
+@click.option('--settle', type=float, default=2.0,
+              help='seconds to wait after changing modes (default 2)')
+@click.option('-m', '--modes', type=str,
+              help='comma-separated list of ModeIdentifiers to try'
+                   ' (default all)')
+@click.option('-a', '--antennas', type=str, default='1',
+              help='comma-separated list of antennas to use (0=all;'
+                   ' default 1)')
+@click.option('-s', '--session', type=int, default=1,
+              help='Gen2 session (default 1)')
+@click.option('-P', '--tag-population', type=int, default=4,
+              help='Tag Population value (default 4)')
+@click.option('-c', '--cache', type=click.Path(),
+              default=os.path.join('~', '.cache', 'sllurp', 'modes.json'),
+              help='file of cached results (default'
+                   ' ~/.cache/sllurp/modes.json)')
+@click.option('-f', '--force', is_flag=True, default=False,
+              help='benchmark even if results are cached')
+def tune_mode(host, port, time, settle, modes, antennas, session,
+              tag_population, cache, force):
+    """Find and select the RF mode that reads the most tags."""
+    Args = namedtuple('Args', ['host', 'port', 'time', 'settle', 'modes',
+                               'antennas', 'session', 'population', 'cache',
+                               'force'])
+    args = Args(host=host, port=port, time=time, settle=settle, modes=modes,
+                antennas=antennas, session=session,
+                population=tag_population,
+                cache=os.path.expanduser(cache) if cache else None,
+                force=force)
+    logger.debug('tune-mode args: %s', args)
+    _tune_mode.main(args)
+
+
 @cli.command()
 def version():
     print(__version__)
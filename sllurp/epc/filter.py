@@ -0,0 +1,167 @@
+'''
+Client-side EPC filtering against large allow and deny lists.
+
+An EPCFilter is compiled once from lists of EPCs and EPC prefixes (hex
+strings) and passed to LLRPClientFactory as epc_filter.  Tag reports are
+then checked while they are decoded, on the EPC's raw bytes, so that tags
+the filter rejects are never turned into dictionaries.
+
+Exact EPCs are kept in a set.  Prefixes are kept sorted, with prefixes that
+are covered by shorter ones dropped, so that the only prefix that can match
+an EPC is the greatest one not above it, found by bisection.  For large
+lists, a Bloom filter can be put in front of the set: the set still decides,
+but most EPCs that are not in it are turned away by the Bloom filter's small
+bit array without touching the set.
+'''
+
+from __future__ import division, unicode_literals
+from binascii import unhexlify
+from bisect import bisect_right
+import math
+
+
+def _epc_bytes(epc):
+    if isinstance(epc, bytearray):
+        return bytes(epc)
+    if not isinstance(epc, bytes):
+        epc = epc.encode('ascii')
+    return unhexlify(epc)
+
+
+def _prefix_bytes(prefixes):
+    '''Convert hex prefixes to byte strings.
+
+    A prefix with an odd number of hex digits becomes the 16 byte strings
+    that share its digits.
+    '''
+    for prefix in prefixes:
+        if isinstance(prefix, (bytes, bytearray)):
+            prefix = prefix.decode('ascii')
+        prefix = prefix.lower()
+        if len(prefix) % 2:
+            for digit in '0123456789abcdef':
+                yield unhexlify(prefix + digit)
+        else:
+            yield unhexlify(prefix)
+
+
+class BloomFilter(object):
+    '''A set of byte strings with false positives at about error_rate.'''
+
+    def __init__(self, items, error_rate=0.001):
+        items = list(items)
+        n = max(len(items), 1)
+        self.num_bits = max(8, int(-n * math.log(error_rate) /
+                                   math.log(2) ** 2))
+        self.num_hashes = max(1, int(round(self.num_bits / n * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        for item in items:
+            self.add(item)
+
+    def _positions(self, item):
+        # double hashing: the i-th position is h1 + i * h2
+        h1 = hash(item)
+        h2 = hash(item + b'\x00') | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, item):
+        bits = self.bits
+        for pos in self._positions(item):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        bits = self.bits
+        for pos in self._positions(item):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class BloomFrontedSet(object):
+    '''A frozenset of byte strings checked against a Bloom filter first.'''
+
+    def __init__(self, items, error_rate=0.001):
+        self.items = frozenset(items)
+        self.bloom = BloomFilter(self.items, error_rate)
+
+    def __contains__(self, item):
+        return item in self.bloom and item in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+
+class PrefixSet(object):
+    '''A set of byte string prefixes matched by bisection.'''
+
+    def __init__(self, prefixes):
+        kept = []
+        for prefix in sorted(set(prefixes)):
+            # sorted order puts a prefix right before the strings it covers
+            if kept and prefix.startswith(kept[-1]):
+                continue
+            kept.append(prefix)
+        self.prefixes = kept
+
+    def match(self, epc):
+        i = bisect_right(self.prefixes, epc)
+        return i > 0 and epc.startswith(self.prefixes[i - 1])
+
+    def __len__(self):
+        return len(self.prefixes)
+
+
+class EPCFilter(object):
+    '''Allow and deny lists of EPCs and EPC prefixes.
+
+    A tag passes if it matches nothing in the deny lists and, when there are
+    allow lists, something in them.  EPCs and prefixes are hex strings; a
+    prefix may have an odd number of digits.  If bloom_error_rate is set,
+    the exact EPC lists are fronted by Bloom filters with that false
+    positive rate; the sets behind them keep the result exact.
+
+    num_accepted and num_rejected count the tags checked.
+    '''
+
+    def __init__(self, allow=None, deny=None, allow_prefixes=None,
+                 deny_prefixes=None, bloom_error_rate=None):
+        self.allow = self._compile(allow, bloom_error_rate)
+        self.deny = self._compile(deny, bloom_error_rate)
+        self.allow_prefixes = PrefixSet(_prefix_bytes(allow_prefixes)) \
+            if allow_prefixes else None
+        self.deny_prefixes = PrefixSet(_prefix_bytes(deny_prefixes)) \
+            if deny_prefixes else None
+        self.num_accepted = 0
+        self.num_rejected = 0
+
+    @staticmethod
+    def _compile(epcs, bloom_error_rate):
+        if not epcs:
+            return None
+        epcs = (_epc_bytes(epc) for epc in epcs)
+        if bloom_error_rate:
+            return BloomFrontedSet(epcs, bloom_error_rate)
+        return frozenset(epcs)
+
+    def accepts(self, epc):
+        '''Check an EPC given as raw bytes, and count the result.'''
+        if (self.deny is not None and epc in self.deny) or \
+                (self.deny_prefixes is not None and
+                 self.deny_prefixes.match(epc)):
+            self.num_rejected += 1
+            return False
+        if self.allow is None and self.allow_prefixes is None:
+            self.num_accepted += 1
+            return True
+        if (self.allow is not None and epc in self.allow) or \
+                (self.allow_prefixes is not None and
+                 self.allow_prefixes.match(epc)):
+            self.num_accepted += 1
+            return True
+        self.num_rejected += 1
+        return False
+
+    def __call__(self, epc):
+        '''Check an EPC given as a hex string.'''
+        return self.accepts(_epc_bytes(epc))
@@ -0,0 +1,171 @@
+'''
+Compile sets of EPCs into the few masks a reader can filter on.
+
+Readers select tags at the air interface with C1G2Filter masks, but only a
+handful of them (MaxNumSelectFiltersPerQuery, often 2).  compile_masks()
+finds at most that many EPC prefixes that together cover every target EPC
+or prefix while matching as little else of the EPC space as possible.  The
+masks are a superset of the targets; pair them with an EPCFilter to drop
+the few other tags they let through.
+
+Masks are hex strings, as in tag_filter_mask.  A mask whose length in bits
+is not a multiple of 4 is written 'hex/bits', like '3034257bf4/37': the
+first 37 bits of 0x3034257bf4 followed by three ignored zero bits.
+'''
+
+from __future__ import division, unicode_literals
+
+EPC_BITS = 96
+
+
+def parse_mask(mask):
+    '''Return the bits of a hex or 'hex/bits' mask as a string of 0s and 1s.
+
+    >>> parse_mask('3f/6')
+    '001111'
+    '''
+    if isinstance(mask, bytes):
+        mask = mask.decode('ascii')
+    if '/' in mask:
+        digits, bits = mask.split('/', 1)
+        bits = int(bits)
+    else:
+        digits, bits = mask, len(mask) * 4
+    if bits > len(digits) * 4:
+        raise ValueError('mask {} is too short for {} bits'.format(
+            mask, bits))
+    if not digits:
+        return ''
+    return '{:0{}b}'.format(int(digits, 16), len(digits) * 4)[:bits]
+
+
+def format_mask(bits):
+    '''Write a string of 0s and 1s as a hex or 'hex/bits' mask.
+
+    >>> format_mask('001111')
+    '3c/6'
+    '''
+    padded = bits + '0' * (-len(bits) % 4)
+    digits = '{:0{}x}'.format(int(padded, 2), len(padded) // 4) \
+        if padded else ''
+    if len(bits) % 4:
+        return '{}/{}'.format(digits, len(bits))
+    return digits
+
+
+def range_masks(low, high, bits, prefix=''):
+    '''Return the fewest masks that match exactly the values low..high.
+
+    The values are `bits`-bit fields following the bits in `prefix` (a
+    string of 0s and 1s).  Each mask is returned as a string of 0s and 1s.
+
+    >>> range_masks(2, 5, 3)
+    ['01', '10']
+    '''
+    if not 0 <= low <= high < 1 << bits:
+        raise ValueError('invalid range {}..{} for {} bits'.format(
+                         low, high, bits))
+    masks = []
+    while low <= high:
+        # the largest aligned block that starts at low and fits
+        size = 0
+        while size < bits and low % (2 << size) == 0 and \
+                low + (2 << size) - 1 <= high:
+            size += 1
+        fixed = bits - size
+        masks.append(prefix + ('{:0{}b}'.format(low >> size, fixed)
+                               if fixed else ''))
+        low += 1 << size
+    return masks
+
+
+class _Node(object):
+    '''A node of a compressed binary trie of masks.
+
+    `bits` is the longest prefix shared by every target below the node; an
+    inner node has two children, split on the bit after it.  `cost[j]` is
+    the least EPC space that j masks can cover the node's targets with.
+    '''
+
+    def __init__(self, bits, children=()):
+        self.bits = bits
+        self.children = children
+
+
+def _build(targets, depth=0):
+    '''Build the trie of sorted targets, none of which prefixes another.'''
+    first, last = targets[0], targets[-1]
+    if len(targets) == 1:
+        return _Node(first)
+    common = depth
+    while first[common] == last[common]:
+        common += 1
+    split = next(i for i, target in enumerate(targets)
+                 if target[common] == '1')
+    return _Node(first[:common], (_build(targets[:split], common + 1),
+                                  _build(targets[split:], common + 1)))
+
+
+def _solve(node, max_masks, width):
+    '''Fill in node.cost, from the leaves up.'''
+    single = 1 << (width - len(node.bits))
+    if not node.children:
+        node.cost = [None, single]
+        return
+    zero, one = node.children
+    _solve(zero, max_masks, width)
+    _solve(one, max_masks, width)
+    most = min(max_masks, len(zero.cost) - 1 + len(one.cost) - 1)
+    cost = [None, single]
+    for j in range(2, most + 1):
+        best = cost[j - 1]
+        for j0 in range(max(1, j - len(one.cost) + 1),
+                        min(j - 1, len(zero.cost) - 1) + 1):
+            best = min(best, zero.cost[j0] + one.cost[j - j0])
+        cost.append(best)
+    node.cost = cost
+
+
+def _masks(node, budget):
+    '''Return the masks that reach node.cost[budget] with fewest masks.'''
+    budget = min(budget, len(node.cost) - 1)
+    while budget > 1 and node.cost[budget - 1] == node.cost[budget]:
+        budget -= 1
+    if budget == 1:
+        return [node.bits]
+    zero, one = node.children
+    for j0 in range(1, budget):
+        j1 = budget - j0
+        if j0 < len(zero.cost) and j1 < len(one.cost) and \
+                zero.cost[j0] + one.cost[j1] == node.cost[budget]:
+            return _masks(zero, j0) + _masks(one, j1)
+    raise AssertionError('no split reaches the cost')
+
+
+def compile_masks(targets, max_masks=1, width=EPC_BITS):
+    '''Cover target EPCs and prefixes with at most max_masks masks.
+
+    `targets` are hex or 'hex/bits' strings.  Of the ways to cover them
+    all, the masks returned match the least of the `width`-bit EPC space,
+    and are as few as possible for that.
+
+    >>> compile_masks(['3034257bf4000001', '3034257bf4000002',
+    ...                '3034257bf7000000'], max_masks=2, width=64)
+    ['3034257bf4000000/62', '3034257bf7000000']
+    '''
+    if max_masks < 1:
+        raise ValueError('need at least one mask')
+    kept = []
+    for target in sorted(set(parse_mask(t) for t in targets)):
+        # sorted order puts a prefix right before the masks it covers
+        if kept and target.startswith(kept[-1]):
+            continue
+        if len(target) > width:
+            raise ValueError('mask {} is longer than {} bits'.format(
+                             format_mask(target), width))
+        kept.append(target)
+    if not kept:
+        return []
+    root = _build(kept)
+    _solve(root, max_masks, width)
+    return [format_mask(bits) for bits in _masks(root, max_masks)]
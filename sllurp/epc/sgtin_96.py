@@ -10,6 +10,8 @@ http://www.gs1.org/sites/default/files/docs/tds/TDS_1_9_Standard.pdf
 
 '''
 
+from .mask import format_mask, range_masks
+
 '''
 Table defining partition sizes for SGTIN-96
 '''
@@ -78,3 +80,32 @@ def parse_sgtin_96_to_uri(sgtin_96):
     uri_template = ("urn:epc:id:sgtin:{company_prefix}."
                     "{item_reference}.{serial}")
     return uri_template.format(**tag_dict)
+
+
+def sgtin_96_masks(company_prefix, first_item, last_item=None,
+                   filter_value=None):
+    '''Return masks ('hex/bits' strings) matching SGTIN-96 EPCs of a range
+    of item references of one company prefix.
+
+    company_prefix is the GS1 company prefix as a string of digits; its
+    length picks the partition.  Item references first_item..last_item
+    (integers; last_item defaults to first_item) are matched with any
+    serial number, and with any filter value unless filter_value is given.
+    Pass the masks to compile_masks() to fit them in a reader's filters.
+    '''
+    partitions = [p for p, (_, l, _, _) in SGTIN_96_PARTITION_MAP.items()
+                  if l == len(company_prefix)]
+    if not partitions:
+        raise Exception('No partition for a company prefix of that length.')
+    partition = partitions[0]
+    m, _, n, _ = SGTIN_96_PARTITION_MAP[partition]
+    if last_item is None:
+        last_item = first_item
+
+    filters = range(8) if filter_value is None else [filter_value]
+    masks = []
+    for tag_filter in filters:
+        prefix = '{:08b}{:03b}{:03b}{:0{}b}'.format(
+            0x30, tag_filter, partition, int(company_prefix), m)
+        masks.extend(range_masks(first_item, last_item, n, prefix))
+    return [format_mask(bits) for bits in masks]
@@ -0,0 +1,414 @@
+"""Manage connections to a large fleet of readers.
+
+Connecting to hundreds of readers at once (e.g., when a collector restarts)
+floods DNS, DHCP and switch CPUs with simultaneous handshakes.  FleetManager
+queues connection attempts so that only a bounded number are in flight and
+new attempts start at a steady pace, and it keeps an index of connected
+readers so that per-reader operations don't scan the whole fleet.
+
+In dense deployments, readers whose RF fields overlap drown each other out
+when they inventory at once.  SlotCoordinator has them take turns.
+"""
+
+from __future__ import division, unicode_literals
+from collections import defaultdict
+import itertools
+import logging
+from twisted.internet import reactor, defer, task
+
+from .llrp import LLRPClient, LLRPClientFactory, LLRP_PORT
+from .llrp_errors import LLRPError
+from .stream.tags import tag_epc, tag_reports
+from .util import monotonic
+
+logger = logging.getLogger(__name__)
+
+
+def parse_hostport(host, port=LLRP_PORT):
+    """Split an optional ':port' suffix off of a host name.
+
+    >>> parse_hostport('10.0.0.1:5085')
+    ('10.0.0.1', 5085)
+    >>> parse_hostport('10.0.0.1')
+    ('10.0.0.1', 5084)
+    """
+    if ':' in host:
+        host, port = host.split(':', 1)
+    return host, int(port)
+
+
+class FleetManager(LLRPClientFactory):
+    """LLRPClientFactory that connects to many readers without stampeding.
+
+    At most `max_concurrent_connects` connection attempts are in flight at any
+    time, and consecutive attempts start at least `connect_interval` seconds
+    apart.  Reconnections (if `reconnect` is set) go through the same queue,
+    with exponential backoff per reader.
+
+    Connected readers are available in `self.readers`, a dict that maps
+    (host, port) to LLRPClient.
+    """
+
+    def __init__(self, max_concurrent_connects=16, connect_interval=0.05,
+                 connect_timeout=3, **kwargs):
+        LLRPClientFactory.__init__(self, **kwargs)
+        self.connect_interval = connect_interval
+        self.connect_timeout = connect_timeout
+        self._semaphore = defer.DeferredSemaphore(max_concurrent_connects)
+        self._next_start = 0
+
+        # (host, port) -> LLRPClient
+        self.readers = {}
+
+        # (host, port) -> Deferred for the attempt in flight
+        self._pending = {}
+
+        # (host, port) queued or in flight
+        self._queued = set()
+
+        # (host, port) -> seconds to wait before the next reconnection
+        self._retry_delays = {}
+
+    def addReader(self, host, port=LLRP_PORT):
+        """Queue a connection to one reader.
+
+        Returns a Deferred that fires with the connected LLRPClient, or fails
+        if the connection attempt fails.
+        """
+        key = (host, port)
+        if key in self.readers or key in self._queued:
+            return defer.fail(LLRPError('already connected or connecting to '
+                                        '{}:{}'.format(host, port)))
+        return self._enqueue(host, port)
+
+    def connectAll(self, hosts, port=LLRP_PORT):
+        """Queue connections to a list of readers.
+
+        Each host may carry a ':port' suffix; otherwise `port` is used.
+        Returns a Deferred that fires when every attempt has settled, with a
+        dict mapping (host, port) to a (success, LLRPClient or Failure)
+        tuple.
+        """
+        keys = [parse_hostport(host, port) for host in hosts]
+        attempts = [self.addReader(h, p) for h, p in keys]
+        dl = defer.DeferredList(attempts, consumeErrors=True)
+        dl.addCallback(lambda results: dict(zip(keys, results)))
+        return dl
+
+    def getReader(self, host, port=LLRP_PORT):
+        """Return the connected LLRPClient for a reader, or None."""
+        return self.readers.get((host, port))
+
+    def getProtocolStates(self, readers=None):
+        """Return the state names of connected readers.
+
+        Unlike LLRPClientFactory.getProtocolStates(), which keys the result
+        by IP address, the dict maps (host, port) to a state name, so readers
+        that share a host are all listed.
+
+        @param readers: iterable of (host, port) keys; default all readers.
+            Readers that aren't connected are left out.
+        """
+        if readers is None:
+            readers = self.readers.keys()
+        states = {}
+        for key in readers:
+            proto = self.readers.get(key)
+            if proto is not None:
+                states[key] = LLRPClient.getStateName(proto.state)
+        return states
+
+    def _enqueue(self, host, port, connector=None):
+        self._queued.add((host, port))
+        d = self._semaphore.run(self._connect, host, port, connector)
+
+        def settled(result):
+            self._queued.discard((host, port))
+            return result
+        d.addBoth(settled)
+        return d
+
+    def _connect(self, host, port, connector):
+        """Start one connection attempt once its turn in the queue comes.
+
+        Runs while holding a slot of self._semaphore; the returned Deferred
+        fires (and releases the slot) when the attempt succeeds or fails.
+        """
+        now = monotonic()
+        delay = max(0, self._next_start - now)
+        self._next_start = now + delay + self.connect_interval
+
+        d = defer.Deferred()
+        self._pending[(host, port)] = d
+        if connector is None:
+            reactor.callLater(delay, reactor.connectTCP, host, port, self,
+                              timeout=self.connect_timeout)
+        else:
+            reactor.callLater(delay, connector.connect)
+        return d
+
+    def _failPending(self, connector, reason):
+        dst = connector.getDestination()
+        d = self._pending.pop((dst.host, dst.port), None)
+        if d is not None:
+            d.errback(reason)
+
+    def addProtocol(self, proto):
+        LLRPClientFactory.addProtocol(self, proto)
+        self.readers[proto.peername] = proto
+        self._retry_delays.pop(proto.peername, None)
+        d = self._pending.pop(proto.peername, None)
+        if d is not None:
+            d.callback(proto)
+
+    def removeProtocol(self, proto):
+        LLRPClientFactory.removeProtocol(self, proto)
+        if self.readers.get(proto.peername) is proto:
+            del self.readers[proto.peername]
+
+    def _retry(self, connector):
+        dst = connector.getDestination()
+        key = (dst.host, dst.port)
+        delay = self._retry_delays.get(key, self.initialDelay)
+        self._retry_delays[key] = min(delay * self.factor, self.maxDelay)
+        logger.info('will reconnect to %s:%d in %.1f seconds', dst.host,
+                    dst.port, delay)
+
+        def requeue():
+            if not self.continueTrying or key in self._queued:
+                return
+            d = self._enqueue(dst.host, dst.port, connector)
+            d.addErrback(lambda _: None)  # clientConnectionFailed retries
+        reactor.callLater(delay, requeue)
+
+    def _maybeFinish(self):
+        if self.protocols or self._queued:
+            return
+        if self.onFinish and not self.onFinish.called:
+            self.onFinish.callback(None)
+
+    def clientConnectionLost(self, connector, reason):
+        logger.info('lost connection: %s', reason.getErrorMessage())
+        if self.reconnect and self.continueTrying:
+            self._retry(connector)
+        else:
+            self._maybeFinish()
+
+    def clientConnectionFailed(self, connector, reason):
+        logger.info('connection failed: %s', reason.getErrorMessage())
+        self._failPending(connector, reason)
+        if self.reconnect and self.continueTrying:
+            self._retry(connector)
+        else:
+            self._maybeFinish()
+
+    def callReaders(self, method, args=(), kwargs=None, readers=None):
+        """Call an LLRPClient method on many readers in parallel.
+
+        @param method: name of the LLRPClient method to call
+        @param args, kwargs: arguments to pass to each call
+        @param readers: iterable of (host, port) keys; default all readers
+        @return: a Deferred that fires with a dict mapping (host, port) to a
+            (success, result or Failure) tuple for each reader
+        """
+        kwargs = kwargs or {}
+        if readers is None:
+            readers = self.readers.keys()
+        readers = list(readers)
+        calls = []
+        for key in readers:
+            proto = self.readers.get(key)
+            if proto is None:
+                calls.append(defer.fail(LLRPError(
+                    'not connected to {}:{}'.format(*key))))
+            else:
+                calls.append(defer.maybeDeferred(getattr(proto, method),
+                                                 *args, **kwargs))
+        dl = defer.DeferredList(calls, consumeErrors=True)
+        dl.addCallback(lambda results: dict(zip(readers, results)))
+        return dl
+
+    def setTxPower(self, tx_power, peername=None):
+        """Set the transmit power on one host's readers or on all readers."""
+        readers = None
+        if peername:
+            readers = [p.peername for p in self.getProtocols(peername)]
+        return self.callReaders('setTxPower', (tx_power,), readers=readers)
+
+    def pauseInventory(self, seconds=0):
+        return self.callReaders('pause', kwargs={'duration_seconds': seconds})
+
+    def resumeInventory(self):
+        return self.callReaders('resume')
+
+    def politeShutdown(self):
+        """Stop inventory on all connected readers and stop reconnecting."""
+        self.stopTrying()
+        return self.callReaders('stopPolitely', kwargs={'disconnect': True})
+
+
+def plan_slots(groups):
+    """Assign readers to time slots so that no two interfering readers share
+    one.
+
+    `groups` is an iterable of collections of readers that interfere with
+    each other; a reader may be in several groups.  Returns a list of slots,
+    each a sorted list of readers.  Readers are colored greedily, most
+    constrained first, so the number of slots is small but not always
+    minimal.
+
+    >>> plan_slots([['a', 'b'], ['b', 'c']])
+    [['b'], ['a', 'c']]
+    """
+    neighbours = defaultdict(set)
+    for group in groups:
+        group = set(group)
+        for reader in group:
+            neighbours[reader].update(group - {reader})
+    colors = {}
+    for reader in sorted(neighbours, key=lambda r: (-len(neighbours[r]), r)):
+        used = {colors[n] for n in neighbours[reader] if n in colors}
+        colors[reader] = next(c for c in itertools.count() if c not in used)
+    slots = [[] for _ in range(len(set(colors.values())))]
+    for reader, color in colors.items():
+        slots[color].append(reader)
+    return [sorted(slot) for slot in slots]
+
+
+class SlotCoordinator(object):
+    """Rotate inventory between groups of interfering readers.
+
+    `groups` lists groups of readers, as (host, port) keys of
+    `fleet.readers` or 'host[:port]' strings, whose fields overlap.  They
+    are assigned to time slots with plan_slots(); every `slot` seconds the
+    next slot's readers resume inventory and the other slots' readers are
+    paused (all their ROSpecs are disabled).  Readers that aren't in any
+    group are left alone.
+
+    compare() measures the fleet's distinct EPCs per second with and
+    without the rotation, to check that it is worth it.
+    """
+
+    def __init__(self, fleet, groups, slot=1.0, clock=reactor):
+        self.fleet = fleet
+        self.slot = slot
+        self.clock = clock
+        self.slots = plan_slots(
+            [parse_hostport(r) if not isinstance(r, tuple) else r
+             for r in group] for group in groups)
+        self.current = None
+        self.comparison = None
+        self._counting = False
+        self._epcs = set()
+
+        fleet.addTagReportCallback(self.tag_cb)
+        for proto in fleet.readers.values():
+            proto.addMessageCallback('RO_ACCESS_REPORT', self.tag_cb)
+        self._rotator = task.LoopingCall(self.rotate)
+        self._rotator.clock = clock
+
+    @property
+    def running(self):
+        return self._rotator.running
+
+    def start(self):
+        """Start rotating; the first slot's readers run first."""
+        self.current = None
+        self._rotator.start(self.slot, now=True)
+
+    def stop(self):
+        """Stop rotating and let every reader inventory again.
+
+        Returns a Deferred that fires when the paused readers have resumed.
+        """
+        if self._rotator.running:
+            self._rotator.stop()
+        self.current = None
+        return self._call(self._members(), 'resume')
+
+    def _members(self, slots=None):
+        if slots is None:
+            slots = self.slots
+        return [reader for slot in slots for reader in slot]
+
+    def _call(self, readers, method):
+        readers = [key for key in readers if key in self.fleet.readers]
+        return self.fleet.callReaders(method, readers=readers)
+
+    def rotate(self):
+        """Pause the current slot's readers, then resume the next slot's.
+
+        Returns a Deferred that fires with the readers of other slots that
+        could not be paused, and so may still interfere; they are logged.
+        """
+        if not self.slots:
+            return None
+        if self.current is None:
+            self.current = 0
+        else:
+            self.current = (self.current + 1) % len(self.slots)
+        active = self.slots[self.current]
+        others = self._members(self.slots[:self.current] +
+                               self.slots[self.current + 1:])
+        logger.debug('inventory slot %d: %s', self.current, active)
+        d = self._call(others, 'pause')
+        d.addCallback(self._checkPaused)
+        d.addCallback(self._resumeActive, active)
+        return d
+
+    def _checkPaused(self, results):
+        """Return the readers that pause() didn't leave paused."""
+        unpaused = []
+        for key, (success, result) in sorted(results.items()):
+            if not success:
+                logger.warning('could not pause %s:%d: %s', key[0], key[1],
+                               result.getErrorMessage())
+                unpaused.append(key)
+                continue
+            proto = self.fleet.readers.get(key)
+            if result is None and proto is not None and \
+                    proto.state != LLRPClient.STATE_PAUSED:
+                # pause() ignores readers that aren't inventorying yet
+                logger.warning('could not pause %s:%d in state %s', key[0],
+                               key[1], LLRPClient.getStateName(proto.state))
+                unpaused.append(key)
+        if unpaused:
+            logger.warning('inventory slot %d is not isolated', self.current)
+        return unpaused
+
+    def _resumeActive(self, unpaused, active):
+        d = self._call(active, 'resume')
+        d.addCallback(lambda _: unpaused)
+        return d
+
+    def tag_cb(self, llrp_msg):
+        if self._counting:
+            self._epcs.update(tag_epc(tag) for tag in tag_reports(llrp_msg))
+
+    @defer.inlineCallbacks
+    def measure(self, duration):
+        """Return distinct EPCs per second read over `duration` seconds."""
+        self._epcs = set()
+        self._counting = True
+        try:
+            yield task.deferLater(self.clock, duration, lambda: None)
+        finally:
+            self._counting = False
+        defer.returnValue(len(self._epcs) / duration)
+
+    @defer.inlineCallbacks
+    def compare(self, duration=30.0):
+        """Measure the fleet free-running, then with the rotation.
+
+        Returns a Deferred that fires with a dict with the distinct EPCs per
+        second of each ('free' and 'sliced'), also kept in `comparison`.
+        The rotation is left running.
+        """
+        yield self.stop()
+        free = yield self.measure(duration)
+        self.start()
+        sliced = yield self.measure(duration)
+        self.comparison = {'free': free, 'sliced': sliced}
+        logger.info('distinct EPCs/s: %.1f free-running, %.1f time-sliced',
+                    free, sliced)
+        defer.returnValue(self.comparison)
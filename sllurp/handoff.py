@@ -0,0 +1,305 @@
+"""Hand live reader connections over to a new process.
+
+Restarting a collector normally drops every reader connection, and the new
+process has to reconnect, reset and reconfigure every reader before tags flow
+again.  Instead, the old process can offer its connections on a Unix socket:
+
+    # old process, at startup
+    d = offerHandoff(factory, '/run/sllurp/handoff.sock')
+    d.addCallback(lambda _: reactor.stop())
+
+    # new process, at startup
+    d = takeOver(factory, '/run/sllurp/handoff.sock')
+    d.addCallback(lambda adopted: connect_to_the_rest(adopted))
+
+When the new process connects, the old one stops reading from its readers,
+waits for their outstanding requests to complete, and passes the TCP sockets
+(via SCM_RIGHTS) along with each LLRPClient's state: state machine position,
+ROSpecs, reader mode, capabilities and configuration.  The new process adopts
+the sockets without a handshake or reset, so readers keep inventorying and any
+data that arrived in the meantime waits in the kernel's receive buffer.
+
+File descriptor passing requires Linux (or another platform with
+SCM_RIGHTS support in Twisted) and Python 3.  The state is pickled, so the
+Unix socket must only be reachable by the collector's own user.
+"""
+
+from __future__ import unicode_literals
+import logging
+import os
+import pickle
+import socket
+import struct
+from twisted.internet import reactor, defer
+from twisted.internet.interfaces import IFileDescriptorReceiver
+from twisted.internet.protocol import Protocol, Factory, ClientFactory
+from zope.interface import implementer
+
+from .llrp import LLRPClient
+from .llrp_errors import LLRPError
+
+logger = logging.getLogger(__name__)
+
+# LLRPClient attributes that describe a connection's progress; everything
+# else is rebuilt from the new process's factory
+CLIENT_STATE = ('state', 'peername', 'rospec', 'rospecs', 'reader_mode',
+                'reader_id',
+                'capabilities', 'configuration', 'tx_power_table',
+                'last_msg_id', 'partialData', 'expectingRemainingBytes',
+                '_gpi_ports') + LLRPClient.ROSPEC_SETTINGS
+
+# states in which no request is outstanding, so a reader's responses can't
+# end up in a process that doesn't expect them
+SETTLED_STATES = (LLRPClient.STATE_CONNECTED, LLRPClient.STATE_INVENTORYING,
+                  LLRPClient.STATE_PAUSED)
+
+len_fmt = '!I'
+len_len = struct.calcsize(len_fmt)
+
+ACK = b'\x01'
+
+
+def is_writing(transport):
+    """Return True if transport may still have data to write.
+
+    Twisted has no public API for how much a transport has buffered, so
+    this looks at the TCP transport's buffers (checked up to Twisted 26.4);
+    if a release moves them, it fails closed and the reader isn't handed
+    off.
+    """
+    try:
+        return bool(transport.dataBuffer or transport._tempDataBuffer)
+    except AttributeError:
+        logger.warning('cannot tell whether %r has flushed its writes',
+                       transport)
+        return True
+
+
+def is_settled(proto):
+    """Return True if proto can be handed off right now."""
+    return (proto.state in SETTLED_STATES and not proto.disconnecting and
+            not any(proto._deferreds.values()) and
+            not is_writing(proto.transport))
+
+
+def client_state(proto):
+    """Return a picklable dict describing an LLRPClient's connection."""
+    state = {attr: getattr(proto, attr) for attr in CLIENT_STATE}
+    state['family'] = proto.transport.getHandle().family
+    return state
+
+
+class HandoffSender(Protocol):
+    """Old-process end: hand all settled readers to the connected peer."""
+
+    def connectionMade(self):
+        f = self.factory
+        self.handed = []
+        if f.busy:
+            logger.warning('handoff already in progress; refusing another')
+            self.transport.loseConnection()
+            return
+        f.busy = True
+        self.buf = b''
+        self.deadline = reactor.seconds() + f.settle_timeout
+
+        # stop reading first: whatever the readers send from now on stays in
+        # the kernel for the new process to read
+        self.protos = list(f.client_factory.protocols)
+        for proto in self.protos:
+            proto.transport.stopReading()
+        self.waitForSettled()
+
+    def waitForSettled(self):
+        unsettled = [p for p in self.protos if not is_settled(p)]
+        if unsettled and reactor.seconds() < self.deadline:
+            # responses to outstanding requests must still be read here
+            for proto in unsettled:
+                proto.transport.startReading()
+            reactor.callLater(0.01, self.waitForSettled)
+            return
+
+        for proto in self.protos:
+            if proto not in self.factory.client_factory.protocols:
+                continue  # disconnected meanwhile
+            if proto in unsettled:
+                logger.warning('%s is busy; not handing it off',
+                               proto.peername)
+                proto.transport.startReading()
+                continue
+            proto.transport.stopReading()
+            self.handed.append(proto)
+
+        states = []
+        for proto in self.handed:
+            self.transport.sendFileDescriptor(proto.transport.fileno())
+            states.append(client_state(proto))
+        payload = pickle.dumps(states, 2)
+        self.transport.write(struct.pack(len_fmt, len(payload)) + payload)
+        logger.info('offered %d reader connections', len(self.handed))
+
+    def dataReceived(self, data):
+        self.buf += data
+        if self.buf != ACK:
+            return
+        handed, self.handed = self.handed, []
+        self.factory.completed(handed)
+        self.transport.loseConnection()
+
+    def connectionLost(self, reason):
+        if not self.handed:
+            return
+        # the new process went away before adopting; carry on as before
+        logger.warning('handoff failed (%s); resuming %d readers',
+                       reason.getErrorMessage(), len(self.handed))
+        for proto in self.handed:
+            proto.transport.startReading()
+        self.factory.busy = False
+
+
+class HandoffSenderFactory(Factory):
+    protocol = HandoffSender
+
+    def __init__(self, client_factory, settle_timeout):
+        self.client_factory = client_factory
+        self.settle_timeout = settle_timeout
+        self.busy = False
+        self.port = None
+        self.onHandoff = defer.Deferred()
+
+    def completed(self, protos):
+        cf = self.client_factory
+        if hasattr(cf, 'stopTrying'):
+            cf.stopTrying()
+        for proto in protos:
+            # close our copy of the socket without shutdown(2), which would
+            # end the connection for the new process too: point our file
+            # descriptor at an unconnected socket, which the transport then
+            # shuts down and closes instead.  This relies on Twisted's TCP
+            # transport ignoring the ENOTCONN from shutdown(), as it does in
+            # every release with SCM_RIGHTS support (checked up to 26.4).
+            transport = proto.transport
+            placeholder = socket.socket(transport.getHandle().family,
+                                        socket.SOCK_STREAM)
+            os.dup2(placeholder.fileno(), transport.fileno())
+            placeholder.close()
+            transport.loseConnection()
+        logger.info('handed off %d reader connections', len(protos))
+        self.port.stopListening()
+        self.onHandoff.callback([p.peername for p in protos])
+
+
+def offerHandoff(client_factory, path, settle_timeout=5.0):
+    """Offer client_factory's reader connections on Unix socket `path`.
+
+    Readers still waiting for a response after `settle_timeout` seconds are
+    not handed off; they stay connected to this process.
+
+    Returns a Deferred that fires with the list of handed-off peernames once
+    a new process has adopted them.  This process should then exit.
+    """
+    f = HandoffSenderFactory(client_factory, settle_timeout)
+    f.port = reactor.listenUNIX(path, f, mode=0o600, wantPID=True)
+    return f.onHandoff
+
+
+@implementer(IFileDescriptorReceiver)
+class HandoffReceiver(Protocol):
+    """New-process end: adopt the sockets the old process sends."""
+
+    def connectionMade(self):
+        self.fds = []
+        self.buf = b''
+
+    def fileDescriptorReceived(self, fd):
+        self.fds.append(fd)
+
+    def dataReceived(self, data):
+        self.buf += data
+        if len(self.buf) < len_len:
+            return
+        length, = struct.unpack(len_fmt, self.buf[:len_len])
+        if len(self.buf) < len_len + length:
+            return
+        states = pickle.loads(self.buf[len_len:len_len + length])
+        if len(states) != len(self.fds):
+            self.factory.fail(LLRPError(
+                'got {} sockets for {} readers'.format(len(self.fds),
+                                                       len(states))))
+            self.transport.loseConnection()
+            return
+
+        adopted = []
+        for fd, state in zip(self.fds, states):
+            adopted.append(adopt(self.factory.client_factory, fd, state))
+            os.close(fd)
+        self.fds = []
+        self.transport.write(ACK)
+        self.factory.succeed(adopted)
+
+    def connectionLost(self, reason):
+        for fd in self.fds:
+            os.close(fd)
+        self.factory.fail(reason)
+
+
+class HandoffReceiverFactory(ClientFactory):
+    protocol = HandoffReceiver
+
+    def __init__(self, client_factory):
+        self.client_factory = client_factory
+        self.onAdopted = defer.Deferred()
+
+    def succeed(self, adopted):
+        if not self.onAdopted.called:
+            self.onAdopted.callback(adopted)
+
+    def fail(self, reason):
+        if not self.onAdopted.called:
+            self.onAdopted.errback(reason)
+
+    def clientConnectionFailed(self, connector, reason):
+        # nobody is offering; start from scratch
+        logger.info('no process to take over from: %s',
+                    reason.getErrorMessage())
+        self.succeed([])
+
+
+class _AdoptingFactory(object):
+    """Build a client through the real factory, then restore its state.
+
+    The state must be in place before connectionMade, which registers the
+    client under its peername.
+    """
+
+    def __init__(self, client_factory, state):
+        self.client_factory = client_factory
+        self.state = state
+
+    def buildProtocol(self, addr):
+        proto = self.client_factory.buildProtocol(addr)
+        for attr in CLIENT_STATE:
+            setattr(proto, attr, self.state[attr])
+        return proto
+
+
+def adopt(client_factory, fd, state):
+    """Adopt one handed-off reader socket; return its new LLRPClient."""
+    transport = reactor.adoptStreamConnection(
+        fd, state['family'], _AdoptingFactory(client_factory, state))
+    proto = transport.protocol
+    proto._updateReportPuller()
+    logger.info('adopted %s in state %s', proto.peername,
+                LLRPClient.getStateName(proto.state))
+    return proto
+
+
+def takeOver(client_factory, path, timeout=10):
+    """Adopt the reader connections offered on Unix socket `path`.
+
+    Returns a Deferred that fires with the list of adopted LLRPClients, which
+    is empty if no process is offering connections.
+    """
+    f = HandoffReceiverFactory(client_factory)
+    reactor.connectUNIX(path, f, timeout=timeout)
+    return f.onAdopted
@@ -1,5 +1,5 @@
 from __future__ import print_function, unicode_literals
-from collections import defaultdict
+from collections import defaultdict, deque
 import logging
 import pprint
 import struct
@@ -7,6 +7,7 @@ from .llrp_proto import LLRPROSpec, LLRPError, Message_struct, \
     Message_Type2Name, Capability_Name2Type, AirProtocol, \
     llrp_data2xml, LLRPMessageDict, Modulation_Name2Type
 from .llrp_errors import ReaderConfigurationError
+from .epc.mask import compile_masks
 from binascii import hexlify
 from .util import BITMASK, natural_keys, iterkeys
 from twisted.internet import reactor, task, defer
@@ -15,6 +16,10 @@ from twisted.protocols.basic import LineReceiver
 
 LLRP_PORT = 5084
 
+# messages that a reader holds while disconnected, if asked to
+HELD_MESSAGE_TYPES = (Message_struct['RO_ACCESS_REPORT']['type'],
+                      Message_struct['READER_EVENT_NOTIFICATION']['type'])
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,10 +29,11 @@ class LLRPMessage(object):
     full_hdr_fmt = hdr_fmt + 'I'
     full_hdr_len = struct.calcsize(full_hdr_fmt)  # == 10 bytes
 
-    def __init__(self, msgdict=None, msgbytes=None):
+    def __init__(self, msgdict=None, msgbytes=None, epc_filter=None):
         if not (msgdict or msgbytes):
             raise LLRPError('Provide either a message dict or a sequence'
                             ' of bytes.')
+        self.epc_filter = epc_filter
         self.proto = None
         self.peername = None
         self.msgdict = None
@@ -81,8 +87,12 @@ class LLRPMessage(object):
                             '{}'.format(msgtype))
         body = data[self.full_hdr_len:length]
         try:
+            if self.epc_filter is not None and name == 'RO_ACCESS_REPORT':
+                decoded = decoder(body, epc_filter=self.epc_filter)
+            else:
+                decoded = decoder(body)
             self.msgdict = {
-                name: dict(decoder(body))
+                name: dict(decoded)
             }
             self.msgdict[name]['Ver'] = ver
             self.msgdict[name]['Type'] = msgtype
@@ -146,6 +156,28 @@ class LLRPClient(LineReceiver):
     STATE_PAUSING = 22
     STATE_PAUSED = 23
     STATE_SENT_ENABLE_IMPINJ_EXTENSIONS = 24
+    STATE_SENT_GET_ROSPECS = 25
+
+    # constructor arguments that only affect the ROSpec, and so may be
+    # changed later with reconfigure()
+    ROSPEC_SETTINGS = ('duration', 'report_every_n_tags', 'report_timeout_ms',
+                       'antennas', 'tx_power', 'tari', 'session',
+                       'tag_population', 'mode_identifier', 'tag_filter_mask',
+                       'tag_content_selector', 'impinj_search_mode',
+                       'impinj_tag_content_selector',
+                       'impinj_fixed_frequency_param', 'report_pull_interval',
+                       'antenna_dwell', 'rospec_priority', 'extra_rospecs',
+                       'start_trigger', 'stop_trigger', 'tag_filter_targets')
+
+    # settings that an additional ROSpec may override; see addROSpec()
+    EXTRA_ROSPEC_SETTINGS = ('priority', 'duration', 'report_every_n_tags',
+                             'report_timeout_ms', 'antennas', 'tx_power',
+                             'tari', 'session', 'tag_population',
+                             'tag_filter_mask', 'tag_content_selector',
+                             'impinj_search_mode',
+                             'impinj_tag_content_selector',
+                             'impinj_fixed_frequency_param', 'antenna_dwell',
+                             'start_trigger', 'stop_trigger')
 
     @classmethod
     def getStates(_):
@@ -174,7 +206,12 @@ class LLRPClient(LineReceiver):
                  impinj_extended_configuration=False,
                  impinj_search_mode=None,
                  impinj_tag_content_selector=None,
-                 impinj_fixed_frequency_param=None):
+                 impinj_fixed_frequency_param=None,
+                 hold_events_and_reports=False, held_report_batch_size=50,
+                 report_pull_interval=None, epc_filter=None,
+                 antenna_dwell=None, rospec_priority=0, extra_rospecs=None,
+                 start_trigger=None, stop_trigger=None,
+                 tag_filter_targets=None):
         self.factory = factory
         self.setRawMode()
         self.state = LLRPClient.STATE_DISCONNECTED
@@ -183,21 +220,25 @@ class LLRPClient(LineReceiver):
         self.capabilities = {}
         self.configuration = {}
         self.reader_mode = None
-        if isinstance(tx_power, int):
-            self.tx_power = {ant: tx_power for ant in antennas}
-        elif isinstance(tx_power, dict):
-            if set(antennas) != set(tx_power.keys()):
-                raise LLRPError('Must specify tx_power for each antenna')
-            self.tx_power = tx_power.copy()
-        else:
-            raise LLRPError('tx_power must be dict or int')
+        self.reader_id = None
+        self.tx_power = self.perAntennaTxPower(tx_power, antennas)
         self.tari = tari
         self.session = session
         self.tag_population = tag_population
         self.mode_identifier = mode_identifier
         self.tag_filter_mask = tag_filter_mask
+        # EPCs and prefixes compiled into tag_filter_mask once the reader's
+        # filter limit is known; see compileTagFilter()
+        self.tag_filter_targets = tag_filter_targets
+        self._compiled_filter = None
+        self.epc_filter = epc_filter
         self.antennas = antennas
+        self.antenna_dwell = antenna_dwell
         self.duration = duration
+        # GPI-triggered inventory; see LLRPROSpec.startTrigger() and
+        # stopTrigger()
+        self.start_trigger = start_trigger
+        self.stop_trigger = stop_trigger
         self.peername = None
         self.tx_power_table = []
         self.start_inventory = start_inventory
@@ -222,7 +263,7 @@ class LLRPClient(LineReceiver):
 
         # for partial data transfers
         self.expectingRemainingBytes = 0
-        self.partialData = ''
+        self.partialData = b''
 
         # state-change callbacks: STATE_* -> [list of callables]
         self._state_callbacks = {}
@@ -239,8 +280,31 @@ class LLRPClient(LineReceiver):
         self.disconnecting = False
         self.rospec = None
 
+        # the main ROSpec (ID 1) is built from this client's settings;
+        # extra_rospecs maps the IDs of more ROSpecs to the settings in which
+        # they differ.  rospecs holds every ROSpec on the reader, by ID.
+        self.rospec_priority = rospec_priority
+        self.extra_rospecs = dict(extra_rospecs or {})
+        self.rospecs = {}
+        # GPI ports last enabled on the reader; see _updateGPIConfig()
+        self._gpi_ports = []
+
         self.last_msg_id = 0
 
+        # ask the reader to keep reports from while we were disconnected;
+        # see drainHeldReports()
+        self.hold_events_and_reports = hold_events_and_reports
+        self.held_report_batch_size = held_report_batch_size
+        self._held_messages = deque()
+        self._draining = False
+        # ROSpec left on the reader, until GET_ROSPECS confirms it's there
+        self._held_rospec = None
+
+        # if set, the reader buffers reports until we ask for them with
+        # GET_REPORT every report_pull_interval seconds
+        self.report_pull_interval = report_pull_interval
+        self._report_puller = None
+
     def addStateCallback(self, state, cb):
         """Add a callback to run upon a state transition.
 
@@ -255,19 +319,57 @@ class LLRPClient(LineReceiver):
     def addMessageCallback(self, msg_type, cb):
         self._message_callbacks[msg_type].append(cb)
 
+    def removeMessageCallback(self, msg_type, cb):
+        """Remove a callback added with addMessageCallback(), if present."""
+        try:
+            self._message_callbacks[msg_type].remove(cb)
+        except ValueError:
+            pass
+
+    @staticmethod
+    def perAntennaTxPower(tx_power, antennas):
+        """Turn a tx_power argument into a dict {antenna: tx_power}."""
+        if isinstance(tx_power, int):
+            return {ant: tx_power for ant in antennas}
+        elif isinstance(tx_power, dict):
+            if set(antennas) != set(tx_power.keys()):
+                raise LLRPError('Must specify tx_power for each antenna')
+            return tx_power.copy()
+        raise LLRPError('tx_power must be dict or int')
+
+    @staticmethod
+    def parseReaderID(confdict):
+        """Get the reader's unique ID from a GET_READER_CONFIG_RESPONSE.
+
+        Returns the Identification parameter's ReaderID (usually a MAC
+        address) as a hex string, or None if the reader didn't send one.
+        """
+        reader_id = (confdict.get('Identification') or {}).get('ReaderID')
+        if not reader_id:
+            return None
+        return hexlify(reader_id).decode('ascii')
+
     def connectionMade(self):
         t = self.transport
         t.setTcpKeepAlive(True)
 
-        # overwrite the peer hostname with the hostname the connector asked us
-        # for (e.g., 'localhost' instead of '127.0.0.1')
-        dest = t.connector.getDestination()
-        self.peer_ip, self.peer_port = t.getHandle().getpeername()
-        self.peername = (dest.host, self.peer_port)
+        peer = t.getPeer()
+        self.peer_ip, self.peer_port = peer.host, peer.port
+        connector = getattr(t, 'connector', None)
+        if self.peername is not None:
+            # adopted from another process (see sllurp.handoff)
+            pass
+        elif connector is not None:
+            # overwrite the peer hostname with the hostname the connector
+            # asked us for (e.g., 'localhost' instead of '127.0.0.1')
+            self.peername = (connector.getDestination().host, self.peer_port)
+        else:
+            # the reader connected to us
+            self.peername = (self.peer_ip, self.peer_port)
 
         logger.info('connected to %s (%s:%s)', self.peername, self.peer_ip,
                     self.peer_port)
-        self.factory.protocols.append(self)
+        self.factory.addProtocol(self)
 
     def setState(self, newstate, onComplete=None):
         assert newstate is not None
@@ -276,17 +378,35 @@ class LLRPClient(LineReceiver):
                      LLRPClient.getStateName(newstate))
 
         self.state = newstate
+        self._updateReportPuller()
 
         for fn in self._state_callbacks[newstate]:
             fn(self)
 
+    def _updateReportPuller(self):
+        """Pull buffered reports periodically while inventorying."""
+        pulling = self._report_puller is not None and \
+            self._report_puller.running
+        if self.report_pull_interval and \
+                self.state == LLRPClient.STATE_INVENTORYING:
+            if not pulling:
+                self._report_puller = task.LoopingCall(self.send_GET_REPORT)
+                self._report_puller.start(self.report_pull_interval,
+                                          now=False)
+        elif pulling:
+            self._report_puller.stop()
+
     def _setState_wrapper(self, _, *args, **kwargs):
         """Version of setState suitable for calling via a Deferred callback.
            XXX this is a gross hack."""
         self.setState(args[0], **kwargs)
 
     def connectionLost(self, reason):
-        self.factory.protocols.remove(self)
+        self.connected = 0
+        if self._report_puller is not None and self._report_puller.running:
+            self._report_puller.stop()
+        self._held_messages.clear()
+        self.factory.removeProtocol(self)
 
     def parseReaderConfig(self, confdict):
         """Parse a reader configuration dictionary.
@@ -355,6 +475,11 @@ class LLRPClient(LineReceiver):
             raise ReaderConfigurationError(errmsg)
         logger.debug('set antennas: %s', self.antennas)
 
+        self.checkGPIPorts(capdict)
+
+        if self.tag_filter_targets is not None:
+            self.tag_filter_mask = self.compileTagFilter(capdict)
+
         # parse available transmit power entries, set self.tx_power
         bandcap = capdict['RegulatoryCapabilities']['UHFBandCapabilities']
         self.tx_power_table = self.parsePowerTable(bandcap)
@@ -414,7 +539,8 @@ class LLRPClient(LineReceiver):
 
         # call per-message callbacks
         logger.debug('starting message callbacks for %s', msgName)
-        for fn in self._message_callbacks[msgName]:
+        # a callback may remove itself
+        for fn in list(self._message_callbacks[msgName]):
             fn(lmsg)
         logger.debug('done with message callbacks for %s', msgName)
 
@@ -442,10 +568,17 @@ class LLRPClient(LineReceiver):
         #######
 
         # in DISCONNECTED, CONNECTING, and CONNECTED states, expect only
-        # READER_EVENT_NOTIFICATION messages.
+        # READER_EVENT_NOTIFICATION messages (and, in CONNECTED, responses to
+        # new GPI settings).
         if self.state in (LLRPClient.STATE_DISCONNECTED,
                           LLRPClient.STATE_CONNECTING,
                           LLRPClient.STATE_CONNECTED):
+            if msgName == 'SET_READER_CONFIG_RESPONSE' and \
+                    self.state == LLRPClient.STATE_CONNECTED:
+                # new GPI settings from startInventory()
+                self.processDeferreds(msgName, lmsg.isSuccess())
+                return
+
             if msgName != 'READER_EVENT_NOTIFICATION':
                 logger.error('unexpected message %s while connecting', msgName)
                 return
@@ -543,6 +676,7 @@ class LLRPClient(LineReceiver):
             if msgName == 'GET_READER_CONFIG_RESPONSE':
                 config = lmsg.msgdict['GET_READER_CONFIG_RESPONSE']
                 self.configuration = self.parseReaderConfig(config)
+                self.reader_id = self.parseReaderID(config)
                 logger.debug('Reader configuration: %s', self.configuration)
 
             self.processDeferreds(msgName, lmsg.isSuccess())
@@ -551,7 +685,8 @@ class LLRPClient(LineReceiver):
             d.addCallback(self._setState_wrapper,
                           LLRPClient.STATE_SENT_SET_CONFIG)
             d.addErrback(self.panic, 'SET_READER_CONFIG failed')
-            self.send_ENABLE_EVENTS_AND_REPORTS()
+            if not self.hold_events_and_reports:
+                self.send_ENABLE_EVENTS_AND_REPORTS()
             self.send_SET_READER_CONFIG(onCompletion=d)
 
         elif self.state == LLRPClient.STATE_SENT_SET_CONFIG:
@@ -570,12 +705,50 @@ class LLRPClient(LineReceiver):
 
             self.processDeferreds(msgName, lmsg.isSuccess())
 
-            if self.reset_on_connect:
-                d = self.stopPolitely(disconnect=False)
-                if self.start_inventory:
-                    d.addCallback(self.startInventory)
-            elif self.start_inventory:
-                self.startInventory()
+            if self.hold_events_and_reports:
+                rospec = self.factory.popHeldROSpec(self)
+                if rospec is not None and \
+                        rospec != self.getROSpec(force_new=True):
+                    logger.info('settings changed since ROSpec %d was left '
+                                'running; starting over',
+                                rospec['ROSpec']['ROSpecID'])
+                    rospec = None
+                if rospec is not None:
+                    # the reader may have kept inventorying while we were
+                    # away, unless it was rebooted or reset meanwhile
+                    self._held_rospec = rospec
+                    self.send_GET_ROSPECS()
+                    return
+                self.drainHeldReports()
+
+            self.startAfterConfig()
+
+        # in state SENT_GET_ROSPECS, expect only GET_ROSPECS_RESPONSE, which
+        # says whether the reader still runs the ROSpec we left it
+        elif self.state == LLRPClient.STATE_SENT_GET_ROSPECS:
+            if msgName != 'GET_ROSPECS_RESPONSE':
+                logger.error('unexpected response %s getting ROSpecs',
+                             msgName)
+                return
+
+            rospec, self._held_rospec = self._held_rospec, None
+            held = lmsg.isSuccess() and self.isROSpecRunning(
+                lmsg.msgdict[msgName]['ROSpec'], rospec)
+            self.processDeferreds(msgName, lmsg.isSuccess())
+            self.drainHeldReports()
+            if not held:
+                logger.warning('reader no longer runs ROSpec %d; starting '
+                               'over', rospec['ROSpec']['ROSpecID'])
+                self.startAfterConfig()
+                return
+
+            logger.info('resuming ROSpec %d', rospec['ROSpec']['ROSpecID'])
+            self.rospec = rospec
+            self.rospecs = {1: rospec}
+            for rospecid, settings in self.extra_rospecs.items():
+                self.rospecs[rospecid] = self.buildROSpec(
+                    rospecid, **settings)
+            self.setState(LLRPClient.STATE_INVENTORYING)
 
         # in state SENT_ADD_ROSPEC, expect only ADD_ROSPEC_RESPONSE; respond to
         # favorable ADD_ROSPEC_RESPONSE by enabling the added ROSpec and
@@ -655,7 +828,11 @@ class LLRPClient(LineReceiver):
                                'ADD_ACCESSSPEC_RESPONSE',
                                'ENABLE_ACCESSSPEC_RESPONSE',
                                'DISABLE_ACCESSSPEC_RESPONSE',
-                               'DELETE_ACCESSSPEC_RESPONSE'):
+                               'DELETE_ACCESSSPEC_RESPONSE',
+                               'ADD_ROSPEC_RESPONSE',
+                               'ENABLE_ROSPEC_RESPONSE',
+                               'DELETE_ROSPEC_RESPONSE',
+                               'SET_READER_CONFIG_RESPONSE'):
                 logger.error('unexpected message %s while inventorying',
                              msgName)
                 return
@@ -699,53 +876,101 @@ class LLRPClient(LineReceiver):
                          ' but there are!', msgName)
 
     def rawDataReceived(self, data):
-        logger.debug('got %d bytes from reader: %s', len(data),
-                     hexlify(data))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('got %d bytes from reader: %s', len(data),
+                         hexlify(data))
 
         if self.expectingRemainingBytes:
-            if len(data) >= self.expectingRemainingBytes:
-                data = self.partialData + data
-                self.partialData = ''
-                self.expectingRemainingBytes -= len(data)
-            else:
+            self.partialData += data
+            if len(data) < self.expectingRemainingBytes:
                 # still not enough; wait until next time
-                self.partialData += data
                 self.expectingRemainingBytes -= len(data)
                 return
-
-        while data:
+            data = bytes(self.partialData)
+            self.partialData = b''
+            self.expectingRemainingBytes = 0
+
+        # walk through the messages by offset rather than slicing off each
+        # one, which would copy the rest of a large buffer every time
+        offset = 0
+        while offset < len(data):
+            remaining = len(data) - offset
             # parse the message header to grab its length
-            if len(data) >= LLRPMessage.full_hdr_len:
+            if remaining >= LLRPMessage.full_hdr_len:
                 msg_type, msg_len, message_id = \
-                    struct.unpack(LLRPMessage.full_hdr_fmt,
-                                  data[:LLRPMessage.full_hdr_len])
+                    struct.unpack_from(LLRPMessage.full_hdr_fmt, data,
+                                       offset)
             else:
                 logger.warning('Too few bytes (%d) to unpack message header',
-                               len(data))
-                self.partialData = data
+                               remaining)
+                self.partialData = bytearray(data[offset:])
                 self.expectingRemainingBytes = \
-                    LLRPMessage.full_hdr_len - len(data)
+                    LLRPMessage.full_hdr_len - remaining
                 break
 
-            logger.debug('expect %d bytes (have %d)', msg_len, len(data))
+            logger.debug('expect %d bytes (have %d)', msg_len, remaining)
+            if msg_len < LLRPMessage.full_hdr_len:
+                logger.error('invalid message length %d; dropping %d bytes',
+                             msg_len, remaining)
+                break
 
-            if len(data) < msg_len:
+            if remaining < msg_len:
                 # got too few bytes
-                self.partialData = data
-                self.expectingRemainingBytes = msg_len - len(data)
+                self.partialData = bytearray(data[offset:])
+                self.expectingRemainingBytes = msg_len - remaining
                 break
-            else:
-                # got at least the right number of bytes
-                self.expectingRemainingBytes = 0
-                try:
-                    lmsg = LLRPMessage(msgbytes=data[:msg_len])
-                    self.handleMessage(lmsg)
-                    data = data[msg_len:]
-                except LLRPError:
-                    logger.exception('Failed to decode LLRPMessage; '
-                                     'will not decode %d remaining bytes',
-                                     len(data))
-                    break
+
+            # got at least the right number of bytes
+            msgbytes = data[offset:offset + msg_len]
+            if self._draining and \
+                    (msg_type & BITMASK(10)) in HELD_MESSAGE_TYPES:
+                self.queueHeldMessage(msgbytes)
+                offset += msg_len
+                continue
+            try:
+                lmsg = LLRPMessage(msgbytes=msgbytes,
+                                   epc_filter=self.epc_filter)
+                self.handleMessage(lmsg)
+                offset += msg_len
+            except LLRPError:
+                logger.exception('Failed to decode LLRPMessage; '
+                                 'will not decode %d remaining bytes',
+                                 remaining)
+                break
+
+    def drainHeldReports(self):
+        """Ask the reader for the events and reports it held for us.
+
+        The backlog and any live reports behind it are delivered in batches
+        of at most self.held_report_batch_size messages per reactor
+        iteration, so a long outage doesn't starve other connections.
+        """
+        self._draining = True
+        self.send_ENABLE_EVENTS_AND_REPORTS()
+
+    def queueHeldMessage(self, msgbytes):
+        if not self._held_messages:
+            reactor.callLater(0, self._deliverHeldMessages)
+        self._held_messages.append(msgbytes)
+        if len(self._held_messages) > 10 * self.held_report_batch_size:
+            # leave the rest in the socket until we catch up
+            self.transport.pauseProducing()
+
+    def _deliverHeldMessages(self):
+        queue = self._held_messages
+        for _ in range(min(len(queue), self.held_report_batch_size)):
+            try:
+                self.handleMessage(LLRPMessage(msgbytes=queue.popleft(),
+                                               epc_filter=self.epc_filter))
+            except LLRPError:
+                logger.exception('Failed to decode held LLRPMessage')
+        if queue:
+            reactor.callLater(0, self._deliverHeldMessages)
+            return
+        # caught up: deliver live reports directly again
+        self._draining = False
+        if self.transport is not None and self.connected:
+            self.transport.resumeProducing()
 
     def panic(self, failure, *args):
         logger.error('panic(): %s', args)
@@ -789,6 +1014,44 @@ class LLRPClient(LineReceiver):
         self._deferreds['GET_READER_CAPABILITIES_RESPONSE'].append(
             onCompletion)
 
+    def startAfterConfig(self):
+        """Reset the reader and/or start inventory, as configured."""
+        if self.reset_on_connect:
+            d = self.stopPolitely(disconnect=False)
+            if self.start_inventory:
+                d.addCallback(self.startInventory)
+        elif self.start_inventory:
+            self.startInventory()
+
+    def isROSpecRunning(self, reader_rospecs, rospec):
+        """Return True if the reader has rospec and the extra ROSpecs enabled.
+
+        reader_rospecs is the ROSpec list of a GET_ROSPECS_RESPONSE.  A
+        ROSpec that starts as soon as it is enabled and never stops must be
+        Active; others wait Inactive between their triggers.
+        """
+        states = {spec['ROSpecID']: spec['CurrentState']
+                  for spec in reader_rospecs}
+        ids = [rospec['ROSpec']['ROSpecID']] + list(self.extra_rospecs)
+        if any(states.get(rospecid, 'Disabled') == 'Disabled'
+               for rospecid in ids):
+            return False
+        boundary = rospec['ROSpec']['ROBoundarySpec']
+        if boundary['ROSpecStartTrigger']['ROSpecStartTriggerType'] == \
+                'Immediate' and boundary['ROSpecStopTrigger'][
+                    'ROSpecStopTriggerType'] == 'Null':
+            return states[ids[0]] == 'Active'
+        return True
+
+    def send_GET_ROSPECS(self):
+        self.sendMessage({
+            'GET_ROSPECS': {
+                'Ver':  1,
+                'Type': 26,
+                'ID':   0,
+            }})
+        self.setState(LLRPClient.STATE_SENT_GET_ROSPECS)
+
     def send_GET_READER_CONFIG(self, onCompletion):
         cfg = {
             'Ver':  1,
@@ -820,30 +1083,112 @@ class LLRPClient(LineReceiver):
                 'ID': 0,
             }})
 
-    def send_SET_READER_CONFIG(self, onCompletion):
+    def compileTagFilter(self, capdict):
+        """Cover tag_filter_targets with as many masks as the reader takes.
+
+        Returns the masks, which match the targets and as few other EPCs as
+        possible; see sllurp.epc.mask.compile_masks().
+        """
+        airproto = capdict.get('AirProtocolLLRPCapabilities')
+        limit = 1
+        if isinstance(airproto, dict):
+            limit = airproto.get('C1G2LLRPCapabilities', {}).get(
+                'MaxNumSelectFiltersPerQuery') or 1
+        cached = self._compiled_filter
+        if cached is not None and cached[0] is self.tag_filter_targets and \
+                cached[1] == limit:
+            return cached[2]
+        # an empty mask would match every tag: no filter at all
+        masks = [mask for mask in compile_masks(self.tag_filter_targets,
+                                                max_masks=limit) if mask]
+        logger.info('tag filter masks (reader takes %d): %s', limit, masks)
+        self._compiled_filter = (self.tag_filter_targets, limit, masks)
+        return masks
+
+    def gpiPorts(self):
+        """Return the GPI ports that start or stop any of the ROSpecs."""
+        settings = [{'start_trigger': self.start_trigger,
+                     'stop_trigger': self.stop_trigger}]
+        settings.extend(self.extra_rospecs.values())
+        return sorted({trigger['gpi'] for rospec in settings
+                       for trigger in (rospec.get('start_trigger'),
+                                       rospec.get('stop_trigger'))
+                       if trigger and 'gpi' in trigger})
+
+    def checkGPIPorts(self, capdict):
+        """Check the GPI triggers, if the reader says how many GPIs it has."""
+        gpio = capdict['GeneralDeviceCapabilities'].get('GPIOCapabilities')
+        if gpio is None:
+            return
+        bad = [port for port in self.gpiPorts()
+               if not 1 <= port <= gpio['NumGPIs']]
+        if bad:
+            raise ReaderConfigurationError(
+                'Invalid GPI ports {}: reader has {} GPIs'.format(
+                    bad, gpio['NumGPIs']))
+
+    def send_GET_REPORT(self):
         self.sendMessage({
-            'SET_READER_CONFIG': {
-                'Ver':  1,
-                'Type': 3,
-                'ID':   0,
-                'ResetToFactoryDefaults': False,
-                'ReaderEventNotificationSpec': {
-                    'EventNotificationState': {
-                            'HoppingEvent': False,
-                            'GPIEvent': False,
-                            'ROSpecEvent': False,
-                            'ReportBufferFillWarning': False,
-                            'ReaderExceptionEvent': False,
-                            'RFSurveyEvent': False,
-                            'AISpecEvent': False,
-                            'AISpecEventWithSingulation': False,
-                            'AntennaEvent': False,
-                            ## Next one will only be available
-                            ## with llrp v2 (spec 1_1)
-                            #'SpecLoopEvent': True,
-                    },
-                }
+            'GET_REPORT': {
+                'Ver': 1,
+                'Type': 60,
+                'ID': 0,
             }})
+
+    def _readerConfig(self):
+        """Return a SET_READER_CONFIG that sets up the triggering GPIs."""
+        ports = self.gpiPorts()
+        msg = {
+            'Ver':  1,
+            'Type': 3,
+            'ID':   0,
+            'ResetToFactoryDefaults': False,
+            'ReaderEventNotificationSpec': {
+                'EventNotificationState': {
+                        'HoppingEvent': False,
+                        'GPIEvent': bool(ports),
+                        'ROSpecEvent': False,
+                        'ReportBufferFillWarning': False,
+                        'ReaderExceptionEvent': False,
+                        'RFSurveyEvent': False,
+                        'AISpecEvent': False,
+                        'AISpecEventWithSingulation': False,
+                        'AntennaEvent': False,
+                        ## Next one will only be available
+                        ## with llrp v2 (spec 1_1)
+                        #'SpecLoopEvent': True,
+                },
+            }
+        }
+        # enable the GPIs that trigger ROSpecs, and disable those that no
+        # longer do
+        msg['GPIPortCurrentState'] = [
+            {'GPIPortNum': port, 'Config': port in ports}
+            for port in sorted(set(ports) | set(self._gpi_ports))]
+        self._gpi_ports = ports
+        return msg
+
+    def _updateGPIConfig(self):
+        """Resend the GPI settings if gpiPorts() has changed since.
+
+        Sent without a state change, like the ROSpecs added by addROSpec().
+        Returns a Deferred that fires when the reader has applied them, or
+        None if there is nothing to change.
+        """
+        if self.gpiPorts() == self._gpi_ports:
+            return None
+        self.sendMessage({'SET_READER_CONFIG': self._readerConfig()})
+        d = defer.Deferred()
+        self._deferreds['SET_READER_CONFIG_RESPONSE'].append(d)
+        return d
+
+    def send_SET_READER_CONFIG(self, onCompletion):
+        msg = self._readerConfig()
+        if self.hold_events_and_reports:
+            msg['EventsAndReports'] = {
+                'HoldEventsAndReportsUponReconnect': True,
+            }
+        self.sendMessage({'SET_READER_CONFIG': msg})
         self.setState(LLRPClient.STATE_SENT_SET_CONFIG)
         self._deferreds['SET_READER_CONFIG_RESPONSE'].append(
             onCompletion)
@@ -862,7 +1207,8 @@ class LLRPClient(LineReceiver):
         except Exception as ex:
             logger.exception(ex)
         logger.debug('sent ADD_ROSPEC')
-        self.setState(LLRPClient.STATE_SENT_ADD_ROSPEC)
+        if self.state != LLRPClient.STATE_INVENTORYING:
+            self.setState(LLRPClient.STATE_SENT_ADD_ROSPEC)
         self._deferreds['ADD_ROSPEC_RESPONSE'].append(onCompletion)
 
     def send_ENABLE_ROSPEC(self, _, rospec, onCompletion):
@@ -873,7 +1219,8 @@ class LLRPClient(LineReceiver):
                 'ID':   0,
                 'ROSpecID': rospec['ROSpecID']
             }})
-        self.setState(LLRPClient.STATE_SENT_ENABLE_ROSPEC)
+        if self.state != LLRPClient.STATE_INVENTORYING:
+            self.setState(LLRPClient.STATE_SENT_ENABLE_ROSPEC)
         self._deferreds['ENABLE_ROSPEC_RESPONSE'].append(onCompletion)
 
     def send_START_ROSPEC(self, _, rospec, onCompletion):
@@ -1036,12 +1383,16 @@ class LLRPClient(LineReceiver):
         self.send_DISABLE_ACCESSSPEC(accessSpecID, onCompletion=d)
 
     def startInventory(self, proto=None, force_regen_rospec=False):
-        """Add a ROSpec to the reader and enable it."""
+        """Add the ROSpecs to the reader and enable them."""
         if self.state == LLRPClient.STATE_INVENTORYING:
             logger.warn('ignoring startInventory() while already inventorying')
             return None
 
         rospec = self.getROSpec(force_new=force_regen_rospec)['ROSpec']
+        self.rospecs = {1: self.rospec}
+        for rospecid in sorted(self.extra_rospecs):
+            self.rospecs[rospecid] = self.buildROSpec(
+                rospecid, **self.extra_rospecs[rospecid])
 
         logger.info('starting inventory')
 
@@ -1053,6 +1404,9 @@ class LLRPClient(LineReceiver):
         # logger.debug('made started_rospec')
 
         enabled_rospec = defer.Deferred()
+        for rospecid in sorted(self.rospecs)[1:]:
+            enabled_rospec.addCallback(self._addROSpec,
+                                       self.rospecs[rospecid]['ROSpec'])
         enabled_rospec.addCallback(self._setState_wrapper,
                                    LLRPClient.STATE_INVENTORYING)
         # enabled_rospec.addCallback(self.send_START_ROSPEC, rospec,
@@ -1066,39 +1420,216 @@ class LLRPClient(LineReceiver):
         added_rospec.addErrback(self.panic, 'ADD_ROSPEC failed')
         logger.debug('made added_rospec')
 
-        self.send_ADD_ROSPEC(rospec, onCompletion=added_rospec)
+        gpi = self._updateGPIConfig()
+        if gpi is None:
+            self.send_ADD_ROSPEC(rospec, onCompletion=added_rospec)
+            return
+        gpi.addCallback(lambda _: self.send_ADD_ROSPEC(
+            rospec, onCompletion=added_rospec))
+        gpi.addErrback(self.panic, 'SET_READER_CONFIG failed')
+
+    def _addROSpec(self, _, rospec):
+        """Add and enable one more ROSpec.
+
+        Returns a Deferred that fires when the reader has enabled it, or
+        fails if the reader refuses either step.  While inventorying, the
+        client stays in STATE_INVENTORYING throughout.
+        """
+        enabled = defer.Deferred()
+        added = defer.Deferred()
+        added.addCallback(self.send_ENABLE_ROSPEC, rospec,
+                          onCompletion=enabled)
+        added.addErrback(enabled.errback)
+        self.send_ADD_ROSPEC(rospec, onCompletion=added)
+        return enabled
 
     def getROSpec(self, force_new=False):
         if self.rospec and not force_new:
             return self.rospec
 
         # create an ROSpec to define the reader's inventorying behavior
+        self.rospec = self.buildROSpec(1, priority=self.rospec_priority)
+        return self.rospec
+
+    def buildROSpec(self, rospecid, **settings):
+        """Build an LLRPROSpec from this client's settings.
+
+        Keyword arguments, named as in LLRPClient.EXTRA_ROSPEC_SETTINGS,
+        override the client's settings.
+        """
+        unknown = set(settings) - set(LLRPClient.EXTRA_ROSPEC_SETTINGS)
+        if unknown:
+            raise LLRPError('cannot set {} for ROSpec {}'.format(
+                ', '.join(sorted(unknown)), rospecid))
+        antennas = settings.get('antennas', self.antennas)
+        tx_power = settings.get('tx_power')
+        if tx_power is None:
+            tx_power = {ant: self.tx_power.get(ant, 0) for ant in antennas}
+        tx_power = self.perAntennaTxPower(tx_power, antennas)
+        if self.tx_power_table:
+            tx_power = {ant: idx for ant, (idx, _)
+                        in self.get_tx_power(tx_power).items()}
+
+        def setting(name):
+            return settings.get(name, getattr(self, name))
+
         rospec_kwargs = dict(
-            duration_sec=self.duration,
-            report_every_n_tags=self.report_every_n_tags,
-            report_timeout_ms=self.report_timeout_ms,
-            tx_power=self.tx_power,
-            antennas=self.antennas,
-            tag_content_selector=self.tag_content_selector,
-            session=self.session,
-            tari=self.tari,
-            tag_population=self.tag_population
+            priority=settings.get('priority', 0),
+            duration_sec=setting('duration'),
+            report_every_n_tags=setting('report_every_n_tags'),
+            report_timeout_ms=setting('report_timeout_ms'),
+            tx_power=tx_power,
+            antennas=antennas,
+            tag_content_selector=setting('tag_content_selector'),
+            session=setting('session'),
+            tari=setting('tari'),
+            tag_population=setting('tag_population')
         )
-        if self.tag_filter_mask is not None:
-            rospec_kwargs['tag_filter_mask'] = self.tag_filter_mask
-        logger.info('Impinj search mode? %s', self.impinj_search_mode)
-        if self.impinj_search_mode is not None:
-            rospec_kwargs['impinj_search_mode'] = self.impinj_search_mode
-        if self.impinj_tag_content_selector is not None:
+        if setting('tag_filter_mask') is not None:
+            rospec_kwargs['tag_filter_mask'] = setting('tag_filter_mask')
+        logger.info('Impinj search mode? %s', setting('impinj_search_mode'))
+        if setting('impinj_search_mode') is not None:
+            rospec_kwargs['impinj_search_mode'] = setting('impinj_search_mode')
+        if setting('impinj_tag_content_selector') is not None:
             rospec_kwargs['impinj_tag_content_selector'] = \
-                self.impinj_tag_content_selector
-        if self.impinj_fixed_frequency_param is not None:
+                setting('impinj_tag_content_selector')
+        if setting('impinj_fixed_frequency_param') is not None:
             rospec_kwargs['impinj_fixed_frequency_param'] = \
-                self.impinj_fixed_frequency_param
+                setting('impinj_fixed_frequency_param')
+        if setting('antenna_dwell') is not None:
+            rospec_kwargs['antenna_dwell'] = setting('antenna_dwell')
+        rospec_kwargs['start_trigger'] = setting('start_trigger')
+        rospec_kwargs['stop_trigger'] = setting('stop_trigger')
+        if self.report_pull_interval:
+            # buffer reports on the reader until GET_REPORT
+            rospec_kwargs['report_trigger'] = 'None'
+
+        rospec = LLRPROSpec(self.reader_mode, rospecid, **rospec_kwargs)
+        logger.debug('ROSpec: %s', rospec)
+        return rospec
+
+    def addROSpec(self, rospecid, **settings):
+        """Run another ROSpec alongside the main one.
+
+        `rospecid` must be greater than 1, which is the main ROSpec's ID.
+        Settings are named as in LLRPClient.EXTRA_ROSPEC_SETTINGS; those not
+        given are the client's.  LLRP priorities run from 0 (highest) to 7:
+        while a ROSpec is active, lower-priority ones wait, so give the
+        higher-priority ROSpec a duration (or other stop trigger) to leave
+        the others time to run.
+
+        If inventory is running, the ROSpec is added and enabled at once
+        (after enabling any GPIs that newly trigger it) and the returned
+        Deferred fires when the reader has enabled it;
+        otherwise it is added at the next startInventory() and None is
+        returned.
+        """
+        if rospecid <= 1 or rospecid in self.extra_rospecs:
+            raise LLRPError('ROSpec ID {} is taken'.format(rospecid))
+        rospec = self.buildROSpec(rospecid, **settings)
+        self.extra_rospecs[rospecid] = settings
+        if self.capabilities:
+            try:
+                self.checkGPIPorts(self.capabilities)
+            except ReaderConfigurationError:
+                del self.extra_rospecs[rospecid]
+                raise
+        if self.state != LLRPClient.STATE_INVENTORYING:
+            return None
+        self.rospecs[rospecid] = rospec
+        d = self._updateGPIConfig()
+        if d is None:
+            d = self._addROSpec(None, rospec['ROSpec'])
+        else:
+            d.addCallback(self._addROSpec, rospec['ROSpec'])
+        d.addErrback(self._forgetROSpec, rospecid)
+        d.addErrback(self.complain, 'ADD_ROSPEC failed')
+        return d
 
-        self.rospec = LLRPROSpec(self.reader_mode, 1, **rospec_kwargs)
-        logger.debug('ROSpec: %s', self.rospec)
-        return self.rospec
+    def _forgetROSpec(self, failure, rospecid):
+        """Drop a ROSpec the reader refused, so that its ID can be reused."""
+        self.extra_rospecs.pop(rospecid, None)
+        self.rospecs.pop(rospecid, None)
+        return failure
+
+    def removeROSpec(self, rospecid):
+        """Stop and delete a ROSpec added with addROSpec().
+
+        Returns a Deferred that fires when the reader has deleted it, or
+        None if inventory isn't running.
+        """
+        if rospecid not in self.extra_rospecs:
+            raise LLRPError('no ROSpec {}'.format(rospecid))
+        del self.extra_rospecs[rospecid]
+        if self.rospecs.pop(rospecid, None) is None or \
+                self.state != LLRPClient.STATE_INVENTORYING:
+            return None
+        self.sendMessage({
+            'DELETE_ROSPEC': {
+                'Ver':  1,
+                'Type': 21,
+                'ID':   0,
+                'ROSpecID': rospecid
+            }})
+        d = defer.Deferred()
+        d.addErrback(self.complain, 'DELETE_ROSPEC failed')
+        self._deferreds['DELETE_ROSPEC_RESPONSE'].append(d)
+        return d
+
+    def reconfigure(self, **settings):
+        """Change inventory settings after the client has been created.
+
+        Settings are named like the constructor's arguments; only those in
+        LLRPClient.ROSPEC_SETTINGS may be changed.  If the reader's
+        capabilities are known, the new settings are validated against them.
+        If inventory is running, it is stopped and restarted with a new
+        ROSpec, and the returned Deferred fires when the reader has deleted
+        the old ROSpec; otherwise the new settings take effect at the next
+        startInventory() and None is returned.
+        """
+        unknown = set(settings) - set(LLRPClient.ROSPEC_SETTINGS)
+        if unknown:
+            raise LLRPError('cannot reconfigure {}'.format(
+                ', '.join(sorted(unknown))))
+        if 'antennas' in settings or 'tx_power' in settings:
+            antennas = settings.get('antennas', self.antennas)
+            tx_power = settings.get('tx_power', {
+                ant: self.tx_power.get(ant, 0) for ant in antennas})
+            settings['tx_power'] = self.perAntennaTxPower(tx_power, antennas)
+        dwell = settings.get('antenna_dwell', self.antenna_dwell)
+        if dwell is not None and set(dwell) != set(
+                settings.get('antennas', self.antennas)):
+            raise LLRPError('Must set antenna_dwell for all antennas')
+        population = settings.get('tag_population', self.tag_population)
+        if isinstance(population, dict) and not set(
+                settings.get('antennas', self.antennas)) <= set(population):
+            raise LLRPError('Must set tag_population for all antennas')
+        logger.info('reconfiguring: %s', settings)
+        # validation may also change derived settings; restore them all if
+        # the reader can't take the new ones
+        previous = {name: getattr(self, name)
+                    for name in LLRPClient.ROSPEC_SETTINGS + ('reader_mode',)}
+        for name, value in settings.items():
+            setattr(self, name, value)
+
+        if self.capabilities:
+            try:
+                if self.tx_power_table:
+                    self.tx_power = {
+                        ant: idx for ant, (idx, _)
+                        in self.get_tx_power(self.tx_power).items()}
+                self.parseCapabilities(self.capabilities)
+            except Exception:
+                for name, value in previous.items():
+                    setattr(self, name, value)
+                raise
+
+        self.rospec = None
+        if self.state == LLRPClient.STATE_INVENTORYING:
+            d = self.stopPolitely()
+            d.addCallback(self.startInventory, force_regen_rospec=True)
+            return d
+        return None
 
     def stopPolitely(self, disconnect=False):
         """Delete all active ROSpecs.  Return a Deferred that will be called
@@ -1107,6 +1638,9 @@ class LLRPClient(LineReceiver):
         if disconnect:
             logger.info('will disconnect when stopped')
             self.disconnecting = True
+        if self._report_puller is not None and self._report_puller.running:
+            # collect what's left in the reader's buffer
+            self.send_GET_REPORT()
         self.sendMessage({
             'DELETE_ACCESSSPEC': {
                 'Ver': 1,
@@ -1220,7 +1754,12 @@ class LLRPClient(LineReceiver):
             d.addCallback(self.startInventory, force_regen_rospec=True)
 
     def pause(self, duration_seconds=0, force=False, force_regen_rospec=False):
-        """Pause an inventory operation for a set amount of time."""
+        """Pause an inventory operation for a set amount of time.
+
+        Every ROSpec is disabled, including those added with addROSpec().
+        Returns a Deferred that fires when the reader has disabled them, and
+        fails if it couldn't; or None if not inventorying.
+        """
         logger.debug('pause(%s)', duration_seconds)
         if self.state != LLRPClient.STATE_INVENTORYING:
             if not force:
@@ -1233,20 +1772,20 @@ class LLRPClient(LineReceiver):
         if duration_seconds:
             logger.info('pausing for %s seconds', duration_seconds)
 
-        rospec = self.getROSpec(force_new=force_regen_rospec)['ROSpec']
+        self.getROSpec(force_new=force_regen_rospec)
 
         self.sendMessage({
             'DISABLE_ROSPEC': {
                 'Ver':  1,
                 'Type': 25,
                 'ID':   0,
-                'ROSpecID': rospec['ROSpecID']
+                'ROSpecID': 0  # all ROSpecs
             }})
         self.setState(LLRPClient.STATE_PAUSING)
 
         d = defer.Deferred()
         d.addCallback(self._setState_wrapper, LLRPClient.STATE_PAUSED)
-        d.addErrback(self.complain, 'pause() failed')
+        d.addErrback(self._pauseFailed)
         self._deferreds['DISABLE_ROSPEC_RESPONSE'].append(d)
 
         if duration_seconds > 0:
@@ -1256,7 +1795,18 @@ class LLRPClient(LineReceiver):
 
         return d
 
+    def _pauseFailed(self, failure):
+        if self.state == LLRPClient.STATE_PAUSING:
+            # the ROSpecs are still enabled
+            self.setState(LLRPClient.STATE_INVENTORYING)
+        return self.panic(failure, 'pause() failed')
+
     def resume(self, force_regen_rospec=False):
+        """Re-enable every ROSpec after pause().
+
+        Returns a Deferred that fires when the reader has enabled them, or
+        None if not paused.
+        """
         logger.debug('resuming, force_regen_rospec=%s', force_regen_rospec)
 
         if force_regen_rospec:
@@ -1278,7 +1828,9 @@ class LLRPClient(LineReceiver):
         d = defer.Deferred()
         d.addCallback(self._setState_wrapper, LLRPClient.STATE_INVENTORYING)
         d.addErrback(self.panic, 'resume() failed')
-        self.send_ENABLE_ROSPEC(None, self.rospec['ROSpec'], onCompletion=d)
+        self.send_ENABLE_ROSPEC(None, {'ROSpecID': 0},  # all ROSpecs
+                                onCompletion=d)
+        return d
 
     def sendMessage(self, msg_dict):
         """Serialize and send a dict LLRP Message
@@ -1324,8 +1876,54 @@ class LLRPClientFactory(ReconnectingClientFactory):
         # message callbacks to pass to connected clients
         self._message_callbacks = defaultdict(list)
 
+        # callbacks to run when a client's connection goes away
+        self._removed_callbacks = []
+
         self.protocols = []
 
+        # index of self.protocols by reader host name, so that per-reader
+        # operations don't have to scan the whole list
+        self._protocols_by_host = defaultdict(list)
+
+        # ROSpecs left running on readers that hold reports for us while
+        # disconnected (see LLRPClient.drainHeldReports)
+        self._held_rospecs = {}
+
+    def addProtocol(self, proto):
+        """Register a newly connected LLRPClient."""
+        self.protocols.append(proto)
+        self._protocols_by_host[proto.peername[0]].append(proto)
+
+    def removeProtocol(self, proto):
+        """Unregister an LLRPClient whose connection has gone away."""
+        self.protocols.remove(proto)
+        host = proto.peername[0]
+        self._protocols_by_host[host].remove(proto)
+        if not self._protocols_by_host[host]:
+            del self._protocols_by_host[host]
+        if (proto.hold_events_and_reports and
+                proto.state == LLRPClient.STATE_INVENTORYING):
+            self._held_rospecs[self.heldSessionKey(proto)] = proto.rospec
+        for cb in self._removed_callbacks:
+            cb(proto)
+
+    def addProtocolRemovedCallback(self, cb):
+        """Call cb(proto) when a client's connection goes away, however it
+        ends; its state may still be that of a working connection."""
+        self._removed_callbacks.append(cb)
+
+    def heldSessionKey(self, proto):
+        """Identify a reader across reconnections."""
+        return proto.peername
+
+    def popHeldROSpec(self, proto):
+        """Return the ROSpec proto's reader kept running for us, if any."""
+        return self._held_rospecs.pop(self.heldSessionKey(proto), None)
+
+    def getProtocols(self, host):
+        """Return the list of connected LLRPClients for reader `host`."""
+        return list(self._protocols_by_host.get(host, ()))
+
     def startedConnecting(self, connector):
         dst = connector.getDestination()
         logger.info('connecting to %s:%d...', dst.host, dst.port)
@@ -1336,12 +1934,14 @@ class LLRPClientFactory(ReconnectingClientFactory):
     def addTagReportCallback(self, cb):
         self._message_callbacks['RO_ACCESS_REPORT'].append(cb)
 
-    def buildProtocol(self, addr):
-        """Get a new LLRP client protocol object.
+    def addMessageCallback(self, msg_type, cb):
+        self._message_callbacks[msg_type].append(cb)
+
+    def getClientArgs(self, addr):
+        """Get the LLRPClient constructor arguments for a reader at addr.
 
         Consult self.antenna_dict to look up antennas to use.
         """
-        self.resetDelay()  # reset reconnection backoff state
         clargs = self.client_args.copy()
 
         # optionally configure antennas from self.antenna_dict, which looks
@@ -1361,7 +1961,12 @@ class LLRPClientFactory(ReconnectingClientFactory):
         if self.start_first and not self.protocols:
             # this is the first protocol, so let's start it inventorying
             clargs['start_inventory'] = True
-        proto = LLRPClient(factory=self, **clargs)
+        return clargs
+
+    def buildProtocol(self, addr):
+        """Get a new LLRP client protocol object."""
+        self.resetDelay()  # reset reconnection backoff state
+        proto = LLRPClient(factory=self, **self.getClientArgs(addr))
 
         # register state-change callbacks with new client
         for state, cbs in self._state_callbacks.items():
@@ -1415,8 +2020,7 @@ class LLRPClientFactory(ReconnectingClientFactory):
         Otherwise, set it for that specific reader.
         """
         if peername:
-            protocols = [p for p in self.protocols
-                         if p.peername[0] == peername]
+            protocols = self.getProtocols(peername)
         else:
             protocols = self.protocols
         for proto in protocols:
@@ -1434,3 +2038,84 @@ class LLRPClientFactory(ReconnectingClientFactory):
                   for proto in self.protocols}
         logger.info('states: %s', states)
         return states
+
+
+class LLRPServerFactory(LLRPClientFactory):
+    """Accept connections that readers initiate.
+
+    LLRP readers can be configured to connect to the client rather than wait
+    for the client to connect to them.  This factory listens on one port for
+    any number of readers and runs the usual LLRPClient state machine on each
+    connection.
+
+    Per-reader settings come from `reader_config`, which is either a dict or a
+    callable taking (reader_id, host) and returning a dict or None.  When
+    `reader_config` is a dict, its keys may be reader IP addresses or reader
+    IDs (the hex-encoded ReaderID of the reader's Identification parameter,
+    usually its MAC address), and its values are dicts of LLRPClient
+    arguments.  Settings found by IP address are applied when the connection
+    is accepted; settings found by reader ID are applied (with
+    LLRPClient.reconfigure(), so they are limited to
+    LLRPClient.ROSPEC_SETTINGS) once the reader has identified itself, before
+    inventory starts.
+    """
+
+    def __init__(self, reader_config=None, **kwargs):
+        LLRPClientFactory.__init__(self, **kwargs)
+        self.reader_config = reader_config or {}
+
+        # reader ID -> LLRPClient, for readers that have identified themselves
+        self.readers_by_id = {}
+
+        self._message_callbacks['GET_READER_CONFIG_RESPONSE'].append(
+            self._identifyReader)
+
+    def listen(self, port=LLRP_PORT, interface='', backlog=511):
+        """Start accepting reader connections; returns the IListeningPort."""
+        logger.info('listening for readers on %s:%d', interface or '*', port)
+        return reactor.listenTCP(port, self, backlog=backlog,
+                                 interface=interface)
+
+    def lookupReaderConfig(self, reader_id, host):
+        """Find the settings for a reader, or return None."""
+        if callable(self.reader_config):
+            return self.reader_config(reader_id, host)
+        if reader_id is not None:
+            return self.reader_config.get(reader_id)
+        return self.reader_config.get(host)
+
+    def getClientArgs(self, addr):
+        clargs = LLRPClientFactory.getClientArgs(self, addr)
+        clargs.update(self.lookupReaderConfig(None, addr.host) or {})
+        return clargs
+
+    def _identifyReader(self, lmsg):
+        proto = lmsg.proto
+        reader_id = LLRPClient.parseReaderID(
+            lmsg.msgdict['GET_READER_CONFIG_RESPONSE'])
+        if reader_id is None:
+            logger.warning('reader %s did not identify itself',
+                           proto.peername)
+            return
+        logger.info('reader %s identified as %s', proto.peername, reader_id)
+        proto.reader_id = reader_id
+        self.readers_by_id[reader_id] = proto
+
+        settings = self.lookupReaderConfig(reader_id, proto.peer_ip)
+        if not settings:
+            return
+        try:
+            proto.reconfigure(**settings)
+        except LLRPError:
+            logger.exception('bad configuration for reader %s; '
+                             'disconnecting', reader_id)
+            proto.transport.loseConnection()
+
+    def heldSessionKey(self, proto):
+        # readers connect from a new port each time
+        return proto.reader_id or proto.peer_ip
+
+    def removeProtocol(self, proto):
+        LLRPClientFactory.removeProtocol(self, proto)
+        if self.readers_by_id.get(proto.reader_id) is proto:
+            del self.readers_by_id[proto.reader_id]
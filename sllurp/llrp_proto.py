@@ -264,7 +264,10 @@ def decode_GetReaderCapabilitiesResponse(data):
     if ret:
         msg['RegulatoryCapabilities'] = ret
 
-    if len(body):
+    ret, body = decode('C1G2LLRPCapabilities')(body)
+    if ret:
+        msg['AirProtocolLLRPCapabilities'] = {'C1G2LLRPCapabilities': ret}
+    elif len(body):
         msg['AirProtocolLLRPCapabilities'] = body
 
     return msg
@@ -427,7 +430,11 @@ def encode_SetReaderConfig(msg):
     if 'ReaderEventNotificationSpec' in msg:
         data += encode('ReaderEventNotificationSpec')(
             msg['ReaderEventNotificationSpec'])
+    for gpi in msg.get('GPIPortCurrentState', ()):
+        data += encode('GPIPortCurrentState')(gpi)
     # XXX other params
+    if 'EventsAndReports' in msg:
+        data += encode('EventsAndReports')(msg['EventsAndReports'])
     return data
 
 
@@ -756,25 +763,112 @@ Message_struct['DISABLE_ROSPEC_RESPONSE'] = {
 }
 
 
-# 16.1.30 RO_ACCESS_REPORT
-def decode_ROAccessReport(data):
+# 16.1.15 GET_ROSPECS
+def encode_GetROSpecs(msg):
+    return b''
+
+
+Message_struct['GET_ROSPECS'] = {
+    'type': 26,
+    'fields': [
+        'Ver', 'Type', 'ID',
+    ],
+    'encode': encode_GetROSpecs
+}
+
+
+# 16.1.16 GET_ROSPECS_RESPONSE
+def decode_GetROSpecsResponse(data):
     msg = LLRPMessageDict()
     logger.debug(func())
 
     # Decode parameters
+    ret, body = decode('LLRPStatus')(data)
+    if ret:
+        msg['LLRPStatus'] = ret
+    else:
+        raise LLRPError('missing or invalid LLRPStatus parameter')
+
+    msg['ROSpec'] = []
+    while body:
+        ret, body = decode('ROSpec')(body)
+        if not ret:
+            break
+        msg['ROSpec'].append(ret)
+
+    # Check the end of the message
+    if len(body) > 0:
+        raise LLRPError('Junk at end of message ({} bytes)'.format(len(body)))
+
+    return msg
+
+
+Message_struct['GET_ROSPECS_RESPONSE'] = {
+    'type': 36,
+    'fields': [
+        'Ver', 'Type', 'ID',
+        'LLRPStatus',
+        'ROSpec'
+    ],
+    'decode': decode_GetROSpecsResponse
+}
+
+
+# 16.1.29 GET_REPORT
+def encode_GetReport(msg):
+    return b''
+
+
+Message_struct['GET_REPORT'] = {
+    'type': 60,
+    'fields': [
+        'Ver', 'Type', 'ID',
+    ],
+    'encode': encode_GetReport
+}
+
+
+# 16.1.30 RO_ACCESS_REPORT
+def tag_report_epc(data, offset):
+    """Return the raw EPC bytes of the TagReportData at data[offset:]."""
+    start = offset + par_header_len
+    if struct.unpack_from('!B', data, start)[0] == \
+            0x80 | Message_struct['EPC-96']['type']:
+        return bytes(data[start + 1:start + 13])
+    # EPCData: parameter header, EPCLengthBits, EPC
+    _, eparlen = struct.unpack_from(par_header, data, start)
+    return bytes(data[start + par_header_len + 2:start + eparlen])
+
+
+def decode_ROAccessReport(data, epc_filter=None):
+    msg = LLRPMessageDict()
+    logger.debug(func())
+
+    # Decode parameters.  Hand each TagReportData only its own bytes, so
+    # that reports with many tags (e.g., GET_REPORT responses) decode in
+    # linear time.  Tags that epc_filter (see sllurp.epc.filter) rejects
+    # are skipped without decoding.
     msg['TagReportData'] = []
-    while True:
+    tag_type = Message_struct['TagReportData']['type']
+    offset = 0
+    while offset + par_header_len <= len(data):
+        partype, parlen = struct.unpack_from(par_header, data, offset)
+        if (partype & BITMASK(10)) != tag_type or parlen < par_header_len:
+            break
+        if epc_filter is not None and \
+                not epc_filter.accepts(tag_report_epc(data, offset)):
+            offset += parlen
+            continue
         try:
-            ret, data = decode('TagReportData')(data)
+            ret, _ = decode('TagReportData')(data[offset:offset + parlen])
         except TypeError:  # XXX
             logger.error('Unable to decode TagReportData')
             break
-        # print('len(ret) = {}'.format(len(ret)))
-        # print('len(data) = {}'.format(len(data)))
         if ret:
             msg['TagReportData'].append(ret)
         else:
             break
+        offset += parlen
 
     return msg
 
@@ -1364,6 +1458,44 @@ Message_struct['LLRPCapabilities'] = {
 }
 
 
+# 16.3.1.1.1 C1G2LLRPCapabilities Parameter
+def decode_C1G2LLRPCapabilities(data):
+    logger.debug(func())
+    par = {}
+
+    if len(data) == 0:
+        return None, data
+
+    header = data[0:par_header_len]
+    msgtype, length = struct.unpack(par_header, header)
+    msgtype = msgtype & BITMASK(10)
+    if msgtype != Message_struct['C1G2LLRPCapabilities']['type']:
+        return (None, data)
+    body = data[par_header_len:length]
+    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+
+    # Decode fields
+    (flags,
+     par['MaxNumSelectFiltersPerQuery']) = struct.unpack('!BH', body[:3])
+
+    par['CanSupportBlockErase'] = (flags & BIT(7) == BIT(7))
+    par['CanSupportBlockWrite'] = (flags & BIT(6) == BIT(6))
+
+    return par, data[length:]
+
+
+Message_struct['C1G2LLRPCapabilities'] = {
+    'type': 327,
+    'fields': [
+        'Type',
+        'CanSupportBlockErase',
+        'CanSupportBlockWrite',
+        'MaxNumSelectFiltersPerQuery'
+    ],
+    'decode': decode_C1G2LLRPCapabilities
+}
+
+
 # 16.2.3.2 GeneralDeviceCapabilities Parameter
 def decode_GeneralDeviceCapabilities(data):
     logger.debug(func())
@@ -1588,7 +1720,7 @@ def decode_GPIOCapabilities(data):
 
     # Decode fields
     (par['NumGPIs'],
-     par['NumGPIs']) = struct.unpack('!HH', body)
+     par['NumGPOs']) = struct.unpack('!HH', body)
 
     return par, data[length:]
 
@@ -1638,7 +1770,12 @@ def encode_ROSpec(par):
     msg_header_len = struct.calcsize(msg_header)
 
     data = encode('ROBoundarySpec')(par['ROBoundarySpec'])
-    data += encode('AISpec')(par['AISpec'])
+    aispecs = par['AISpec']
+    if isinstance(aispecs, list):
+        for aispec in aispecs:
+            data += encode('AISpec')(aispec)
+    else:  # only one AISpec
+        data += encode('AISpec')(aispecs)
     data += encode('ROReportSpec')(par['ROReportSpec'])
 
     data = struct.pack(msg_header, msgtype,
@@ -1648,6 +1785,31 @@ def encode_ROSpec(par):
     return data
 
 
+def decode_ROSpec(data):
+    """Decode a ROSpec's ID, priority and state; its sub-parameters are
+    skipped."""
+    logger.debug(func())
+    par = {}
+
+    if len(data) == 0:
+        return None, data
+
+    header = data[0:par_header_len]
+    msgtype, length = struct.unpack(par_header, header)
+    msgtype = msgtype & BITMASK(10)
+    if msgtype != Message_struct['ROSpec']['type']:
+        return (None, data)
+    body = data[par_header_len:length]
+    logger.debug('%s (type=%d len=%d)', func(), msgtype, length)
+
+    # Decode fields
+    (par['ROSpecID'], par['Priority'], state) = struct.unpack('!IBB',
+                                                              body[:6])
+    par['CurrentState'] = ROSpecState_Type2Name[state]
+
+    return par, data[length:]
+
+
 Message_struct['ROSpec'] = {
     'type': 177,
     'fields': [
@@ -1660,7 +1822,8 @@ Message_struct['ROSpec'] = {
         'RFSurveySpec',
         'ROReportSpec'
     ],
-    'encode': encode_ROSpec
+    'encode': encode_ROSpec,
+    'decode': decode_ROSpec
 }
 
 
@@ -2225,16 +2388,49 @@ Message_struct['PeriodicTriggerValue'] = {
 }
 
 
+# 16.2.4.1.1.1.2 GPITriggerValue Parameter
+def encode_GPITriggerValue(par):
+    msgtype = Message_struct['GPITriggerValue']['type']
+
+    msg_header = '!HH'
+    msg_header_len = struct.calcsize(msg_header)
+
+    data = struct.pack('!HBI', par['GPIPortNum'],
+                       (int(par['GPIEvent']) << 7) & 0xff,
+                       int(par.get('Timeout', 0)))
+
+    data = struct.pack(msg_header, msgtype,
+                       len(data) + msg_header_len) + data
+    return data
+
+
+Message_struct['GPITriggerValue'] = {
+    'type': 181,
+    'fields': [
+        'Type',
+        'GPIPortNum',
+        'GPIEvent',
+        'Timeout'
+    ],
+    'encode': encode_GPITriggerValue
+}
+
+
 # 16.2.4.1.1.2 ROSpecStopTrigger Parameter
 def encode_ROSpecStopTrigger(par):
     msgtype = Message_struct['ROSpecStopTrigger']['type']
     t_type = StopTrigger_Name2Type[par['ROSpecStopTriggerType']]
     duration = par['DurationTriggerValue']
 
-    msg_header = '!HHBI'
+    msg_header = '!HH'
     msg_header_len = struct.calcsize(msg_header)
 
-    data = struct.pack(msg_header, msgtype, msg_header_len, t_type, duration)
+    data = struct.pack('!BI', t_type, duration)
+    if par['ROSpecStopTriggerType'] == 'GPI with timeout':
+        data += encode('GPITriggerValue')(par['GPITriggerValue'])
+
+    data = struct.pack(msg_header, msgtype,
+                       len(data) + msg_header_len) + data
     return data
 
 
@@ -2301,7 +2497,6 @@ def encode_AISpecStopTrigger(par):
     data = struct.pack('!B', t_type)
     data += struct.pack('!I', int(duration))
     if 'GPITriggerValue' in par:
-        # TODO implement GPITriggerValue Message_struct
         data += encode('GPITriggerValue')(par['GPITriggerValue'])
     if 'TagObservationTrigger' in par:
         data += encode('TagObservationTrigger')(par['TagObservationTrigger'])
@@ -2520,6 +2715,9 @@ def encode_C1G2Filter(par):
     if 'C1G2TagInventoryMask' in par:
         data += encode('C1G2TagInventoryMask')(
             par['C1G2TagInventoryMask'])
+    if 'C1G2TagInventoryStateUnawareFilterAction' in par:
+        data += encode('C1G2TagInventoryStateUnawareFilterAction')(
+            par['C1G2TagInventoryStateUnawareFilterAction'])
     data = struct.pack(msg_header, msgtype,
                        len(data) + struct.calcsize(msg_header)) + data
     return data
@@ -2529,7 +2727,8 @@ Message_struct['C1G2Filter'] = {
     'type': 331,
     'T': 0,
     'fields': [
-        'C1G2TagInventoryMask'
+        'C1G2TagInventoryMask',
+        'C1G2TagInventoryStateUnawareFilterAction'
     ],
     'encode': encode_C1G2Filter
 }
@@ -2538,7 +2737,7 @@ Message_struct['C1G2Filter'] = {
 def encode_C1G2TagInventoryMask(par):
     msgtype = Message_struct['C1G2TagInventoryMask']['type']
     msg_header = '!HH'
-    maskbitcount = len(par['TagMask'])*4
+    maskbitcount = par.get('MaskBitCount', len(par['TagMask'])*4)
     if len(par['TagMask']) % 2 != 0:    # check for odd numbered length hexstring
         par['TagMask'] += '0'           # pad with zero
     data = struct.pack('!B', par['MB'] << 6)
@@ -2555,11 +2754,40 @@ Message_struct['C1G2TagInventoryMask'] = {
     'fields': [
         'MB',
         'Pointer',
-        'TagMask'
+        'TagMask',
+        'MaskBitCount'
     ],
     'encode': encode_C1G2TagInventoryMask
 }
 
+
+# 16.3.1.2.1.1.3 C1G2TagInventoryStateUnawareFilterAction Parameter
+C1G2FilterAction_Name2Type = {
+    'Select_Unselect': 0,
+    'Select_DoNothing': 1,
+    'DoNothing_Unselect': 2,
+    'Unselect_DoNothing': 3,
+    'Unselect_Select': 4,
+    'DoNothing_Select': 5,
+}
+
+
+def encode_C1G2TagInventoryStateUnawareFilterAction(par):
+    msgtype = Message_struct['C1G2TagInventoryStateUnawareFilterAction'][
+        'type']
+    msg_header = '!HHB'
+    return struct.pack(msg_header, msgtype, struct.calcsize(msg_header),
+                       C1G2FilterAction_Name2Type[par['Action']])
+
+
+Message_struct['C1G2TagInventoryStateUnawareFilterAction'] = {
+    'type': 334,
+    'fields': [
+        'Action'
+    ],
+    'encode': encode_C1G2TagInventoryStateUnawareFilterAction
+}
+
 # 16.3.1.2.1.2 C1G2RFControl Parameter
 def encode_C1G2RFControl(par):
     msgtype = Message_struct['C1G2RFControl']['type']
@@ -2665,6 +2893,43 @@ Message_struct['ReaderEventNotificationSpec'] = {
 }
 
 
+# GPIPortCurrentState Parameter; the reader ignores State when it is set
+def encode_GPIPortCurrentState(par):
+    msgtype = Message_struct['GPIPortCurrentState']['type']
+    config = int(bool(par.get('Config', True)))
+    return struct.pack('!HHHBB', msgtype, struct.calcsize('!HHHBB'),
+                       par['GPIPortNum'], (config << 7) & 0xff,
+                       par.get('State', 0))
+
+
+Message_struct['GPIPortCurrentState'] = {
+    'type': 225,
+    'fields': [
+        'GPIPortNum',
+        'Config',
+        'State',
+    ],
+    'encode': encode_GPIPortCurrentState
+}
+
+
+# 16.2.6.12 EventsAndReports Parameter
+def encode_EventsAndReports(par):
+    msgtype = Message_struct['EventsAndReports']['type']
+    hold = int(bool(par['HoldEventsAndReportsUponReconnect']))
+    return struct.pack('!HHB', msgtype, struct.calcsize('!HHB'),
+                       (hold << 7) & 0xff)
+
+
+Message_struct['EventsAndReports'] = {
+    'type': 226,
+    'fields': [
+        'HoldEventsAndReportsUponReconnect',
+    ],
+    'encode': encode_EventsAndReports
+}
+
+
 # 16.2.7.1 TagReportContentSelector Parameter
 def encode_TagReportContentSelector(par):
     msgtype = Message_struct['TagReportContentSelector']['type']
@@ -3914,7 +4179,8 @@ class LLRPROSpec(dict):
                  tag_content_selector={}, tari=None,
                  session=2, tag_population=4, tag_filter_mask=[],
                  impinj_search_mode=None, impinj_tag_content_selector=None,
-                 impinj_fixed_frequency_param=None):
+                 impinj_fixed_frequency_param=None, report_trigger=None,
+                 antenna_dwell=None, start_trigger=None, stop_trigger=None):
         # Sanity checks
         if rospecid <= 0:
             raise LLRPError('invalid ROSpec message ID {} (need >0)'.format(
@@ -3934,6 +4200,25 @@ class LLRPROSpec(dict):
                 raise LLRPError('Must set tx_power for all antennas')
         else:
             raise LLRPError('tx_power must be dictionary or integer')
+        if antenna_dwell is not None and \
+                set(antennas) != set(antenna_dwell.keys()):
+            raise LLRPError('Must set antenna_dwell for all antennas')
+        if duration_sec is not None and stop_trigger is not None:
+            raise LLRPError('cannot set both a duration and a stop trigger')
+        if start_trigger is not None and 'period' in start_trigger:
+            if duration_sec is None and stop_trigger is None:
+                raise LLRPError('a periodic ROSpec needs a duration or a '
+                                'stop trigger')
+            if duration_sec is not None and \
+                    duration_sec >= start_trigger['period']:
+                raise LLRPError('ROSpec duration {} is not shorter than its '
+                                'period {}'.format(duration_sec,
+                                                   start_trigger['period']))
+        # tag_population may also be given per antenna
+        if not isinstance(tag_population, dict):
+            tag_population = {antenna: tag_population for antenna in antennas}
+        elif not set(antennas) <= set(tag_population.keys()):
+            raise LLRPError('Must set tag_population for all antennas')
 
         # if reader mode settings are specified, pepper them into this ROSpec
         override_tari = None
@@ -3961,19 +4246,19 @@ class LLRPROSpec(dict):
         }
         if tag_content_selector:
             tagReportContentSelector.update(tag_content_selector)
+        if report_trigger is None:
+            report_trigger = 'Upon_N_Tags_Or_End_Of_AISpec'
+        elif report_trigger not in ROReportTrigger_Name2Type:
+            raise LLRPError('invalid ROReportTrigger {}'.format(
+                            report_trigger))
 
         self['ROSpec'] = {
             'ROSpecID': rospecid,
             'Priority': priority,
             'CurrentState': state,
             'ROBoundarySpec': {
-                'ROSpecStartTrigger': {
-                    'ROSpecStartTriggerType': 'Immediate',
-                },
-                'ROSpecStopTrigger': {
-                    'ROSpecStopTriggerType': 'Null',
-                    'DurationTriggerValue': 0,
-                },
+                'ROSpecStartTrigger': self.startTrigger(start_trigger),
+                'ROSpecStopTrigger': self.stopTrigger(stop_trigger),
             },
             'AISpec': {
                 'AntennaIDs': antennas,
@@ -3988,7 +4273,7 @@ class LLRPROSpec(dict):
                 },
             },
             'ROReportSpec': {
-                'ROReportTrigger': 'Upon_N_Tags_Or_End_Of_AISpec',
+                'ROReportTrigger': report_trigger,
                 'TagReportContentSelector': tagReportContentSelector,
                 'N': 0,
             },
@@ -4023,21 +4308,31 @@ class LLRPROSpec(dict):
                     'TagInventoryStateAware': False,
                     'C1G2SingulationControl': {
                         'Session': session,
-                        'TagPopulation': tag_population,
+                        'TagPopulation': tag_population[antid],
                         'TagTransitTime': 0
                     },
                 }
             }
 
-            # apply one or more tag filters
+            # apply one or more tag filters; a tag matching any of them is
+            # inventoried.  A mask may be written 'hex/bits' to match a
+            # number of bits that isn't a multiple of 4.
             tag_filters = []
             for tfm in tag_filter_mask:
+                mask = {
+                    'MB': 1,    # EPC bank
+                    'Pointer': 0x20,    # Third word starts the EPC ID
+                    'TagMask': tfm
+                }
+                if '/' in tfm:
+                    mask['TagMask'], bits = tfm.split('/', 1)
+                    mask['MaskBitCount'] = int(bits)
                 tag_filters.append({
-                    'C1G2TagInventoryMask': {
-                        'MB': 1,    # EPC bank
-                        'Pointer': 0x20,    # Third word starts the EPC ID
-                        'TagMask': tfm
-                    }
+                    'C1G2TagInventoryMask': mask,
+                    'C1G2TagInventoryStateUnawareFilterAction': {
+                        'Action': 'Select_DoNothing' if tag_filters
+                        else 'Select_Unselect',
+                    },
                 })
             if tag_filters:
                 antconf['C1G2InventoryCommand']['C1G2Filter'] = tag_filters
@@ -4094,6 +4389,113 @@ class LLRPROSpec(dict):
                 },
             })
 
+        # one AISpec per antenna, each with its own stop trigger; the reader
+        # loops through them in order
+        if antenna_dwell is not None:
+            antconfs = {conf['AntennaID']: conf
+                        for conf in ips['AntennaConfiguration']}
+            self['ROSpec']['AISpec'] = [{
+                'AntennaIDs': [antid],
+                'AISpecStopTrigger': self.dwellTrigger(antenna_dwell[antid]),
+                'InventoryParameterSpec': {
+                    'InventoryParameterSpecID': i + 1,
+                    'ProtocolID': ips['ProtocolID'],
+                    'AntennaConfiguration': [antconfs[antid]],
+                },
+            } for i, antid in enumerate(antennas)]
+
+    @staticmethod
+    def startTrigger(trigger):
+        """Build a ROSpecStartTrigger.
+
+        `trigger` is None to start as soon as the ROSpec is enabled, or a
+        dict with:
+
+        - 'gpi' (a GPI port number) and optionally 'event' (the state that
+          starts the ROSpec, default True) to start when that GPI changes
+          state; or
+        - 'period' (seconds) and optionally 'offset' (seconds, default 0)
+          to start `offset` seconds after the ROSpec is enabled and every
+          `period` seconds after that.
+        """
+        if trigger is None:
+            return {'ROSpecStartTriggerType': 'Immediate'}
+        if 'period' in trigger:
+            if trigger['period'] <= 0:
+                raise LLRPError('invalid ROSpec period {} (need >0)'.format(
+                                trigger['period']))
+            return {
+                'ROSpecStartTriggerType': 'Periodic',
+                'PeriodicTriggerValue': {
+                    'Offset': int(trigger.get('offset', 0) * 1000),
+                    'Period': int(trigger['period'] * 1000),
+                },
+            }
+        if 'gpi' in trigger:
+            return {
+                'ROSpecStartTriggerType': 'GPI',
+                'GPITriggerValue': {
+                    'GPIPortNum': trigger['gpi'],
+                    'GPIEvent': trigger.get('event', True),
+                    'Timeout': 0,
+                },
+            }
+        raise LLRPError('invalid ROSpec start trigger {}'.format(trigger))
+
+    @staticmethod
+    def stopTrigger(trigger):
+        """Build a ROSpecStopTrigger.
+
+        `trigger` is None to run until the ROSpec is disabled, or a dict
+        with 'gpi' (a GPI port number), optionally 'event' (the state that
+        stops the ROSpec, default False) and 'timeout' (seconds after which
+        to stop anyway; 0, the default, for none).
+        """
+        if trigger is None:
+            return {
+                'ROSpecStopTriggerType': 'Null',
+                'DurationTriggerValue': 0,
+            }
+        if 'gpi' in trigger:
+            return {
+                'ROSpecStopTriggerType': 'GPI with timeout',
+                'DurationTriggerValue': 0,
+                'GPITriggerValue': {
+                    'GPIPortNum': trigger['gpi'],
+                    'GPIEvent': trigger.get('event', False),
+                    'Timeout': int(trigger.get('timeout', 0) * 1000),
+                },
+            }
+        raise LLRPError('invalid ROSpec stop trigger {}'.format(trigger))
+
+    @staticmethod
+    def dwellTrigger(dwell):
+        """Build an AISpecStopTrigger for one antenna's dwell.
+
+        `dwell` is a time in seconds, or a dict with 'n_tags' (stop after
+        observing that many tags) and optionally 'timeout_ms' (or after that
+        many milliseconds).
+        """
+        if isinstance(dwell, dict):
+            return {
+                'AISpecStopTriggerType': 'Tag observation',
+                'DurationTriggerValue': 0,
+                'TagObservationTrigger': {
+                    'TriggerType': 'UponNTags',
+                    'NumberOfTags': dwell['n_tags'],
+                    'NumberOfAttempts': 0,
+                    'T': 0,
+                    'Timeout': dwell.get('timeout_ms', 0),
+                },
+            }
+        if dwell <= 0:
+            raise LLRPError('invalid antenna dwell {} (need >0)'.format(
+                            dwell))
+        return {
+            'AISpecStopTriggerType': 'Duration',
+            'DurationTriggerValue': int(dwell * 1000),
+        }
+
     def __repr__(self):
         return llrp_data2xml(self)
 
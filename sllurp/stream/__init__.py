@@ -0,0 +1,7 @@
+"""Processing stages for streams of tag reports.
+
+Each stage plugs into an LLRPClientFactory as a tag report callback:
+
+    agg = TagAggregator(window=1.0, on_flush=handle_summaries)
+    factory.addTagReportCallback(agg.tag_cb)
+"""
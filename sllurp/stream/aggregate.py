@@ -0,0 +1,181 @@
+"""Deduplicate and aggregate tag reads.
+
+Readers report the same tag over and over.  TagAggregator folds reads into
+one record per (EPC, reader, antenna) holding first-seen and last-seen times,
+a read count and the peak RSSI.  Once per window it passes a TagSummary for
+every record read during the window to a callback, so that consumers see one
+event per tag and window rather than every read.
+
+The number of records is capped: when a new tag would exceed max_records, the
+least recently read record is evicted (and summarized, if it has reads that
+were not yet passed on).
+"""
+
+from __future__ import unicode_literals
+from collections import OrderedDict, namedtuple
+import logging
+import time
+from twisted.internet import task
+
+from .tags import tag_reports
+
+logger = logging.getLogger(__name__)
+
+TagSummary = namedtuple('TagSummary', (
+    'epc',          # hex EPC
+    'reader',       # peername of the reader
+    'antenna',      # antenna ID, or None if not reported
+    'first_seen',   # seconds since the epoch
+    'last_seen',    # seconds since the epoch
+    'count',        # reads since the record was created
+    'peak_rssi',    # highest PeakRSSI since the record was created, or None
+    'window_count',  # reads since the previous summary
+))
+
+# record layout; records are lists, which are cheaper to update than objects
+FIRST, LAST, COUNT, PEAK, WINDOW_COUNT = range(5)
+
+
+class TagAggregator(object):
+    """Per-(EPC, reader, antenna) read records with windowed summaries.
+
+    Pass tag_cb to LLRPClientFactory.addTagReportCallback, and call start()
+    to summarize every `window` seconds (or call flush() yourself).
+    `on_flush(summaries)` receives a list of TagSummary.
+
+    If use_reader_timestamps is set, first/last-seen times come from the
+    FirstSeenTimestampUTC and LastSeenTimestampUTC fields when the reader
+    reports them; otherwise from the local clock.
+    """
+
+    def __init__(self, window=1.0, max_records=100000, on_flush=None,
+                 use_reader_timestamps=True):
+        self.window = window
+        self.max_records = max_records
+        self.on_flush = on_flush
+        self.use_reader_timestamps = use_reader_timestamps
+
+        # (epc, reader, antenna) -> record, least recently read first
+        self.records = OrderedDict()
+        try:
+            self._move_to_end = self.records.move_to_end
+        except AttributeError:  # Python 2
+            def move_to_end(key):
+                self.records[key] = self.records.pop(key)
+            self._move_to_end = move_to_end
+
+        # keys read during this window, in order of their first read
+        self._touched = []
+
+        # summaries of evicted records that had unsummarized reads
+        self._evicted = []
+
+        self.num_evicted = 0
+        self._flusher = None
+
+    def start(self):
+        """Summarize records every self.window seconds."""
+        self._flusher = task.LoopingCall(self.flush)
+        self._flusher.start(self.window, now=False)
+
+    def stop(self):
+        """Stop summarizing, and pass on what's left."""
+        if self._flusher is not None and self._flusher.running:
+            self._flusher.stop()
+        self.flush()
+
+    def tag_cb(self, llrp_msg):
+        self.addReads(llrp_msg.peername, tag_reports(llrp_msg))
+
+    def addReads(self, reader, tags, now=None):
+        """Fold a list of TagReportData from one reader into the records."""
+        if now is None:
+            now = time.time()
+        records = self.records
+        touched = self._touched
+        move_to_end = self._move_to_end
+        reader_time = self.use_reader_timestamps
+
+        for tag in tags:
+            epc = tag['EPCData']['EPC'] if 'EPCData' in tag \
+                else tag['EPC-96']
+            antenna = tag['AntennaID'][0] if 'AntennaID' in tag else None
+            count = tag['TagSeenCount'][0] if 'TagSeenCount' in tag else 1
+            rssi = tag['PeakRSSI'][0] if 'PeakRSSI' in tag else None
+            if reader_time and 'LastSeenTimestampUTC' in tag:
+                last = tag['LastSeenTimestampUTC'][0] / 1e6
+                first = tag['FirstSeenTimestampUTC'][0] / 1e6 \
+                    if 'FirstSeenTimestampUTC' in tag else last
+            else:
+                first = last = now
+
+            key = (epc, reader, antenna)
+            rec = records.get(key)
+            if rec is None:
+                records[key] = [first, last, count, rssi, count]
+                touched.append(key)
+                if len(records) > self.max_records:
+                    self._evict()
+                continue
+
+            move_to_end(key)
+            if last > rec[LAST]:
+                rec[LAST] = last
+            rec[COUNT] += count
+            if rssi is not None and (rec[PEAK] is None or rssi > rec[PEAK]):
+                rec[PEAK] = rssi
+            if not rec[WINDOW_COUNT]:
+                touched.append(key)
+            rec[WINDOW_COUNT] += count
+
+        if len(touched) > 2 * self.max_records:
+            # evictions left stale keys behind
+            self._touched = [key for key in OrderedDict.fromkeys(touched)
+                             if key in records]
+
+    def _evict(self):
+        key, rec = self.records.popitem(last=False)
+        self.num_evicted += 1
+        if not rec[WINDOW_COUNT]:
+            return
+        self._evicted.append(self._summarize(key, rec))
+        if len(self._evicted) >= self.max_records:
+            # don't let a flood of new tags grow memory until the next window
+            evicted, self._evicted = self._evicted, []
+            if self.on_flush is not None:
+                self.on_flush(evicted)
+
+    @staticmethod
+    def _summarize(key, rec):
+        epc, reader, antenna = key
+        return TagSummary(epc, reader, antenna, rec[FIRST], rec[LAST],
+                          rec[COUNT], rec[PEAK], rec[WINDOW_COUNT])
+
+    def flush(self):
+        """Summarize the records read since the last flush.
+
+        Returns the list of TagSummary, after passing it to on_flush.
+        """
+        summaries, self._evicted = self._evicted, []
+        touched, self._touched = self._touched, []
+        records = self.records
+        for key in touched:
+            rec = records.get(key)
+            if rec is None or not rec[WINDOW_COUNT]:
+                continue
+            summaries.append(self._summarize(key, rec))
+            rec[WINDOW_COUNT] = 0
+        logger.debug('%d tags read in the last window', len(summaries))
+        if summaries and self.on_flush is not None:
+            self.on_flush(summaries)
+        return summaries
+
+    def get(self, epc, reader, antenna=None):
+        """Return the current TagSummary for one record, or None."""
+        rec = self.records.get((epc, reader, antenna))
+        if rec is None:
+            return None
+        return self._summarize((epc, reader, antenna), rec)
+
+    def __len__(self):
+        return len(self.records)
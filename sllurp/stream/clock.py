@@ -0,0 +1,187 @@
+"""Reader clock offset and skew, and timestamps in host time.
+
+Tag report timestamps (FirstSeenTimestampUTC, LastSeenTimestampUTC) and the
+UTCTimestamp of reader event notifications come from each reader's own
+clock, which may be seconds off ours and drift.  ReaderClock estimates a
+reader's clock from (reader timestamp, time we received it) pairs: the
+difference between the two is the clock offset plus a transmission and
+queueing delay that is never negative, so the smallest difference in each
+interval of time is the best estimate of the offset then.  A straight line
+fitted through these minima gives the offset and its rate of change (skew).
+
+ClockTracker keeps a ReaderClock per connection and rewrites the timestamps
+in tag reports to host time, a whole report at a time in NumPy.
+
+Requires NumPy (pip install sllurp[numpy]).
+"""
+
+from __future__ import division, unicode_literals
+from collections import deque
+import logging
+import time
+import numpy as np
+
+from .tags import tag_reports
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FIELDS = ('FirstSeenTimestampUTC', 'LastSeenTimestampUTC')
+
+
+class ReaderClock(object):
+    """Offset and skew of one reader's clock relative to ours.
+
+    Observations are grouped into intervals of `interval` seconds of host
+    time, of which the last `intervals` are kept.  If the reader's clock
+    steps by more than `step` seconds (e.g., when it syncs to NTP), the
+    history is discarded.
+    """
+
+    def __init__(self, interval=10.0, intervals=30, step=1.0):
+        self.interval = interval
+        self.step = step
+        # [interval number, host time, host - reader] of each minimum
+        self.minima = deque(maxlen=intervals)
+        self.num_samples = 0
+        self.num_steps = 0
+        self._fit = None
+
+    def observe(self, reader_time, host_time):
+        """Add a reader timestamp and the host time it was received at.
+
+        Both are in seconds.
+        """
+        delta = host_time - reader_time
+        bucket = int(host_time // self.interval)
+        minima = self.minima
+        self.num_samples += 1
+        if minima and self._fit is not None:
+            predicted = self.offset(host_time)
+            if delta < predicted - self.step or (
+                    bucket != minima[-1][0] and
+                    minima[-1][2] > predicted + self.step):
+                logger.info('reader clock stepped by %.3f s',
+                            predicted - delta)
+                self.num_steps += 1
+                minima.clear()
+        if minima and minima[-1][0] == bucket:
+            if delta < minima[-1][2]:
+                minima[-1][1] = host_time
+                minima[-1][2] = delta
+                self._fit = None
+            return
+        minima.append([bucket, host_time, delta])
+        self._fit = None
+
+    def _line(self):
+        if self._fit is None:
+            points = np.array(self.minima)
+            ref = points[-1, 1]
+            if len(points) < 2:
+                self._fit = (ref, points[0, 2], 0.0)
+            else:
+                skew, offset = np.polyfit(points[:, 1] - ref, points[:, 2], 1)
+                self._fit = (ref, offset, skew)
+        return self._fit
+
+    def offset(self, host_time=None):
+        """Return host time minus reader time (seconds) at host_time."""
+        if not self.minima:
+            return None
+        ref, offset, skew = self._line()
+        if host_time is None:
+            return offset
+        return offset + skew * (host_time - ref)
+
+    @property
+    def skew(self):
+        """Rate at which the offset grows, in seconds per second."""
+        if not self.minima:
+            return None
+        return self._line()[2]
+
+    def toHost(self, reader_times):
+        """Convert an array of reader times (seconds) to host time."""
+        if not self.minima:
+            return reader_times
+        ref, offset, skew = self._line()
+        # the skew term uses the reader time in place of host time; the
+        # difference is the offset times the skew, which is negligible
+        return reader_times + offset + skew * (reader_times - ref)
+
+
+class ClockTracker(object):
+    """Per-reader clock models, and tag reports rewritten to host time.
+
+    Pass tag_cb to LLRPClientFactory.addTagReportCallback, ahead of the
+    callbacks that use timestamps, and event_cb to
+    LLRPClientFactory.addMessageCallback('READER_EVENT_NOTIFICATION', ...).
+    Unless `correct` is False, FirstSeenTimestampUTC and LastSeenTimestampUTC
+    in tag reports are replaced with the corresponding host time, and the
+    reader's values are kept under FirstSeenTimestampReader and
+    LastSeenTimestampReader.  Other arguments are passed to ReaderClock.
+    """
+
+    def __init__(self, correct=True, clock=time.time, **kwargs):
+        self.correct = correct
+        self.clock = clock
+        self.clock_args = kwargs
+        # peername -> ReaderClock
+        self.readers = {}
+
+    def getClock(self, reader):
+        rc = self.readers.get(reader)
+        if rc is None:
+            rc = self.readers[reader] = ReaderClock(**self.clock_args)
+        return rc
+
+    def offset(self, reader):
+        """Return the current offset (host - reader, seconds) of a reader."""
+        rc = self.readers.get(reader)
+        if rc is None:
+            return None
+        return rc.offset(self.clock())
+
+    def offsets(self):
+        """Return a dict of peername -> current offset in seconds."""
+        now = self.clock()
+        return {reader: rc.offset(now) for reader, rc in self.readers.items()
+                if rc.minima}
+
+    def event_cb(self, llrp_msg):
+        now = self.clock()
+        event = llrp_msg.msgdict['READER_EVENT_NOTIFICATION'][
+            'ReaderEventNotificationData']
+        micros = event['UTCTimestamp']['Microseconds']
+        self.getClock(llrp_msg.peername).observe(micros / 1e6, now)
+
+    def tag_cb(self, llrp_msg):
+        self.addReads(llrp_msg.peername, tag_reports(llrp_msg))
+
+    def addReads(self, reader, tags, now=None):
+        """Update a reader's clock from a report, and correct its times."""
+        if now is None:
+            now = self.clock()
+        times = [tag['LastSeenTimestampUTC'][0] for tag in tags
+                 if 'LastSeenTimestampUTC' in tag]
+        if not times:
+            return
+        rc = self.getClock(reader)
+        # the last read in a report is the closest to when it was sent
+        rc.observe(max(times) / 1e6, now)
+        if self.correct:
+            self.normalize(rc, tags)
+
+    @staticmethod
+    def normalize(rc, tags):
+        """Rewrite the reader timestamps in a list of tags to host time."""
+        for field in TIMESTAMP_FIELDS:
+            have = [tag for tag in tags if field in tag]
+            if not have:
+                continue
+            reader_field = field[:-3] + 'Reader'
+            micros = np.array([tag[field][0] for tag in have], dtype=float)
+            host = np.rint(rc.toHost(micros / 1e6) * 1e6).astype(np.int64)
+            for tag, value in zip(have, host.tolist()):
+                tag[reader_field] = tag[field]
+                tag[field] = (value,)
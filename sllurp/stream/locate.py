@@ -0,0 +1,189 @@
+"""Zone and position estimates from RSSI across antennas and readers.
+
+A tag is usually read by several antennas at once, most strongly by the
+nearest.  Locator collects each window's reads and then, for all the tags
+read in the window at once, weighs every antenna by the tag's received power
+there (summed over its reads, in milliwatts, so that both signal strength and
+read count count).  It assigns each tag to the zone with the most weight and
+places it at the weighted centroid of the antennas' positions.
+
+Requires NumPy (pip install sllurp[numpy]).
+"""
+
+from __future__ import division, unicode_literals
+from collections import namedtuple
+import logging
+import numpy as np
+from twisted.internet import task
+
+from .tags import tag_epc, tag_reports, tag_value
+
+logger = logging.getLogger(__name__)
+
+TagLocation = namedtuple('TagLocation', (
+    'epc',         # hex EPC
+    'zone',        # zone with the most weight, or None
+    'confidence',  # fraction of the tag's weight in that zone
+    'position',    # weighted centroid of antenna positions, or None
+    'reads',       # reads in the window
+))
+
+
+class Locator(object):
+    """Per-window zone and position of every tag read.
+
+    `antennas` maps antennas to their positions, as tuples of coordinates;
+    `zones` maps zone names to lists of antennas.  Antennas are antenna IDs
+    (on any reader) or (reader host, antenna ID) pairs.  Reads at antennas
+    with neither a position nor a zone are ignored.
+
+    Pass tag_cb to LLRPClientFactory.addTagReportCallback and call start()
+    to locate tags every `window` seconds (or call locate() yourself).
+    `on_locate(locations)` receives a list of TagLocation.
+    """
+
+    def __init__(self, antennas=None, zones=None, window=1.0,
+                 on_locate=None):
+        self.window = window
+        self.on_locate = on_locate
+
+        self._positions = antennas or {}
+        self._zone_of = {}
+        for zone, ants in (zones or {}).items():
+            for ant in ants:
+                self._zone_of[ant] = zone
+        self.zones = sorted(zones or {})
+        self.dims = len(next(iter(self._positions.values()))) \
+            if self._positions else 0
+
+        # (host, antenna ID) -> column, filled in as reads come in; None
+        # for antennas that aren't configured
+        self._columns = {}
+        self.coords = np.zeros((0, self.dims))
+        self.placed = np.zeros(0, dtype=bool)
+        self.zone_index = np.zeros(0, dtype=int)
+
+        self._clear()
+        self._locator = None
+
+    def _clear(self):
+        self._rows = {}
+        self._epcs = []
+        self._read_rows = []
+        self._read_cols = []
+        self._read_power = []
+        self._read_counts = []
+
+    def start(self):
+        self._locator = task.LoopingCall(self.locate)
+        self._locator.start(self.window, now=False)
+
+    def stop(self):
+        if self._locator is not None and self._locator.running:
+            self._locator.stop()
+
+    def _column(self, host, antenna):
+        key = (host, antenna)
+        try:
+            return self._columns[key]
+        except KeyError:
+            pass
+        position = self._positions.get(key, self._positions.get(antenna))
+        zone = self._zone_of.get(key, self._zone_of.get(antenna))
+        if position is None and zone is None:
+            col = None
+        else:
+            col = len(self.placed)
+            coords = np.zeros((1, self.dims)) if position is None else \
+                np.array([position], dtype=float)
+            self.coords = np.vstack((self.coords, coords))
+            self.placed = np.append(self.placed, position is not None)
+            self.zone_index = np.append(
+                self.zone_index, -1 if zone is None else
+                self.zones.index(zone))
+        self._columns[key] = col
+        return col
+
+    def tag_cb(self, llrp_msg):
+        self.addReads(llrp_msg.peername[0], tag_reports(llrp_msg))
+
+    def addReads(self, host, tags):
+        """Collect a list of TagReportData from one reader."""
+        rows = self._rows
+        for tag in tags:
+            col = self._column(host, tag_value(tag, 'AntennaID'))
+            if col is None:
+                continue
+            if 'ImpinjPeakRSSI' in tag:
+                rssi = tag['ImpinjPeakRSSI'] / 100
+            elif 'PeakRSSI' in tag:
+                rssi = tag['PeakRSSI'][0]
+            else:
+                continue
+            epc = tag_epc(tag)
+            row = rows.get(epc)
+            if row is None:
+                row = rows[epc] = len(self._epcs)
+                self._epcs.append(epc)
+            count = tag_value(tag, 'TagSeenCount', 1)
+            self._read_rows.append(row)
+            self._read_cols.append(col)
+            self._read_power.append(rssi)
+            self._read_counts.append(count)
+
+    def locate(self):
+        """Locate the tags read since the last call.
+
+        Returns the list of TagLocation, after passing it to on_locate.
+        """
+        epcs = self._epcs
+        rows = np.array(self._read_rows, dtype=int)
+        cols = np.array(self._read_cols, dtype=int)
+        dbm = np.array(self._read_power, dtype=float)
+        counts = np.array(self._read_counts, dtype=float)
+        self._clear()
+        if not epcs:
+            return []
+
+        ntags, nants = len(epcs), len(self.placed)
+        cells = rows * nants + cols
+        weight = np.bincount(cells, weights=counts * 10 ** (dbm / 10),
+                             minlength=ntags * nants).reshape(ntags, nants)
+        reads = np.bincount(rows, weights=counts, minlength=ntags)
+
+        # zones: total weight per zone, as a (tags x zones) matrix
+        zones = None
+        if self.zones:
+            membership = np.zeros((nants, len(self.zones)))
+            zoned = self.zone_index >= 0
+            membership[np.flatnonzero(zoned), self.zone_index[zoned]] = 1
+            per_zone = weight.dot(membership)
+            best = per_zone.argmax(axis=1)
+            total = per_zone.sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                confidence = per_zone[np.arange(ntags), best] / total
+            zones = (best, total > 0, confidence)
+
+        # positions: weighted centroid of the antennas with positions
+        positions = None
+        if self.placed.any():
+            w = weight[:, self.placed]
+            total = w.sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                positions = w.dot(self.coords[self.placed]) / total[:, None]
+            positions = (positions, total > 0)
+
+        locations = []
+        for i, epc in enumerate(epcs):
+            zone = confidence = position = None
+            if zones is not None and zones[1][i]:
+                zone = self.zones[zones[0][i]]
+                confidence = float(zones[2][i])
+            if positions is not None and positions[1][i]:
+                position = tuple(positions[0][i].tolist())
+            locations.append(TagLocation(epc, zone, confidence, position,
+                                         int(reads[i])))
+        logger.debug('located %d tags', len(locations))
+        if self.on_locate is not None:
+            self.on_locate(locations)
+        return locations
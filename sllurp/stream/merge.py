@@ -0,0 +1,164 @@
+"""Merge tag reads from many readers into one time-ordered stream.
+
+Callbacks see reports in the order the reactor reads them from the readers'
+sockets, so reads from different readers interleave out of timestamp order.
+ReportMerger buffers each reader's reads in a heap of its own and merges the
+buffers through a heap of their heads, releasing a read once no read with an
+earlier LastSeenTimestampUTC can still turn up: when every reader has
+reported something later, or at the latest `lateness` seconds after it.
+Reads that arrive after later reads were already released are counted as
+late.
+"""
+
+from __future__ import unicode_literals
+from collections import defaultdict
+import heapq
+import itertools
+import logging
+from twisted.internet import reactor, task
+
+from .tags import tag_reports, tag_value
+
+logger = logging.getLogger(__name__)
+
+
+class ReportMerger(object):
+    """K-way merge of per-reader tag reads by LastSeenTimestampUTC.
+
+    Pass tag_cb to LLRPClientFactory.addTagReportCallback and call start().
+    `on_tags(reads)` receives lists of (peername, TagReportData) in timestamp
+    order.  Reads without a LastSeenTimestampUTC are stamped with the time
+    they arrive.
+
+    A read is held until every reader that has sent reads has sent a later
+    one, or until the newest timestamp seen, advanced by the time since,
+    passes it by `lateness` seconds; the latter assumes that reader clocks
+    roughly agree with ours.  The first rule only applies from `lateness`
+    seconds after the first read, by which time every active reader should
+    have been heard from.  Reads older than the last read released are
+    late: they are counted in `late` and `late_by_reader`, and passed on
+    straight away unless drop_late is set.
+    """
+
+    def __init__(self, lateness=0.5, on_tags=None, drop_late=False,
+                 interval=None, clock=reactor):
+        self.lateness = lateness
+        self.on_tags = on_tags
+        self.drop_late = drop_late
+        self.interval = lateness / 4 if interval is None else interval
+        self.clock = clock
+
+        # peername -> heap of (timestamp, seq, tag)
+        self.buffers = {}
+        # heap of (timestamp, seq, peername) for the buffers' first reads;
+        # entries whose read has left its buffer are skipped
+        self.heads = []
+        # peername -> newest timestamp received
+        self.latest = {}
+        self._seq = itertools.count()
+
+        self.newest = None
+        self._newest_at = None
+        self._first_at = None
+        self.released = float('-inf')
+
+        self.late = 0
+        self.late_by_reader = defaultdict(int)
+        self.num_buffered = 0
+
+        self._ticker = task.LoopingCall(self.release)
+        self._ticker.clock = clock
+
+    def start(self):
+        self._ticker.start(self.interval, now=False)
+
+    def stop(self):
+        """Stop the timer and release everything still buffered."""
+        if self._ticker.running:
+            self._ticker.stop()
+        self.release(float('inf'))
+
+    def tag_cb(self, llrp_msg):
+        self.addReads(llrp_msg.peername, tag_reports(llrp_msg))
+
+    def addReads(self, reader, tags):
+        """Buffer a list of TagReportData from one reader."""
+        now = self.clock.seconds()
+        if self._first_at is None:
+            self._first_at = now
+        buf = self.buffers.get(reader)
+        if buf is None:
+            buf = self.buffers[reader] = []
+        heads = self.heads
+        late = []
+        latest = self.latest.get(reader, float('-inf'))
+        for tag in tags:
+            ts = tag_value(tag, 'LastSeenTimestampUTC')
+            ts = now if ts is None else ts / 1e6
+            if ts < self.released:
+                self.late += 1
+                self.late_by_reader[reader] += 1
+                if not self.drop_late:
+                    late.append((reader, tag))
+                continue
+            item = (ts, next(self._seq), tag)
+            if not buf or item < buf[0]:
+                heapq.heappush(heads, (ts, item[1], reader))
+            heapq.heappush(buf, item)
+            self.num_buffered += 1
+            if ts > latest:
+                latest = ts
+        self.latest[reader] = latest
+        if self.newest is None or latest > self.newest:
+            self.newest = latest
+            self._newest_at = now
+        if late:
+            logger.debug('%d late reads from %s', len(late), reader)
+            if self.on_tags is not None:
+                self.on_tags(late)
+        self.release()
+
+    def watermark(self):
+        """Return the timestamp up to which reads can be released."""
+        if self.newest is None:
+            return float('-inf')
+        now = self.clock.seconds()
+        bound = self.newest + (now - self._newest_at) - self.lateness
+        if now - self._first_at < self.lateness:
+            return bound
+        return max(bound, min(self.latest.values()))
+
+    def release(self, until=None):
+        """Pass on the buffered reads up to `until` (default: watermark()).
+
+        Returns the list of (peername, TagReportData) released.
+        """
+        if until is None:
+            until = self.watermark()
+        heads = self.heads
+        buffers = self.buffers
+        out = []
+        while heads:
+            ts, seq, reader = heads[0]
+            buf = buffers[reader]
+            if not buf or buf[0][1] != seq:
+                heapq.heappop(heads)
+                continue
+            if ts > until:
+                break
+            heapq.heappop(heads)
+            _, _, tag = heapq.heappop(buf)
+            out.append((reader, tag))
+            last = ts
+            if buf:
+                heapq.heappush(heads, (buf[0][0], buf[0][1], reader))
+        if not out:
+            return out
+        self.num_buffered -= len(out)
+        self.released = last
+        if self.on_tags is not None:
+            self.on_tags(out)
+        return out
+
+    def __len__(self):
+        return self.num_buffered
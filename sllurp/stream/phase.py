@@ -0,0 +1,322 @@
+"""Phase unwrapping and radial velocity from Impinj tag reports.
+
+With ``impinj_tag_content_selector`` enabling EnableRFPhaseAngle and
+EnableRFDopplerFrequency, Impinj readers report each read's backscatter phase
+(ImpinjPhase, 0-4095 for 0-2pi radians) and Doppler shift
+(RFDopplerFrequency, in 1/16 Hz).  The phase is only meaningful relative to
+other reads of the same tag, at the same antenna, on the same channel: each
+frequency hop changes the phase offset.  PhaseTracker unwraps the phase of
+each (EPC, reader, antenna, channel) and turns the change in phase between
+consecutive reads into a radial velocity, v = lambda / (4 pi) * dphase / dt.
+Reads without a usable predecessor fall back to the Doppler estimate,
+v = -lambda * f_doppler / 2.
+
+Reports are processed a whole report at a time in NumPy.  Enable
+EnableChannelIndex and EnableLastSeenTimestamp in tag_content_selector as
+well: the channel selects the wavelength and the unwrapping sequence, and the
+reader's timestamps are far more precise than the time reports arrive.
+
+Requires NumPy (pip install sllurp[numpy]).
+"""
+
+from __future__ import division, unicode_literals
+import logging
+import math
+import time
+import numpy as np
+
+from .tags import tag_epc, tag_reports, tag_value
+
+logger = logging.getLogger(__name__)
+
+SPEED_OF_LIGHT = 299792458.0
+
+# ImpinjPhase units per radian, RFDopplerFrequency units per Hz
+PHASE_SCALE = 4096 / (2 * math.pi)
+DOPPLER_SCALE = 16
+
+APPROACHING = 'approaching'
+RECEDING = 'receding'
+
+
+def channel_frequencies(capabilities, hop_table=0):
+    """Return a dict of ChannelIndex -> frequency in Hz.
+
+    `capabilities` is LLRPClient.capabilities.  Channel indexes are positions
+    (starting at 1) in the reader's frequency hop table or, for readers that
+    don't hop, its fixed frequency table.
+    """
+    freqinfo = capabilities['RegulatoryCapabilities']['UHFBandCapabilities'][
+        'FrequencyInformation']
+    table = freqinfo.get('FrequencyHopTable{}'.format(hop_table)) or \
+        freqinfo.get('FixedFrequencyTable') or {}
+    freqs = {}
+    for key, khz in table.items():
+        if key.startswith('Frequency'):
+            freqs[int(key[len('Frequency'):])] = khz * 1000.0
+    return freqs
+
+
+def _grow(array, size, fill):
+    extra = np.full((size - len(array),) + array.shape[1:], fill,
+                    dtype=array.dtype)
+    return np.concatenate((array, extra))
+
+
+class PhaseTracker(object):
+    """Unwrapped phase, radial velocity and direction of motion per tag.
+
+    `frequencies` maps ChannelIndex to frequency in Hz (see
+    channel_frequencies()); reads on unknown channels use
+    `default_frequency`.  Consecutive reads more than `max_gap` seconds
+    apart restart the unwrapping, since a tag moving a quarter wavelength
+    (about 8 cm) between reads makes the phase ambiguous.
+
+    tag_cb adds two fields to every TagReportData with an ImpinjPhase:
+    'UnwrappedPhase' (radians) and 'RadialVelocity' (metres per second away
+    from the antenna, or None if there is no estimate).  Register it before
+    the callbacks that use them.
+
+    Each (EPC, reader, antenna) keeps a velocity averaged over about
+    `window` seconds.  A tag is approaching or receding while that exceeds
+    `threshold` metres per second; `on_direction(epc, host, antenna,
+    direction)` is called when this changes, with None for a tag that has
+    stopped.  Readers whose phase runs the other way can pass
+    phase_sign=-1.
+    """
+
+    def __init__(self, frequencies=None, default_frequency=915e6,
+                 max_gap=0.1, window=0.5, threshold=0.05, on_direction=None,
+                 phase_sign=1, clock=time.time):
+        self.frequencies = frequencies or {}
+        self.default_frequency = default_frequency
+        self.max_gap = max_gap
+        self.window = window
+        self.threshold = threshold
+        self.on_direction = on_direction
+        self.phase_sign = phase_sign
+        self.clock = clock
+
+        # (epc, host, antenna, channel) -> row: the last read's phase,
+        # unwrapped phase and time
+        self.cells = {}
+        self.phase = np.empty(0)
+        self.unwrapped = np.empty(0)
+        self.seen = np.empty(0)
+
+        # (epc, host, antenna) -> row: smoothed velocity, when it was last
+        # updated, and the direction last reported (-1, 0 or 1)
+        self.tags = {}
+        self.tag_keys = []
+        self.velocity = np.empty(0)
+        self.updated = np.empty(0)
+        self.moving = np.empty(0, dtype=np.int8)
+
+    def tag_cb(self, llrp_msg):
+        self.addReads(llrp_msg.peername[0], tag_reports(llrp_msg))
+
+    @staticmethod
+    def _row(table, key, keys=None):
+        row = table.get(key)
+        if row is None:
+            row = table[key] = len(table)
+            if keys is not None:
+                keys.append(key)
+        return row
+
+    def addReads(self, host, tags, now=None):
+        """Process a list of TagReportData from one reader.
+
+        Returns the radial velocities of the reads with an ImpinjPhase, in
+        order, as an array (NaN where there's no estimate).
+        """
+        if now is None:
+            now = self.clock()
+        reads = []
+        cell_rows = []
+        tag_rows = []
+        raw_phase = []
+        times = []
+        wavelengths = []
+        doppler = []
+        for tag in tags:
+            if 'ImpinjPhase' not in tag:
+                continue
+            epc = tag_epc(tag)
+            antenna = tag_value(tag, 'AntennaID')
+            channel = tag_value(tag, 'ChannelIndex')
+            reads.append(tag)
+            cell_rows.append(self._row(self.cells,
+                                       (epc, host, antenna, channel)))
+            tag_rows.append(self._row(self.tags, (epc, host, antenna),
+                                      self.tag_keys))
+            raw_phase.append(tag['ImpinjPhase'])
+            seen = tag_value(tag, 'LastSeenTimestampUTC')
+            times.append(now if seen is None else seen / 1e6)
+            wavelengths.append(SPEED_OF_LIGHT / self.frequencies.get(
+                channel, self.default_frequency))
+            doppler.append(tag.get('RFDopplerFrequency', np.nan))
+        if not reads:
+            return np.empty(0)
+
+        self._reserve()
+        unwrapped, velocity = self.update(
+            np.array(cell_rows), np.array(tag_rows),
+            np.array(raw_phase, dtype=float) / PHASE_SCALE,
+            np.array(times, dtype=float), np.array(wavelengths),
+            np.array(doppler, dtype=float) / DOPPLER_SCALE)
+
+        for i, tag in enumerate(reads):
+            tag['UnwrappedPhase'] = float(unwrapped[i])
+            v = velocity[i]
+            tag['RadialVelocity'] = None if np.isnan(v) else float(v)
+        return velocity
+
+    def _reserve(self):
+        if len(self.cells) > len(self.phase):
+            size = max(len(self.cells), 2 * len(self.phase))
+            self.phase = _grow(self.phase, size, np.nan)
+            self.unwrapped = _grow(self.unwrapped, size, np.nan)
+            self.seen = _grow(self.seen, size, np.nan)
+        if len(self.tags) > len(self.velocity):
+            size = max(len(self.tags), 2 * len(self.velocity))
+            self.velocity = _grow(self.velocity, size, np.nan)
+            self.updated = _grow(self.updated, size, np.nan)
+            self.moving = _grow(self.moving, size, 0)
+
+    def update(self, cells, tags, phase, times, wavelengths, doppler):
+        """Apply a batch of reads given as parallel arrays.
+
+        `cells` and `tags` are rows of self.cells and self.tags, `phase` is
+        in radians, `times` in seconds and `doppler` in Hz (NaN if not
+        reported).  Returns arrays of each read's unwrapped phase and radial
+        velocity.
+        """
+        n = len(cells)
+        order = np.lexsort((times, cells))
+        c, p, t = cells[order], phase[order], times[order]
+
+        # each read's predecessor: the previous read of the same cell in this
+        # batch, or the last read of the cell in earlier batches
+        first = np.ones(n, dtype=bool)
+        first[1:] = c[1:] != c[:-1]
+        prev_p = np.where(first, self.phase[c], np.roll(p, 1))
+        prev_t = np.where(first, self.seen[c], np.roll(t, 1))
+        prev_u = self.unwrapped[c]
+
+        with np.errstate(invalid='ignore'):
+            dt = t - prev_t
+            dphase = (p - prev_p + np.pi) % (2 * np.pi) - np.pi
+            linked = (dt >= 0) & (dt <= self.max_gap)  # False for NaN
+
+        # unwrapping is a cumulative sum of phase steps, restarted at the
+        # raw phase wherever a read has no usable predecessor
+        start = first | ~linked
+        step = np.where(linked, dphase, p)
+        step[first & linked] += prev_u[first & linked]
+        total = np.cumsum(step)
+        starts = np.flatnonzero(start)
+        segment = np.cumsum(start) - 1
+        offset = total[starts] - step[starts]
+        unwrapped = total - offset[segment]
+
+        last = np.ones(n, dtype=bool)
+        last[:-1] = c[1:] != c[:-1]
+        self.phase[c[last]] = p[last]
+        self.unwrapped[c[last]] = unwrapped[last]
+        self.seen[c[last]] = t[last]
+
+        # velocities, back in the order the reads came in
+        lam = wavelengths[order]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            from_phase = np.where(linked & (dt > 0),
+                                  self.phase_sign * lam / (4 * np.pi) *
+                                  dphase / dt, np.nan)
+        from_doppler = -lam * doppler[order] / 2
+        v_sorted = np.where(np.isnan(from_phase), from_doppler, from_phase)
+        velocity = np.empty(n)
+        velocity[order] = v_sorted
+        result = np.empty(n)
+        result[order] = unwrapped
+
+        self._updateMotion(tags, velocity, times)
+        return result, velocity
+
+    def _updateMotion(self, tags, velocity, times):
+        have = ~np.isnan(velocity)
+        if not have.any():
+            return
+        tags, velocity, times = tags[have], velocity[have], times[have]
+        rows, inverse, counts = np.unique(tags, return_inverse=True,
+                                          return_counts=True)
+        mean = np.bincount(inverse, weights=velocity) / counts
+        latest = np.full(len(rows), -np.inf)
+        np.maximum.at(latest, inverse, times)
+
+        # exponential average over `window` seconds
+        old = self.velocity[rows]
+        with np.errstate(invalid='ignore'):
+            keep = np.exp(-(latest - self.updated[rows]) / self.window)
+        fresh = np.isnan(old) | np.isnan(keep)
+        keep = np.clip(np.where(fresh, 0, keep), 0, 1)
+        smoothed = np.where(fresh, 0, old) * keep + mean * (1 - keep)
+        self.velocity[rows] = smoothed
+        self.updated[rows] = latest
+
+        moving = np.where(smoothed > self.threshold, 1,
+                          np.where(smoothed < -self.threshold, -1, 0))
+        changed = moving != self.moving[rows]
+        self.moving[rows] = moving
+        if self.on_direction is None or not changed.any():
+            return
+        for row, m in zip(rows[changed], moving[changed]):
+            epc, host, antenna = self.tag_keys[row]
+            self.on_direction(epc, host, antenna, self._direction(m))
+
+    @staticmethod
+    def _direction(moving):
+        if moving > 0:
+            return RECEDING
+        if moving < 0:
+            return APPROACHING
+        return None
+
+    def getVelocity(self, epc, host, antenna):
+        """Return a tag's smoothed radial velocity at an antenna, or None."""
+        row = self.tags.get((epc, host, antenna))
+        if row is None or np.isnan(self.velocity[row]):
+            return None
+        return float(self.velocity[row])
+
+    def direction(self, epc, host, antenna):
+        """Return APPROACHING, RECEDING or None for a tag at an antenna."""
+        row = self.tags.get((epc, host, antenna))
+        if row is None:
+            return None
+        return self._direction(self.moving[row])
+
+    def forget(self, before):
+        """Drop the state of tags not read since time `before`."""
+        keep_cells = [(key, row) for key, row in self.cells.items()
+                      if self.seen[row] >= before]
+        live = set(key[:3] for key, _ in keep_cells)
+        keep_tags = [(key, row) for row, key in enumerate(self.tag_keys)
+                     if key in live]
+        dropped = len(self.tags) - len(keep_tags)
+
+        rows = np.array([row for _, row in keep_cells], dtype=int)
+        self.cells = {key: i for i, (key, _) in enumerate(keep_cells)}
+        self.phase = self.phase[rows]
+        self.unwrapped = self.unwrapped[rows]
+        self.seen = self.seen[rows]
+
+        rows = np.array([row for _, row in keep_tags], dtype=int)
+        self.tag_keys = [key for key, _ in keep_tags]
+        self.tags = {key: i for i, key in enumerate(self.tag_keys)}
+        self.velocity = self.velocity[rows]
+        self.updated = self.updated[rows]
+        self.moving = self.moving[rows]
+        logger.debug('forgot %d tags', dropped)
+
+    def __len__(self):
+        return len(self.tags)
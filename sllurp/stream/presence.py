@@ -0,0 +1,220 @@
+"""Tag arrival and departure events per zone.
+
+A tag arrives in a zone when one of the zone's antennas first reads it, and
+departs when none of them has read it for the zone's departure timeout.
+Rather than scheduling a reactor call per tag, PresenceTracker keeps the
+departure deadlines in a hierarchical timer wheel that a single LoopingCall
+advances, so that hundreds of thousands of live tags cost one reactor timer
+and O(1) work per read.
+"""
+
+from __future__ import division, unicode_literals
+import logging
+from twisted.internet import reactor, task
+
+from .tags import tag_reports
+
+logger = logging.getLogger(__name__)
+
+# record layout: [deadline tick, wheel level, wheel slot, last seen, data]
+DEADLINE, LEVEL, SLOT, LAST_SEEN, DATA = range(5)
+
+
+class TimerWheel(object):
+    """Hierarchical timer wheel with lazily extended deadlines.
+
+    Time advances in ticks of `resolution` seconds.  Level 0 has one slot
+    per tick; each slot of level n spans all the slots of level n-1.  Timers
+    move down a level when their slot comes up, and expire from level 0.
+
+    Extending a timer only updates its deadline; the timer moves when its old
+    slot comes up.  Since reads extend departure deadlines far more often
+    than tags depart, this keeps reads O(1) without touching the wheel.
+    """
+
+    def __init__(self, resolution=0.1, slot_bits=8, levels=4, now=0):
+        self.resolution = resolution
+        self.bits = slot_bits
+        self.mask = (1 << slot_bits) - 1
+        self.levels = levels
+        self.max_ticks = (1 << (slot_bits * levels)) - 1
+        self.wheel = [[set() for _ in range(1 << slot_bits)]
+                      for _ in range(levels)]
+        self.tick = self.toTick(now)
+
+        # key -> record
+        self.timers = {}
+
+    def toTick(self, when):
+        return int(when / self.resolution)
+
+    def __len__(self):
+        return len(self.timers)
+
+    def __contains__(self, key):
+        return key in self.timers
+
+    def get(self, key):
+        return self.timers.get(key)
+
+    def schedule(self, key, when, data=None):
+        """Set the timer for key to expire at time `when`.
+
+        Returns the timer's record.
+        """
+        deadline = max(self.toTick(when), self.tick + 1)
+        rec = self.timers.get(key)
+        if rec is None:
+            rec = [deadline, 0, 0, None, data]
+            self.timers[key] = rec
+            self._insert(key, rec)
+        elif deadline < rec[DEADLINE]:
+            self.wheel[rec[LEVEL]][rec[SLOT]].discard(key)
+            rec[DEADLINE] = deadline
+            self._insert(key, rec)
+        else:
+            rec[DEADLINE] = deadline
+        return rec
+
+    def cancel(self, key):
+        rec = self.timers.pop(key, None)
+        if rec is not None:
+            self.wheel[rec[LEVEL]][rec[SLOT]].discard(key)
+        return rec
+
+    def _insert(self, key, rec):
+        deadline = min(rec[DEADLINE], self.tick + self.max_ticks)
+        delta = deadline - self.tick
+        level = 0
+        while level < self.levels - 1 and delta >> (self.bits * (level + 1)):
+            level += 1
+        slot = (deadline >> (self.bits * level)) & self.mask
+        rec[LEVEL] = level
+        rec[SLOT] = slot
+        self.wheel[level][slot].add(key)
+
+    def advance(self, now):
+        """Move the wheel forward to time `now`.
+
+        Returns a list of (key, record) for the timers that expired.
+        """
+        target = self.toTick(now)
+        expired = []
+        if not self.timers:
+            self.tick = max(self.tick, target)
+            return expired
+        while self.tick < target:
+            self.tick += 1
+            tick = self.tick
+
+            # cascade higher levels whose slot comes up
+            level = 1
+            while level < self.levels and \
+                    not (tick >> (self.bits * (level - 1))) & self.mask:
+                slot = (tick >> (self.bits * level)) & self.mask
+                keys = self.wheel[level][slot]
+                self.wheel[level][slot] = set()
+                for key in keys:
+                    self._insert(key, self.timers[key])
+                level += 1
+
+            slot = tick & self.mask
+            keys = self.wheel[0][slot]
+            if not keys:
+                continue
+            self.wheel[0][slot] = set()
+            for key in keys:
+                rec = self.timers[key]
+                if rec[DEADLINE] <= tick:
+                    del self.timers[key]
+                    expired.append((key, rec))
+                else:
+                    # extended since it was scheduled
+                    self._insert(key, rec)
+        return expired
+
+
+class PresenceTracker(object):
+    """Arrival and departure events per (EPC, zone).
+
+    `zones` maps a zone name to a list of antennas, each either an antenna ID
+    (on any reader) or a (reader host, antenna ID) pair.  Antennas that
+    aren't in any zone form a zone of their own named (reader host, antenna
+    ID).  `zone_timeouts` maps zone names to departure timeouts in seconds;
+    other zones use `departure_timeout`.
+
+    on_arrival(epc, zone, when) and on_departure(epc, zone, last_seen) are
+    called with times in seconds on the clock's timescale.  Pass tag_cb to
+    LLRPClientFactory.addTagReportCallback and call start().
+    """
+
+    def __init__(self, zones=None, departure_timeout=5.0, zone_timeouts=None,
+                 on_arrival=None, on_departure=None, resolution=0.1,
+                 clock=reactor):
+        self.departure_timeout = departure_timeout
+        self.zone_timeouts = zone_timeouts or {}
+        self.on_arrival = on_arrival
+        self.on_departure = on_departure
+        self.clock = clock
+        self.wheel = TimerWheel(resolution, now=clock.seconds())
+
+        self._zone_by_antenna = {}
+        for zone, antennas in (zones or {}).items():
+            for ant in antennas:
+                self._zone_by_antenna[ant] = zone
+        # (host, antenna) -> (zone, timeout), filled in as reads come in
+        self._zone_cache = {}
+
+        self._ticker = task.LoopingCall(self.tick)
+        self._ticker.clock = clock
+
+    def start(self):
+        self._ticker.start(self.wheel.resolution, now=False)
+
+    def stop(self):
+        if self._ticker.running:
+            self._ticker.stop()
+
+    def zone(self, host, antenna):
+        """Return the zone and departure timeout for an antenna."""
+        try:
+            return self._zone_cache[(host, antenna)]
+        except KeyError:
+            pass
+        zone = self._zone_by_antenna.get((host, antenna))
+        if zone is None:
+            zone = self._zone_by_antenna.get(antenna, (host, antenna))
+        timeout = self.zone_timeouts.get(zone, self.departure_timeout)
+        self._zone_cache[(host, antenna)] = zone, timeout
+        return zone, timeout
+
+    def tag_cb(self, llrp_msg):
+        self.addReads(llrp_msg.peername[0], tag_reports(llrp_msg))
+
+    def addReads(self, host, tags):
+        now = self.clock.seconds()
+        wheel = self.wheel
+        for tag in tags:
+            epc = tag['EPCData']['EPC'] if 'EPCData' in tag \
+                else tag['EPC-96']
+            antenna = tag['AntennaID'][0] if 'AntennaID' in tag else None
+            zone, timeout = self.zone(host, antenna)
+            key = (epc, zone)
+            arrived = key not in wheel
+            wheel.schedule(key, now + timeout)[LAST_SEEN] = now
+            if arrived and self.on_arrival is not None:
+                self.on_arrival(epc, zone, now)
+
+    def tick(self):
+        for (epc, zone), rec in self.wheel.advance(self.clock.seconds()):
+            if self.on_departure is not None:
+                self.on_departure(epc, zone, rec[LAST_SEEN])
+
+    def present(self, zone=None):
+        """Return the EPCs present in a zone, or (EPC, zone) pairs."""
+        if zone is None:
+            return list(self.wheel.timers)
+        return [epc for epc, z in self.wheel.timers if z == zone]
+
+    def __len__(self):
+        return len(self.wheel)
@@ -0,0 +1,115 @@
+"""Rolling read rates per reader, antenna and channel.
+
+ReadRates keeps, for every reader, (reader, antenna) and (reader, antenna,
+channel), a ring buffer of per-second read counts and per-second unique-EPC
+counts covering the last `window` seconds.  A read updates one bucket in
+each, and a rate is the sum of a ring buffer's buckets over the window.
+"""
+
+from __future__ import division, unicode_literals
+import time
+
+from .tags import tag_epc, tag_reports, tag_value
+
+# breakdown levels, and how many fields of (reader, antenna, channel) each
+# keeps
+LEVELS = {'total': 0, 'reader': 1, 'antenna': 2, 'channel': 3}
+
+
+class RateCounter(object):
+    """Reads and unique EPCs per second over a sliding window of seconds."""
+
+    def __init__(self, window):
+        self.window = window
+        # one more bucket than the window, for the second in progress
+        self.size = window + 1
+        self.seconds = [None] * self.size
+        self.reads = [0] * self.size
+        self.unique = [0] * self.size
+        # EPCs seen in the current second
+        self._second = None
+        self._epcs = set()
+
+    def add(self, second, epc, count=1):
+        i = second % self.size
+        if self.seconds[i] != second:
+            self.seconds[i] = second
+            self.reads[i] = 0
+            self.unique[i] = 0
+        self.reads[i] += count
+        if second != self._second:
+            self._second = second
+            self._epcs = set()
+        if epc not in self._epcs:
+            self._epcs.add(epc)
+            self.unique[i] += 1
+
+    def rates(self, now):
+        """Return (reads/s, unique EPCs/s) over the last complete seconds."""
+        end = int(now)
+        start = end - self.window
+        reads = unique = 0
+        for second, r, u in zip(self.seconds, self.reads, self.unique):
+            if second is not None and start <= second < end:
+                reads += r
+                unique += u
+        return reads / self.window, unique / self.window
+
+
+class ReadRates(object):
+    """Sliding-window read rates broken down by reader, antenna and channel.
+
+    Pass tag_cb to LLRPClientFactory.addTagReportCallback.  Readers are
+    identified by host.  Rates are averaged over the last `window` complete
+    seconds; unique EPCs are counted per second.
+    """
+
+    def __init__(self, window=10, clock=time.time):
+        self.window = window
+        self.clock = clock
+        # (reader, antenna, channel)[:level] -> RateCounter
+        self.counters = {}
+
+    def _counter(self, key):
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters[key] = RateCounter(self.window)
+        return counter
+
+    def tag_cb(self, llrp_msg):
+        self.addReads(llrp_msg.peername[0], tag_reports(llrp_msg))
+
+    def addReads(self, reader, tags, now=None):
+        if now is None:
+            now = self.clock()
+        second = int(now)
+        counter = self._counter
+        for tag in tags:
+            epc = tag_epc(tag)
+            count = tag_value(tag, 'TagSeenCount', 1)
+            key = (reader, tag_value(tag, 'AntennaID'),
+                   tag_value(tag, 'ChannelIndex'))
+            counter(()).add(second, epc, count)
+            counter(key[:1]).add(second, epc, count)
+            counter(key[:2]).add(second, epc, count)
+            counter(key).add(second, epc, count)
+
+    def snapshot(self, level='antenna', now=None):
+        """Return a dict of key -> (reads/s, unique EPCs/s).
+
+        Keys are () for 'total', (reader,) for 'reader', (reader, antenna)
+        for 'antenna' and (reader, antenna, channel) for 'channel'.
+        """
+        size = LEVELS[level]
+        if now is None:
+            now = self.clock()
+        return {key: counter.rates(now)
+                for key, counter in self.counters.items()
+                if len(key) == size}
+
+    def rate(self, key=(), now=None):
+        """Return (reads/s, unique EPCs/s) for one key (see snapshot())."""
+        counter = self.counters.get(tuple(key))
+        if counter is None:
+            return 0.0, 0.0
+        return counter.rates(self.clock() if now is None else now)
@@ -0,0 +1,210 @@
+"""Smoothed RSSI and read rate per (EPC, antenna).
+
+PeakRSSI is noisy from read to read.  SignalTracker keeps an exponentially
+weighted moving average of each tag's RSSI at each antenna, plus a decaying
+read-rate estimate, in preallocated NumPy arrays: rows are EPCs (looked up in
+a dict of EPC -> row) and columns are antennas.  Each report is folded in
+with a handful of array operations rather than per-tag arithmetic.
+
+Where readers report ImpinjPeakRSSI (hundredths of a dBm) it is used instead
+of PeakRSSI (whole dBm).
+
+Requires NumPy (pip install sllurp[numpy]).
+"""
+
+from __future__ import division, unicode_literals
+import logging
+import time
+import numpy as np
+
+from .tags import tag_reports
+
+logger = logging.getLogger(__name__)
+
+
+class SignalTracker(object):
+    """Per-(EPC, antenna) smoothed RSSI and read rate.
+
+    Every read updates a tag's smoothed RSSI as
+    rssi = (1 - alpha) * rssi + alpha * read_rssi, in the order that reads
+    appear in reports.  The read rate (reads per second) decays with time
+    constant `rate_time_constant` seconds.
+
+    At most `capacity` EPCs are tracked; when a new EPC doesn't fit, the
+    eighth of the table that was read least recently is dropped.  Antennas
+    are identified by (reader host, antenna ID); columns are added as
+    needed.
+    """
+
+    def __init__(self, capacity=65536, alpha=0.25, rate_time_constant=1.0,
+                 antennas=8, clock=time.time):
+        self.capacity = capacity
+        self.alpha = alpha
+        self.rate_time_constant = rate_time_constant
+        self.clock = clock
+
+        self.rssi = np.full((capacity, antennas), np.nan)
+        self.rate = np.zeros((capacity, antennas))
+        self.updated = np.zeros((capacity, antennas))
+        self.last_seen = np.full(capacity, -np.inf)
+
+        # EPC -> row, and the reverse
+        self.slots = {}
+        self.epcs = [None] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+
+        # (host, antenna ID) -> column, and the reverse
+        self.columns = {}
+        self.antennas = []
+
+    def tag_cb(self, llrp_msg):
+        self.addReads(llrp_msg.peername[0], tag_reports(llrp_msg))
+
+    def addReads(self, host, tags, now=None):
+        """Fold a list of TagReportData from one reader into the state."""
+        if not tags:
+            return
+        if now is None:
+            now = self.clock()
+        slots = self.slots
+        columns = self.columns
+        rows = []
+        cols = []
+        values = []
+        counts = []
+        for tag in tags:
+            epc = tag['EPCData']['EPC'] if 'EPCData' in tag \
+                else tag['EPC-96']
+            row = slots.get(epc)
+            if row is None:
+                row = self._allocate(epc, rows)
+            ant = (host, tag['AntennaID'][0] if 'AntennaID' in tag else None)
+            col = columns.get(ant)
+            if col is None:
+                col = self._addColumn(ant)
+            rows.append(row)
+            cols.append(col)
+            if 'ImpinjPeakRSSI' in tag:
+                values.append(tag['ImpinjPeakRSSI'] / 100)
+            elif 'PeakRSSI' in tag:
+                values.append(tag['PeakRSSI'][0])
+            else:
+                values.append(np.nan)
+            counts.append(tag['TagSeenCount'][0] if 'TagSeenCount' in tag
+                          else 1)
+        self.update(np.array(rows), np.array(cols),
+                    np.array(values, dtype=float),
+                    np.array(counts, dtype=float), now)
+
+    def update(self, rows, cols, values, counts, now):
+        """Apply a batch of reads given as parallel arrays.
+
+        Reads without RSSI (NaN values) only count toward the read rate.
+        """
+        ncols = self.rssi.shape[1]
+        cells = rows * ncols + cols
+
+        # read rate: decay each cell once to `now`, then add its reads
+        ucells, inverse = np.unique(cells, return_inverse=True)
+        reads = np.bincount(inverse, weights=counts)
+        rate = self.rate.ravel()
+        updated = self.updated.ravel()
+        decay = np.exp(-(now - updated[ucells]) / self.rate_time_constant)
+        rate[ucells] = rate[ucells] * decay + \
+            reads / self.rate_time_constant
+        updated[ucells] = now
+        self.last_seen[rows] = now
+
+        # RSSI: the sequential EWMA over n reads of one cell, in closed
+        # form.  The k-th read (k = 1..n) gets weight alpha*(1-alpha)^(n-k),
+        # and the old value (1-alpha)^n; a cell's first ever read gets
+        # weight (1-alpha)^(n-1) so that it replaces the initial NaN.
+        have = ~np.isnan(values)
+        if not have.any():
+            return
+        cells, values = cells[have], values[have]
+        order = np.argsort(cells, kind='stable')
+        cells, values = cells[order], values[order]
+        ucells, starts, n = np.unique(cells, return_index=True,
+                                      return_counts=True)
+        group = np.repeat(np.arange(len(ucells)), n)
+        k = np.arange(len(cells)) - starts[group] + 1
+        keep = 1 - self.alpha
+        weights = self.alpha * keep ** (n[group] - k)
+
+        rssi = self.rssi.ravel()
+        old = rssi[ucells]
+        fresh = np.isnan(old)
+        weights[starts[fresh]] = keep ** (n[fresh] - 1)
+        old_weight = np.where(fresh, 0, keep ** n)
+        rssi[ucells] = np.where(fresh, 0, old) * old_weight + \
+            np.bincount(group, weights=weights * values)
+
+    def _allocate(self, epc, pending):
+        if not self._free:
+            self._evict(pending)
+        row = self._free.pop()
+        self.slots[epc] = row
+        self.epcs[row] = epc
+        self.last_seen[row] = np.inf  # don't evict before update()
+        return row
+
+    def _evict(self, pending):
+        """Free the least recently read eighth of the rows."""
+        n = max(1, self.capacity // 8)
+        if pending:
+            # rows read in the batch being collected
+            self.last_seen[pending] = np.inf
+        victims = np.argpartition(self.last_seen, n - 1)[:n]
+        logger.debug('evicting %d EPCs', n)
+        for row in victims:
+            row = int(row)
+            del self.slots[self.epcs[row]]
+            self.epcs[row] = None
+            self._free.append(row)
+        self.rssi[victims] = np.nan
+        self.rate[victims] = 0
+        self.updated[victims] = 0
+        self.last_seen[victims] = -np.inf
+
+    def _addColumn(self, ant):
+        col = len(self.antennas)
+        if col == self.rssi.shape[1]:
+            grow = ((0, 0), (0, col))
+            self.rssi = np.pad(self.rssi, grow, constant_values=np.nan)
+            self.rate = np.pad(self.rate, grow, constant_values=0)
+            self.updated = np.pad(self.updated, grow, constant_values=0)
+        self.columns[ant] = col
+        self.antennas.append(ant)
+        return col
+
+    def get(self, epc, host, antenna, now=None):
+        """Return (smoothed RSSI, reads per second) for a tag at an antenna.
+
+        Returns None if the tag hasn't been read there.
+        """
+        row = self.slots.get(epc)
+        col = self.columns.get((host, antenna))
+        if row is None or col is None:
+            return None
+        rssi, rate = self.rssi[row, col], self.rate[row, col]
+        if np.isnan(rssi) and not rate:
+            return None
+        if now is None:
+            now = self.clock()
+        decay = np.exp(-(now - self.updated[row, col]) /
+                       self.rate_time_constant)
+        return float(rssi), float(rate * decay)
+
+    def strongest(self, epc):
+        """Return the (host, antenna ID) with the highest smoothed RSSI."""
+        row = self.slots.get(epc)
+        if row is None:
+            return None
+        rssi = self.rssi[row, :len(self.antennas)]
+        if np.isnan(rssi).all():
+            return None
+        return self.antennas[int(np.nanargmax(rssi))]
+
+    def __len__(self):
+        return len(self.slots)
@@ -0,0 +1,43 @@
+"""Accessors for decoded TagReportData dictionaries.
+
+TV-encoded fields decode to 1-tuples (e.g., tag['AntennaID'] == (1,)), while
+Impinj extension fields decode to plain numbers.
+"""
+
+from __future__ import unicode_literals
+
+
+def tag_epc(tag):
+    """Return a tag's EPC as a hex string (bytes)."""
+    if 'EPCData' in tag:
+        return tag['EPCData']['EPC']
+    return tag['EPC-96']
+
+
+def tag_value(tag, name, default=None):
+    """Return the value of a field in a tag report, or default."""
+    try:
+        value = tag[name]
+    except KeyError:
+        return default
+    if isinstance(value, tuple):
+        return value[0]
+    return value
+
+
+def tag_reports(llrp_msg):
+    """Return the list of TagReportData in an RO_ACCESS_REPORT message."""
+    return llrp_msg.msgdict['RO_ACCESS_REPORT']['TagReportData']
+
+
+def tags_by_rospec(llrp_msg):
+    """Group the tags in an RO_ACCESS_REPORT by the ROSpec that read them.
+
+    Returns a dict of ROSpecID -> list of TagReportData.  Tags are reported
+    with their ROSpecID only if EnableROSpecID is set (as it is by default);
+    others are listed under None.
+    """
+    groups = {}
+    for tag in tag_reports(llrp_msg):
+        groups.setdefault(tag_value(tag, 'ROSpecID'), []).append(tag)
+    return groups
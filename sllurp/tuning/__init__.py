@@ -0,0 +1,8 @@
+"""Closed-loop tuning of inventory settings.
+
+Each tuner watches one reader's tag reports and changes its inventory
+settings with LLRPClient.reconfigure().  To tune every reader a factory
+connects to:
+
+    tuners = PopulationTuner.attach(factory)
+"""
@@ -0,0 +1,159 @@
+"""Common machinery for tuners."""
+
+from __future__ import division, unicode_literals
+from collections import deque, namedtuple
+import logging
+from twisted.internet import reactor, task
+
+from ..llrp import LLRPClient
+from ..stream.tags import tag_reports, tag_value
+
+logger = logging.getLogger(__name__)
+
+TuningRecord = namedtuple('TuningRecord', (
+    'time',       # when the change was made
+    'settings',   # settings passed to LLRPClient.reconfigure()
+    'previous',   # the values they replaced
+    'before',     # reads per second before the change
+    'after',      # reads per second after it, or None until measured
+))
+
+
+class Tuner(object):
+    """Base class for tuners of one reader's inventory settings.
+
+    Every `interval` seconds, tick() measures the read rate and calls
+    evaluate(), which subclasses implement and which may call apply() to
+    change settings.  Changes are at least `min_interval` seconds apart:
+    each one restarts inventory.  The read rate over the `settle` seconds
+    after a change is compared with the rate before it; the completed
+    TuningRecord is appended to `history` and passed to `on_change`.
+    """
+
+    def __init__(self, proto, interval=5.0, min_interval=30.0, settle=None,
+                 on_change=None, clock=reactor):
+        self.proto = proto
+        self.interval = interval
+        self.min_interval = min_interval
+        self.settle = interval if settle is None else settle
+        self.on_change = on_change
+        self.clock = clock
+
+        self.history = []
+        self._pending = None
+        self._last_change = None
+
+        # (time, reads/s) of recent ticks
+        self.rates = deque(maxlen=max(1, int(round(self.settle /
+                                                   interval))))
+        self._reads = 0
+        self._since = clock.seconds()
+
+        proto.addMessageCallback('RO_ACCESS_REPORT', self.tag_cb)
+        self._ticker = task.LoopingCall(self.tick)
+        self._ticker.clock = clock
+
+    @classmethod
+    def attach(cls, factory, **kwargs):
+        """Start a tuner for every reader that factory connects to.
+
+        Returns a dict of LLRPClient -> tuner, kept up to date as readers
+        connect and disconnect; a reader that reconnects gets a new tuner.
+        """
+        tuners = {}
+
+        def inventorying(proto):
+            if proto not in tuners:
+                tuners[proto] = cls(proto, **kwargs)
+                tuners[proto].start()
+
+        def disconnected(proto):
+            tuner = tuners.pop(proto, None)
+            if tuner is not None:
+                tuner.stop()
+
+        factory.addStateCallback(LLRPClient.STATE_INVENTORYING, inventorying)
+        factory.addStateCallback(LLRPClient.STATE_DISCONNECTED, disconnected)
+        # a dropped connection doesn't go through STATE_DISCONNECTED
+        factory.addProtocolRemovedCallback(disconnected)
+        return tuners
+
+    def start(self):
+        self._ticker.start(self.interval, now=False)
+
+    def stop(self):
+        if self._ticker.running:
+            self._ticker.stop()
+        self.proto.removeMessageCallback('RO_ACCESS_REPORT', self.tag_cb)
+
+    def tag_cb(self, llrp_msg):
+        tags = tag_reports(llrp_msg)
+        for tag in tags:
+            self._reads += tag_value(tag, 'TagSeenCount', 1)
+        self.addReads(tags)
+
+    def addReads(self, tags):
+        """Look at a list of TagReportData; for subclasses."""
+
+    def evaluate(self, now):
+        """Decide whether to change settings; for subclasses."""
+
+    @property
+    def rate(self):
+        """Mean reads per second over the last `settle` seconds."""
+        if not self.rates:
+            return None
+        return sum(r for _, r in self.rates) / len(self.rates)
+
+    def tick(self):
+        if not self.proto.connected:
+            # the connection dropped under us; attach() stops us soon
+            return
+        now = self.clock.seconds()
+        elapsed = now - self._since
+        if elapsed > 0:
+            self.rates.append((now, self._reads / elapsed))
+        self._reads = 0
+        self._since = now
+
+        pending = self._pending
+        if pending is not None and len(self.rates) == self.rates.maxlen and \
+                self.rates[0][0] - self.interval >= pending.time:
+            # every tick in self.rates started after the change
+            record = pending._replace(after=self.rate)
+            self._pending = None
+            self.history.append(record)
+            logger.info('%s: %s -> %s changed throughput from %.1f to %.1f '
+                        'reads/s', self.proto.peername, record.previous,
+                        record.settings, record.before or 0, record.after)
+            if self.on_change is not None:
+                self.on_change(record)
+
+        if self.proto.state == LLRPClient.STATE_INVENTORYING:
+            self.evaluate(now)
+
+    def canApply(self, now=None):
+        if now is None:
+            now = self.clock.seconds()
+        return self._pending is None and (
+            self._last_change is None or
+            now - self._last_change >= self.min_interval)
+
+    def apply(self, **settings):
+        """Reconfigure the reader, unless a change was made too recently.
+
+        Returns the Deferred from LLRPClient.reconfigure(), or None if the
+        change was not made.
+        """
+        now = self.clock.seconds()
+        if not self.canApply(now):
+            return None
+        previous = {name: getattr(self.proto, name) for name in settings}
+        if previous == settings:
+            return None
+        self._last_change = now
+        self._pending = TuningRecord(now, settings, previous, self.rate,
+                                     None)
+        self.rates.clear()
+        logger.info('%s: tuning %s', self.proto.peername, settings)
+        return self.proto.reconfigure(**settings)
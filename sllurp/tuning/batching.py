@@ -0,0 +1,85 @@
+"""Tune how many tags go into each report.
+
+With report_every_n_tags=N, the reader ends each AISpec round, and sends a
+report, after N tags or report_timeout_ms milliseconds.  Small N means a
+flood of small RO_ACCESS_REPORTs; large N means tags wait longer to be
+reported.  BatchingTuner picks the largest N that keeps reports within a
+target latency, given how fast tags are being read and how late reports
+actually arrive.
+"""
+
+from __future__ import division, unicode_literals
+import logging
+
+from .base import Tuner
+from ..stream.tags import tag_value
+
+logger = logging.getLogger(__name__)
+
+
+class BatchingTuner(Tuner):
+    """Adjust report_every_n_tags and report_timeout_ms for a target latency.
+
+    A report's latency is the time from its oldest LastSeenTimestampUTC to
+    when we process it, so it includes batching, network and our own
+    processing lag; register a ClockTracker (sllurp.stream.clock) first if
+    reader clocks aren't synchronized with ours.  At the observed rate of
+    tag reports, N = rate * `target_latency` fills a report in about the
+    target time; N is scaled down when the observed latency exceeds the
+    target anyway.  The timeout is set to the target latency, to bound it
+    when reads are scarce.
+
+    N stays within [`min_tags`, `max_tags`] and is only changed when it is
+    off by more than a factor of `tolerance`.  Other arguments are passed to
+    Tuner.
+    """
+
+    def __init__(self, proto, target_latency=1.0, min_tags=1,
+                 max_tags=10000, tolerance=2.0, **kwargs):
+        super(BatchingTuner, self).__init__(proto, **kwargs)
+        self.target_latency = target_latency
+        self.min_tags = min_tags
+        self.max_tags = max_tags
+        self.tolerance = tolerance
+
+        self.num_reports = 0
+        self.num_tags = 0
+        self._latency_sum = 0.0
+        self._latency_count = 0
+
+    def addReads(self, tags):
+        self.num_reports += 1
+        self.num_tags += len(tags)
+        stamps = [tag_value(tag, 'LastSeenTimestampUTC') for tag in tags
+                  if 'LastSeenTimestampUTC' in tag]
+        if stamps:
+            now = self.clock.seconds()
+            self._latency_sum += now - min(stamps) / 1e6
+            self._latency_count += 1
+
+    def evaluate(self, now):
+        reports, tags = self.num_reports, self.num_tags
+        latency = self._latency_sum / self._latency_count \
+            if self._latency_count else None
+        self.num_reports = self.num_tags = 0
+        self._latency_sum = 0.0
+        self._latency_count = 0
+        if not reports or not self.canApply(now):
+            return
+
+        tag_rate = tags / self.interval
+        wanted = tag_rate * self.target_latency
+        if latency is not None and latency > self.target_latency:
+            wanted *= self.target_latency / latency
+        wanted = int(min(max(wanted, self.min_tags), self.max_tags))
+
+        current = self.proto.report_every_n_tags
+        timeout = int(self.target_latency * 1000)
+        logger.debug('%s: %d reports/s of %.1f tags, latency %s; N=%s, '
+                     'want %d', self.proto.peername, reports / self.interval,
+                     tags / reports, latency, current, wanted)
+        if current and current / self.tolerance <= wanted <= \
+                current * self.tolerance and \
+                self.proto.report_timeout_ms == timeout:
+            return
+        self.apply(report_every_n_tags=wanted, report_timeout_ms=timeout)
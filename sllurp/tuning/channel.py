@@ -0,0 +1,126 @@
+"""Choose the channels an Impinj reader uses.
+
+In regions that don't require frequency hopping (ETSI, for example), an
+Impinj reader can be limited to a list of channels from its fixed frequency
+table with ImpinjFixedFrequencyListParameter (impinj_fixed_frequency_param
+with FixedFrequencyMode 2).  A channel shared with another reader or some
+other interferer reads far fewer tags than the rest; ChannelTuner measures
+each channel's read yield and keeps the reader on the good ones.
+"""
+
+from __future__ import division, unicode_literals
+from collections import defaultdict
+import logging
+
+from .base import Tuner
+from ..stream.tags import tag_value
+
+logger = logging.getLogger(__name__)
+
+
+def fixed_channels(capabilities):
+    """Return the ChannelIndexes a fixed-frequency list may use.
+
+    The list is empty if the reader's region requires hopping.
+    """
+    freqinfo = capabilities['RegulatoryCapabilities']['UHFBandCapabilities'][
+        'FrequencyInformation']
+    table = freqinfo.get('FixedFrequencyTable')
+    if freqinfo.get('Hopping') or not table:
+        return []
+    return sorted(int(key[len('Frequency'):]) for key in table
+                  if key.startswith('Frequency'))
+
+
+class ChannelTuner(Tuner):
+    """Keep the reader on the channels with the best read yield.
+
+    A channel's yield is its reads per second of dwell: the reads reported
+    with its ChannelIndex, divided by its share of the measurement (the
+    reader spreads its time evenly over the listed channels).  Tag reports
+    must include ChannelIndex (EnableChannelIndex in tag_content_selector),
+    and the client must be created with an impinj_fixed_frequency_param so
+    that Impinj extensions are enabled.
+
+    Every `survey_interval` seconds the reader is put on every channel for
+    one measurement, so channels that have recovered get another chance.
+    In between, the channels yielding at least `min_share` of the best
+    channel are used, at least `min_channels` and at most `max_channels` of
+    them, so losing any one channel costs little throughput.  Other
+    arguments are passed to Tuner; each measurement lasts `min_interval`.
+    """
+
+    def __init__(self, proto, min_share=0.5, min_channels=2,
+                 max_channels=None, survey_interval=600.0, **kwargs):
+        super(ChannelTuner, self).__init__(proto, **kwargs)
+        self.min_share = min_share
+        self.min_channels = min_channels
+        self.max_channels = max_channels
+        self.survey_interval = survey_interval
+
+        # ChannelIndex -> reads per second of dwell, as last measured
+        self.yields = {}
+        self._last_survey = None
+        self._window_start = self.clock.seconds()
+        self._channel_reads = defaultdict(int)
+
+        if proto.impinj_fixed_frequency_param is None:
+            logger.warning('%s: Impinj extensions are not enabled; not '
+                           'tuning channels', proto.peername)
+
+    def addReads(self, tags):
+        for tag in tags:
+            channel = tag_value(tag, 'ChannelIndex')
+            if channel is not None:
+                self._channel_reads[channel] += tag_value(tag, 'TagSeenCount',
+                                                          1)
+
+    def current(self):
+        """Return the channels in use."""
+        param = self.proto.impinj_fixed_frequency_param or {}
+        if param.get('FixedFrequencyMode') != 2:
+            return fixed_channels(self.proto.capabilities)
+        return sorted(param['ChannelListIndex'])
+
+    def select(self):
+        """Return the channels to use, from the measured yields."""
+        ranked = sorted(self.yields, key=lambda ch: (-self.yields[ch], ch))
+        if not ranked:
+            return []
+        best = self.yields[ranked[0]]
+        chosen = [ch for ch in ranked
+                  if self.yields[ch] >= self.min_share * best]
+        if len(chosen) < self.min_channels:
+            chosen = ranked[:self.min_channels]
+        if self.max_channels is not None:
+            chosen = chosen[:self.max_channels]
+        return sorted(chosen)
+
+    def evaluate(self, now):
+        if self.proto.impinj_fixed_frequency_param is None or \
+                now - self._window_start < self.min_interval or \
+                not self.canApply(now):
+            return
+        available = fixed_channels(self.proto.capabilities)
+        if not available:
+            return
+        active = [ch for ch in self.current() if ch in available]
+        if active:
+            dwell = (now - self._window_start) / len(active)
+            for channel in active:
+                self.yields[channel] = self._channel_reads[channel] / dwell
+            if set(active) == set(available):
+                self._last_survey = now
+        self._channel_reads.clear()
+        self._window_start = now
+
+        if self._last_survey is None or \
+                now - self._last_survey >= self.survey_interval:
+            wanted = available
+        else:
+            wanted = self.select()
+        if wanted and wanted != active:
+            logger.info('%s: channel yields %s', self.proto.peername,
+                        self.yields)
+            self.apply(impinj_fixed_frequency_param={
+                'FixedFrequencyMode': 2, 'ChannelListIndex': wanted})
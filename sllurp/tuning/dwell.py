@@ -0,0 +1,107 @@
+"""Share inventory time between antennas by how busy they are.
+
+With antenna_dwell, the ROSpec has one AISpec per antenna and the reader
+cycles through them, spending each antenna's dwell on it.  A dock door with
+pallets going through deserves more of the cycle than a shelf whose tags
+were all read long ago.  DwellScheduler measures each antenna's yield and
+rebalances the dwells.
+"""
+
+from __future__ import division, unicode_literals
+from collections import defaultdict
+import logging
+
+from .base import Tuner
+from ..stream.tags import tag_epc, tag_value
+
+logger = logging.getLogger(__name__)
+
+
+class DwellScheduler(Tuner):
+    """Divide a `cycle` of seconds between antennas by recent yield.
+
+    An antenna's yield is the rate at which it reads new tags: EPCs it had
+    not read in the previous `memory` seconds, so tags sitting on a shelf
+    only count when they arrive.  Yields are smoothed over ticks with weight
+    `alpha` for the newest.
+
+    Every antenna gets at least `min_dwell` seconds per cycle, so an idle
+    antenna still notices tags arriving; the rest of the cycle is shared in
+    proportion to yield.  The ROSpec is only regenerated when some antenna's
+    dwell would change by more than a fraction `tolerance`.  Tag reports
+    must include AntennaID.  Other arguments are passed to Tuner.
+    """
+
+    def __init__(self, proto, cycle=2.0, min_dwell=0.1, memory=60.0,
+                 alpha=0.3, tolerance=0.25, **kwargs):
+        super(DwellScheduler, self).__init__(proto, **kwargs)
+        if min_dwell * len(proto.antennas) > cycle:
+            raise ValueError('cycle is too short for min_dwell on every '
+                             'antenna')
+        self.cycle = cycle
+        self.min_dwell = min_dwell
+        self.memory = memory
+        self.alpha = alpha
+        self.tolerance = tolerance
+
+        # antenna ID -> smoothed new tags per second
+        self.yields = {}
+        self._window_start = self.clock.seconds()
+        # antenna ID -> {EPC: last seen}
+        self._seen = defaultdict(dict)
+        self._arrivals = defaultdict(int)
+
+    def addReads(self, tags):
+        now = self.clock.seconds()
+        cutoff = now - self.memory
+        for tag in tags:
+            antenna = tag_value(tag, 'AntennaID')
+            if antenna is None:
+                continue
+            seen = self._seen[antenna]
+            epc = tag_epc(tag)
+            if seen.get(epc, cutoff) <= cutoff:
+                self._arrivals[antenna] += 1
+            seen[epc] = now
+
+    def dwells(self):
+        """Return antenna ID -> seconds per cycle, from the yields."""
+        antennas = self.proto.antennas
+        spare = self.cycle - self.min_dwell * len(antennas)
+        total = sum(self.yields.get(ant, 0) for ant in antennas)
+        dwells = {}
+        for ant in antennas:
+            share = self.yields.get(ant, 0) / total if total \
+                else 1 / len(antennas)
+            # the reader counts in milliseconds
+            dwells[ant] = round(self.min_dwell + spare * share, 3)
+        return dwells
+
+    def evaluate(self, now):
+        elapsed = now - self._window_start
+        if elapsed <= 0:
+            return
+        for ant in self.proto.antennas:
+            rate = self._arrivals.get(ant, 0) / elapsed
+            old = self.yields.get(ant)
+            self.yields[ant] = rate if old is None else \
+                self.alpha * rate + (1 - self.alpha) * old
+        self._arrivals.clear()
+        self._window_start = now
+        cutoff = now - self.memory
+        for seen in self._seen.values():
+            for epc in [epc for epc, when in seen.items() if when < cutoff]:
+                del seen[epc]
+        if not self.canApply(now):
+            return
+
+        wanted = self.dwells()
+        current = self.proto.antenna_dwell
+        if isinstance(current, dict) and set(current) == set(wanted) and \
+                all(not isinstance(current[ant], dict) and
+                    abs(wanted[ant] - current[ant]) <=
+                    self.tolerance * current[ant] for ant in wanted):
+            return
+        logger.debug('%s: antenna yields %s', self.proto.peername,
+                     self.yields)
+        self.apply(antenna_dwell=wanted)
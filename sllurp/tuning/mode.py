@@ -0,0 +1,212 @@
+"""Pick an RF mode by trying each one.
+
+The reader's UHFRFModeTable lists the Gen2 link profiles it supports
+(modulation, Tari, backscatter data rate...).  Which one reads the most tags
+depends on the tags, the population and the RF environment, so the surest
+way to choose is to measure: ModeBenchmark inventories with each candidate
+ModeIdentifier for a timed round, counts distinct EPCs and reads per second,
+and pins the winner.
+
+Results are cached per reader in a ModeCache, keyed by a fingerprint of the
+reader's capabilities, so a reader is benchmarked again only when its
+firmware, region or mode table changes.
+"""
+
+from __future__ import division, unicode_literals
+from collections import namedtuple
+import hashlib
+import json
+import logging
+import os
+import time
+
+from twisted.internet import reactor, defer, task
+
+from ..llrp import LLRPClient
+from ..llrp_errors import LLRPError, ReaderConfigurationError
+from ..stream.tags import tag_epc, tag_reports, tag_value
+from ..util import natural_keys
+
+logger = logging.getLogger(__name__)
+
+ModeResult = namedtuple('ModeResult', (
+    'mode',         # ModeIdentifier
+    'unique_rate',  # distinct EPCs per second
+    'read_rate',    # reads per second
+))
+
+
+def mode_table(capabilities):
+    """Return the reader's UHFRFModeTable entries as a list, in table order."""
+    modes = capabilities['RegulatoryCapabilities']['UHFBandCapabilities'][
+        'UHFRFModeTable']
+    return [modes[k] for k in sorted(modes.keys(), key=natural_keys)]
+
+
+def _json_default(obj):
+    if isinstance(obj, bytes):
+        return obj.decode('latin-1')
+    return repr(obj)
+
+
+def capability_fingerprint(capabilities):
+    """Return a hex digest of the capabilities that affect mode choice.
+
+    The general device capabilities (model, firmware version, antennas) and
+    the regulatory capabilities (region, power levels, frequencies, mode
+    table) are hashed; message IDs and status are not.
+    """
+    relevant = {name: capabilities.get(name) for name in
+                ('GeneralDeviceCapabilities', 'RegulatoryCapabilities')}
+    encoded = json.dumps(relevant, sort_keys=True, default=_json_default)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+class ModeCache(object):
+    """Benchmark results in a JSON file.
+
+    The file maps reader (reader ID or IP address) -> capability fingerprint
+    -> {'best': ModeIdentifier, 'results': [ModeResult...], 'time': when}.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as cachefile:
+                self.entries = json.load(cachefile)
+
+    def lookup(self, reader, fingerprint):
+        """Return the cached entry, or None."""
+        return self.entries.get(reader, {}).get(fingerprint)
+
+    def store(self, reader, fingerprint, best, results, when=None):
+        self.entries.setdefault(reader, {})[fingerprint] = {
+            'best': best,
+            'results': [list(result) for result in results],
+            'time': time.time() if when is None else when,
+        }
+        self.save()
+
+    def save(self):
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(self.path, 'w') as cachefile:
+            json.dump(self.entries, cachefile, indent=2, sort_keys=True)
+
+
+class ModeBenchmark(object):
+    """Find the RF mode that reads the most tags on one reader.
+
+    run() reconfigures the reader with each of `modes` (default: every mode
+    in its UHFRFModeTable), waits `settle` seconds for inventory to restart,
+    then counts reads for `round_time` seconds.  The mode with the most
+    distinct EPCs per second wins, with reads per second breaking ties; it
+    stays configured when run() is done.
+
+    Tags in session 2 or 3 stay quiet for a while after being read, which
+    would penalize every mode after the first; benchmark in session 0 or 1.
+
+    If `cache` (a ModeCache) has results for this reader and capability
+    fingerprint, the cached best mode is pinned without measuring, unless
+    `force` is set.
+    """
+
+    def __init__(self, proto, modes=None, round_time=10.0, settle=2.0,
+                 cache=None, force=False, clock=reactor):
+        self.proto = proto
+        self.modes = modes
+        self.round_time = round_time
+        self.settle = settle
+        self.cache = cache
+        self.force = force
+        self.clock = clock
+
+        self.results = []
+        self.best = None
+        self._counting = False
+        self._reads = 0
+        self._epcs = set()
+
+        proto.addMessageCallback('RO_ACCESS_REPORT', self.tag_cb)
+
+    @property
+    def reader(self):
+        return self.proto.reader_id or self.proto.peer_ip
+
+    def candidates(self):
+        """Return the ModeIdentifiers to try."""
+        available = [mode['ModeIdentifier']
+                     for mode in mode_table(self.proto.capabilities)]
+        if self.modes is None:
+            return available
+        invalid = [mode for mode in self.modes if mode not in available]
+        if invalid:
+            raise ReaderConfigurationError(
+                'Invalid mode_identifier {}; valid mode_identifiers are '
+                '{}'.format(invalid, sorted(available)))
+        return list(self.modes)
+
+    def tag_cb(self, llrp_msg):
+        if not self._counting:
+            return
+        for tag in tag_reports(llrp_msg):
+            self._reads += tag_value(tag, 'TagSeenCount', 1)
+            self._epcs.add(tag_epc(tag))
+
+    @defer.inlineCallbacks
+    def run(self):
+        """Benchmark and pin the best mode.
+
+        Call this while the reader is inventorying.  Returns a Deferred that
+        fires with the chosen ModeIdentifier.
+        """
+        if self.proto.state != LLRPClient.STATE_INVENTORYING:
+            raise LLRPError('cannot benchmark modes unless inventorying')
+        fingerprint = capability_fingerprint(self.proto.capabilities)
+        cached = None
+        if self.cache is not None and not self.force:
+            cached = self.cache.lookup(self.reader, fingerprint)
+
+        if cached is not None:
+            logger.info('%s: using cached best mode %s', self.proto.peername,
+                        cached['best'])
+            self.results = [ModeResult(*result)
+                            for result in cached['results']]
+            self.best = cached['best']
+        else:
+            self.results = []
+            for mode in self.candidates():
+                result = yield self.measure(mode)
+                self.results.append(result)
+            self.best = max(self.results, key=lambda result: (
+                result.unique_rate, result.read_rate)).mode
+            logger.info('%s: best mode is %s', self.proto.peername,
+                        self.best)
+            if self.cache is not None:
+                self.cache.store(self.reader, fingerprint, self.best,
+                                 self.results)
+
+        if self.proto.mode_identifier != self.best:
+            yield self.proto.reconfigure(mode_identifier=self.best)
+        defer.returnValue(self.best)
+
+    @defer.inlineCallbacks
+    def measure(self, mode):
+        """Inventory for one round with `mode`; return a ModeResult."""
+        yield self.proto.reconfigure(mode_identifier=mode)
+        yield task.deferLater(self.clock, self.settle, lambda: None)
+        self._reads = 0
+        self._epcs = set()
+        self._counting = True
+        try:
+            yield task.deferLater(self.clock, self.round_time, lambda: None)
+        finally:
+            self._counting = False
+        result = ModeResult(mode, len(self._epcs) / self.round_time,
+                            self._reads / self.round_time)
+        logger.info('%s: mode %s read %.1f tags/s, %.1f reads/s',
+                    self.proto.peername, mode, result.unique_rate,
+                    result.read_rate)
+        defer.returnValue(result)
@@ -0,0 +1,86 @@
+"""Tune C1G2SingulationControl TagPopulation to the tags in the field.
+
+TagPopulation tells the reader how many tags to expect, which sets the
+initial Q of the Gen2 anticollision algorithm.  Far too low a value makes
+singulation slow to converge when there are thousands of tags in the field;
+far too high wastes slots when there are few.
+
+PopulationTuner estimates each antenna's population as the number of
+distinct EPCs it has read in the last `window` seconds.  Tags in session 2
+or 3 answer once and then stay quiet, so a count of distinct EPCs per
+report (per AISpec round) would miss most of them; a window that spans
+several rounds catches them.
+"""
+
+from __future__ import division, unicode_literals
+import logging
+
+from .base import Tuner
+from ..stream.tags import tag_epc, tag_value
+
+logger = logging.getLogger(__name__)
+
+
+class PopulationTuner(Tuner):
+    """Per-antenna TagPopulation from the distinct EPCs read recently.
+
+    When an antenna's estimate leaves the band [`low` * setting, `high` *
+    setting], the ROSpec is regenerated with the estimate (at least
+    `minimum`).  Other arguments are passed to Tuner.
+    """
+
+    def __init__(self, proto, window=30.0, low=0.5, high=2.0, minimum=4,
+                 **kwargs):
+        super(PopulationTuner, self).__init__(proto, **kwargs)
+        self.window = window
+        self.low = low
+        self.high = high
+        self.minimum = minimum
+        # antenna ID -> {EPC: last seen}
+        self.seen = {}
+
+    def addReads(self, tags):
+        now = self.clock.seconds()
+        seen = self.seen
+        for tag in tags:
+            antenna = tag_value(tag, 'AntennaID')
+            epcs = seen.get(antenna)
+            if epcs is None:
+                epcs = seen[antenna] = {}
+            epcs[tag_epc(tag)] = now
+
+    def estimate(self, now=None):
+        """Return a dict of antenna ID -> distinct EPCs in the window."""
+        if now is None:
+            now = self.clock.seconds()
+        cutoff = now - self.window
+        estimates = {}
+        for antenna, epcs in self.seen.items():
+            stale = [epc for epc, when in epcs.items() if when < cutoff]
+            for epc in stale:
+                del epcs[epc]
+            estimates[antenna] = len(epcs)
+        return estimates
+
+    def current(self):
+        """Return the TagPopulation setting per antenna."""
+        setting = self.proto.tag_population
+        if isinstance(setting, dict):
+            return {ant: setting.get(ant, self.minimum)
+                    for ant in self.proto.antennas}
+        return {ant: setting for ant in self.proto.antennas}
+
+    def evaluate(self, now):
+        estimates = self.estimate(now)
+        if not self.canApply(now):
+            return
+        current = self.current()
+        wanted = dict(current)
+        for antenna, setting in current.items():
+            estimate = max(estimates.get(antenna, 0), self.minimum)
+            if not self.low * setting <= estimate <= self.high * setting:
+                wanted[antenna] = estimate
+        if wanted != current:
+            logger.info('%s: estimated tag populations %s',
+                        self.proto.peername, estimates)
+            self.apply(tag_population=wanted)
@@ -0,0 +1,174 @@
+"""Tune each antenna's transmit power.
+
+More power reads more of the tags in an antenna's zone, but also more tags
+in neighbouring zones.  PowerTuner searches each antenna's entries in the
+reader's transmit power table for the setting that reads the most distinct
+tags of its own zone while keeping the share of reads from other zones
+under a limit.  It needs AntennaID in tag reports (EnableAntennaID in
+tag_content_selector).
+"""
+
+from __future__ import division, unicode_literals
+from collections import defaultdict, namedtuple
+import logging
+
+from .base import Tuner
+from ..stream.tags import tag_epc, tag_value
+
+logger = logging.getLogger(__name__)
+
+PowerTrial = namedtuple('PowerTrial', (
+    'time',      # end of the measurement
+    'antenna',
+    'index',     # index into the reader's tx_power_table
+    'dbm',
+    'unique',    # distinct EPCs of the antenna's own zone
+    'foreign',   # fraction of its reads that were of other zones' tags
+))
+
+
+class PowerTuner(Tuner):
+    """Search each antenna's transmit power by hill climbing.
+
+    Each setting is measured for `min_interval` seconds.  A tag belongs to
+    the zone of the antenna given by `zones` (a dict of EPC -> antenna ID,
+    or a callable returning the antenna ID or None), or by default to the
+    antenna that read it most often in the measurement.  A setting is
+    acceptable if at most `max_foreign` of the antenna's reads were of
+    other zones' tags; acceptable settings are ranked by the distinct EPCs
+    of the antenna's own zone, then by lower power.
+
+    All antennas are searched at once, starting from the current settings
+    with steps of `step` table entries, halved whenever neither direction
+    improves.  Every measurement is appended to `trials`; when every
+    antenna's search has converged the best settings are applied, stored in
+    `final` and passed to `on_done`.  Other arguments are passed to Tuner.
+    """
+
+    def __init__(self, proto, zones=None, max_foreign=0.05, step=8,
+                 on_done=None, **kwargs):
+        super(PowerTuner, self).__init__(proto, **kwargs)
+        self.zones = zones
+        self.max_foreign = max_foreign
+        self.initial_step = step
+        self.on_done = on_done
+
+        self.trials = []
+        self.final = None
+        # antenna ID -> search state
+        self.searches = {}
+        self._window_start = self.clock.seconds()
+        # antenna ID -> EPC -> reads in this measurement
+        self._counts = defaultdict(lambda: defaultdict(int))
+
+    def addReads(self, tags):
+        counts = self._counts
+        for tag in tags:
+            antenna = tag_value(tag, 'AntennaID')
+            if antenna is None:
+                continue
+            counts[antenna][tag_epc(tag)] += tag_value(tag, 'TagSeenCount', 1)
+
+    def zoneOf(self, epc, counts):
+        """Return the antenna ID of the zone epc belongs to, or None."""
+        if self.zones is None:
+            return max(counts, key=lambda ant: (counts[ant], -ant))
+        if callable(self.zones):
+            return self.zones(epc)
+        return self.zones.get(epc)
+
+    def measure(self):
+        """Return antenna ID -> (own-zone distinct EPCs, foreign fraction)."""
+        by_epc = defaultdict(dict)
+        for antenna, epcs in self._counts.items():
+            for epc, count in epcs.items():
+                by_epc[epc][antenna] = count
+        unique = defaultdict(int)
+        foreign = defaultdict(int)
+        total = defaultdict(int)
+        for epc, counts in by_epc.items():
+            zone = self.zoneOf(epc, counts)
+            for antenna, count in counts.items():
+                total[antenna] += count
+                if zone == antenna:
+                    unique[antenna] += 1
+                elif zone is not None:
+                    foreign[antenna] += count
+        return {ant: (unique[ant], foreign[ant] / total[ant]
+                      if total[ant] else 0.0)
+                for ant in self.proto.antennas}
+
+    def score(self, index, unique, foreign):
+        if foreign <= self.max_foreign:
+            return (1, unique, -index)
+        return (0, -foreign, -index)
+
+    def current(self):
+        """Return the tx_power_table index per antenna."""
+        top = len(self.proto.tx_power_table) - 1
+        return {ant: self.proto.tx_power.get(ant) or top
+                for ant in self.proto.antennas}
+
+    def evaluate(self, now):
+        if self.final is not None or not self.proto.tx_power_table or \
+                now - self._window_start < self.min_interval or \
+                not self.canApply(now):
+            return
+        measured = self.measure()
+        self._counts.clear()
+        self._window_start = now
+        table = self.proto.tx_power_table
+
+        wanted = {}
+        for antenna, index in self.current().items():
+            unique, foreign = measured[antenna]
+            self.trials.append(PowerTrial(now, antenna, index, table[index],
+                                          unique, foreign))
+            logger.debug('%s: antenna %s at %s dBm read %d own tags, %.1f%% '
+                         'foreign', self.proto.peername, antenna,
+                         table[index], unique, foreign * 100)
+            wanted[antenna] = self.step(antenna, index,
+                                        self.score(index, unique, foreign))
+
+        if all(search['step'] == 0 for search in self.searches.values()):
+            self.final = {ant: search['best']
+                          for ant, search in self.searches.items()}
+            logger.info('%s: tuned tx power %s', self.proto.peername,
+                        {ant: table[idx] for ant, idx in self.final.items()})
+            self.apply(tx_power=dict(self.final))
+            if self.on_done is not None:
+                self.on_done(self.final)
+            return
+        self.apply(tx_power=wanted)
+
+    def step(self, antenna, index, score):
+        """Record a measurement; return the next index to try."""
+        search = self.searches.get(antenna)
+        if search is None:
+            search = self.searches[antenna] = {
+                'best': index, 'score': score, 'step': self.initial_step,
+                'direction': -1, 'turned': False}
+        elif score > search['score']:
+            search['best'] = index
+            search['score'] = score
+            search['turned'] = False
+        elif search['turned']:
+            search['step'] //= 2
+            search['turned'] = False
+        else:
+            search['direction'] = -search['direction']
+            search['turned'] = True
+
+        top = len(self.proto.tx_power_table) - 1
+        while search['step']:
+            trial = search['best'] + search['direction'] * search['step']
+            if 1 <= trial <= top:
+                return trial
+            # off the end of the table: as if it were no better
+            if search['turned']:
+                search['step'] //= 2
+                search['turned'] = False
+            else:
+                search['direction'] = -search['direction']
+                search['turned'] = True
+        return search['best']
@@ -8,7 +8,8 @@ import time
 from twisted.internet import reactor, defer
 
 from sllurp.util import monotonic
-from sllurp.llrp import LLRPClientFactory
+from sllurp.fleet import FleetManager
+from sllurp.tuning.channel import ChannelTuner
 
 start_time = None
 
@@ -97,25 +98,34 @@ def main(args):
             'EnablePeakRSSI': False,
             'EnableRFDopplerFrequency': False
         }
-    if args.impinj_fixed_freq:
+    if args.impinj_fixed_freq or args.impinj_tune_channels:
         factory_args['impinj_fixed_frequency_param'] = {
             'FixedFrequencyMode': 2,
             'ChannelListIndex': [1]
         }
 
-    fac = LLRPClientFactory(**factory_args)
+    if args.gpi_trigger is not None:
+        # the GPI starts and stops the ROSpec; -t bounds each run
+        factory_args['duration'] = None
+        factory_args['start_trigger'] = {'gpi': args.gpi_trigger}
+        factory_args['stop_trigger'] = {'gpi': args.gpi_trigger,
+                                        'timeout': args.time or 0}
+    elif args.period is not None:
+        # bursts of -t seconds
+        factory_args['start_trigger'] = {'period': args.period}
+
+    fac = FleetManager(**factory_args)
 
     # tag_report_cb will be called every time the reader sends a TagReport
     # message (i.e., when it has "seen" tags).
     fac.addTagReportCallback(tag_report_cb)
 
-    for host in args.host:
-        if ':' in host:
-            host, port = host.split(':', 1)
-            port = int(port)
-        else:
-            port = args.port
-        reactor.connectTCP(host, port, fac, timeout=3)
+    if args.impinj_tune_channels:
+        ChannelTuner.attach(fac)
+
+    # connections are staggered so that large fleets don't all handshake at
+    # once
+    fac.connectAll(args.host, args.port)
 
     # catch ctrl-C and stop inventory before disconnecting
     reactor.addSystemEventTrigger('before', 'shutdown', shutdown, fac)
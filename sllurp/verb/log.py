@@ -12,6 +12,7 @@ import threading
 from twisted.internet import reactor
 
 import sllurp.llrp as llrp
+from sllurp.epc.filter import EPCFilter
 
 
 numTags = 0
@@ -68,7 +69,11 @@ def main(hosts, outfile, antennas, epc, reader_timestamp):
 
     enabled_antennas = map(lambda x: int(x.strip()), antennas.split(','))
 
+    # drop other tags while decoding rather than in CsvLogger
+    epc_filter = EPCFilter(allow=[epc]) if epc else None
+
     fac = llrp.LLRPClientFactory(start_first=True,
+                                 epc_filter=epc_filter,
                                  antennas=enabled_antennas,
                                  start_inventory=False,
                                  disconnect_when_done=True,
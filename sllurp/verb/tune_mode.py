@@ -0,0 +1,71 @@
+"""Tune-mode command.
+"""
+
+from __future__ import print_function, division
+import logging
+from twisted.internet import reactor
+
+from sllurp.fleet import FleetManager
+from sllurp.llrp import LLRPClient
+from sllurp.tuning.mode import ModeBenchmark, ModeCache
+
+logger = logging.getLogger(__name__)
+
+
+def report(best, bench):
+    logger.info('%s: mode results (distinct tags/s, reads/s):',
+                bench.proto.peername)
+    for result in bench.results:
+        logger.info('  mode %s: %.1f, %.1f%s', result.mode,
+                    result.unique_rate, result.read_rate,
+                    ' (best)' if result.mode == best else '')
+    return best
+
+
+def main(args):
+    if not args.host:
+        logger.info('No readers specified.')
+        return 0
+
+    antennas = [int(x.strip()) for x in args.antennas.split(',')]
+    cache = ModeCache(args.cache) if args.cache else None
+    modes = [int(x.strip()) for x in args.modes.split(',')] \
+        if args.modes else None
+
+    fac = FleetManager(antennas=antennas, session=args.session,
+                       tag_population=args.population,
+                       start_inventory=True)
+    benchmarks = {}
+    remaining = [len(args.host)]
+
+    def done(*_):
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            d = fac.politeShutdown()
+            d.addBoth(lambda _: reactor.stop())
+
+    def connected(attempts):
+        for success, _ in attempts.values():
+            if not success:
+                done()
+
+    def inventorying(proto):
+        if proto in benchmarks:
+            return
+        bench = benchmarks[proto] = ModeBenchmark(
+            proto, modes=modes, round_time=args.time, settle=args.settle,
+            cache=cache, force=args.force)
+        d = bench.run()
+        d.addCallback(report, bench)
+        d.addErrback(lambda failure: logger.error(
+            '%s: mode benchmark failed: %s', proto.peername,
+            failure.getErrorMessage()))
+        d.addBoth(done)
+
+    fac.addStateCallback(LLRPClient.STATE_INVENTORYING, inventorying)
+    fac.connectAll(args.host, args.port).addCallback(connected)
+
+    # catch ctrl-C and stop inventory before disconnecting
+    reactor.addSystemEventTrigger('before', 'shutdown', fac.politeShutdown)
+
+    reactor.run()
@@ -0,0 +1,52 @@
+"""Measure TagAggregator throughput.
+
+Run with `python tests/bench_aggregate.py`.  Prints reads per second for
+aggregation alone and for decoding plus aggregation.
+"""
+
+from __future__ import print_function, unicode_literals
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sllurp.llrp import LLRPMessage  # noqa: E402
+from sllurp.stream.aggregate import TagAggregator  # noqa: E402
+from sim_reader import ro_access_report, tag_report_data  # noqa: E402
+
+NUM_EPCS = 20000
+TAGS_PER_REPORT = 100
+NUM_REPORTS = 2000
+READER = ('10.0.0.1', 5084)
+
+
+def main():
+    reports = []
+    for i in range(NUM_REPORTS):
+        tags = [tag_report_data('{:024x}'.format(
+            (i * TAGS_PER_REPORT + j) % NUM_EPCS), antenna=1 + j % 4,
+            rssi=-40 - j % 30, timestamp=1500000000000000 + i)
+            for j in range(TAGS_PER_REPORT)]
+        reports.append(ro_access_report(tags))
+    reads = NUM_REPORTS * TAGS_PER_REPORT
+
+    start = time.time()
+    decoded = [LLRPMessage(msgbytes=r).msgdict['RO_ACCESS_REPORT']
+               ['TagReportData'] for r in reports]
+    decode_time = time.time() - start
+
+    agg = TagAggregator(max_records=NUM_EPCS)
+    start = time.time()
+    for tags in decoded:
+        agg.addReads(READER, tags)
+    agg.flush()
+    agg_time = time.time() - start
+
+    print('aggregate: {:,.0f} reads/s'.format(reads / agg_time))
+    print('decode + aggregate: {:,.0f} reads/s'.format(
+        reads / (decode_time + agg_time)))
+
+
+if __name__ == '__main__':
+    main()
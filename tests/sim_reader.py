@@ -0,0 +1,229 @@
+"""Simulated LLRP reader for tests.
+
+SimReaderFactory listens like a real reader (or connects to a listening
+client, for reader-initiated connections): it announces a successful
+connection with a READER_EVENT_NOTIFICATION, answers every request with a
+canned success response, and can push RO_ACCESS_REPORTs built with
+tag_report_data().
+
+FakeClient stands in for a connected LLRPClient in tuner tests that drive
+the tuner and a twisted.internet.task.Clock by hand.
+"""
+
+from __future__ import unicode_literals
+import os
+import struct
+from binascii import unhexlify
+from twisted.internet import reactor, defer
+from twisted.internet.protocol import Protocol, ClientFactory
+
+from sllurp.llrp import LLRPClient
+
+hdr_fmt = '!HII'
+hdr_len = struct.calcsize(hdr_fmt)
+
+CAPS_FILE = os.path.join(os.path.dirname(__file__), os.pardir, 'examples',
+                         'caps.dat')
+
+# request message type -> response message type
+RESPONSE_TYPES = {
+    1: 11,      # GET_READER_CAPABILITIES
+    2: 12,      # GET_READER_CONFIG
+    3: 13,      # SET_READER_CONFIG
+    14: 4,      # CLOSE_CONNECTION
+    20: 30,     # ADD_ROSPEC
+    21: 31,     # DELETE_ROSPEC
+    22: 32,     # START_ROSPEC
+    23: 33,     # STOP_ROSPEC
+    24: 34,     # ENABLE_ROSPEC
+    25: 35,     # DISABLE_ROSPEC
+    40: 50,     # ADD_ACCESSSPEC
+    41: 51,     # DELETE_ACCESSSPEC
+    42: 52,     # ENABLE_ACCESSSPEC
+    43: 53,     # DISABLE_ACCESSSPEC
+    1023: 1023,  # CUSTOM_MESSAGE
+}
+
+STATUS_SUCCESS = struct.pack('!HHHH', 287, 8, 0, 0)
+STATUS_FAILURE = struct.pack('!HHHH', 287, 8, 100, 0)   # M_ParameterError
+
+
+def wait(seconds=0.01):
+    """Return a Deferred that fires after `seconds` of real time."""
+    d = defer.Deferred()
+    reactor.callLater(seconds, d.callback, None)
+    return d
+
+
+def message(msgtype, body, msgid=0):
+    return struct.pack(hdr_fmt, (1 << 10) | msgtype, hdr_len + len(body),
+                       msgid) + body
+
+
+def reader_event(event, timestamp=0):
+    """Encode a READER_EVENT_NOTIFICATION with one encoded event."""
+    data = struct.pack('!HHQ', 128, 12, timestamp) + event
+    return message(63, struct.pack('!HH', 246, 4 + len(data)) + data)
+
+
+def reader_event_connected(timestamp=0):
+    return reader_event(struct.pack('!HHH', 256, 6, 0), timestamp)
+
+
+def reader_event_gpi(port, high, timestamp=0):
+    event = struct.pack('!HHHB', 248, 7, port, 0x80 if high else 0)
+    return reader_event(event, timestamp)
+
+
+def tag_report_data(epc, antenna=1, rssi=-60, seen_count=1, timestamp=None,
+                    channel=None, rospec_id=None):
+    """Encode one TagReportData parameter for a 96-bit EPC (hex string)."""
+    body = struct.pack('!B', 0x80 | 13) + unhexlify(epc)
+    if rospec_id is not None:
+        body += struct.pack('!BI', 0x80 | 9, rospec_id)
+    body += struct.pack('!BH', 0x80 | 1, antenna)
+    body += struct.pack('!Bb', 0x80 | 6, rssi)
+    if channel is not None:
+        body += struct.pack('!BH', 0x80 | 7, channel)
+    if timestamp is not None:
+        body += struct.pack('!BQ', 0x80 | 4, timestamp)
+    body += struct.pack('!BH', 0x80 | 8, seen_count)
+    return struct.pack('!HH', 240, 4 + len(body)) + body
+
+
+def ro_access_report(tags, msgid=0):
+    """Encode an RO_ACCESS_REPORT from encoded TagReportData parameters."""
+    return message(61, b''.join(tags), msgid)
+
+
+class SimReader(Protocol):
+    def connectionMade(self):
+        self.buf = b''
+        self.factory.readers.append(self)
+        if self.factory.announce:
+            self.transport.write(reader_event_connected())
+
+    def connectionLost(self, reason):
+        self.factory.readers.remove(self)
+
+    def dataReceived(self, data):
+        self.buf += data
+        while len(self.buf) >= hdr_len:
+            msgtype, length, msgid = struct.unpack(hdr_fmt,
+                                                   self.buf[:hdr_len])
+            if len(self.buf) < length:
+                break
+            msgtype &= 0x3ff
+            body = self.buf[hdr_len:length]
+            self.buf = self.buf[length:]
+            self.factory.received.append(msgtype)
+            self.factory.bodies[msgtype] = body
+            self.factory.trackROSpecs(msgtype, body)
+            self.respond(msgtype, msgid, body)
+
+    def respond(self, msgtype, msgid, body):
+        if msgtype == 1:
+            self.transport.write(self.factory.capabilities(msgid))
+        elif msgtype == 2:
+            ident = struct.pack('!HHBH', 218, 15, 0, 8) + self.factory.mac
+            self.transport.write(message(12, STATUS_SUCCESS + ident, msgid))
+        elif msgtype == 1023:
+            self.transport.write(message(
+                1023, struct.pack('!IB', 25882, 22) + STATUS_SUCCESS, msgid))
+        elif msgtype == 26:  # GET_ROSPECS
+            rospecs = b''.join(bytes(rospec) for _, rospec
+                               in sorted(self.factory.rospecs.items()))
+            self.transport.write(message(36, STATUS_SUCCESS + rospecs, msgid))
+        elif msgtype in (60, 64):  # GET_REPORT, ENABLE_EVENTS_AND_REPORTS
+            reports = self.factory.held_reports
+            self.factory.held_reports = []
+            self.transport.write(b''.join(reports))
+        elif msgtype in RESPONSE_TYPES:
+            status = STATUS_FAILURE if msgtype in self.factory.failing \
+                else STATUS_SUCCESS
+            self.transport.write(message(RESPONSE_TYPES[msgtype], status,
+                                         msgid))
+
+    def send(self, data):
+        self.transport.write(data)
+
+
+class SimReaderFactory(ClientFactory):
+    protocol = SimReader
+
+    def __init__(self, announce=True, mac=b'\x00\x16\x25\xff\xff\x10\xba\x47'):
+        self.announce = announce
+        self.mac = mac
+        self.readers = []
+        self.received = []
+        # message type -> body of the last such message received
+        self.bodies = {}
+        # message types to answer with an error status
+        self.failing = set()
+        # ROSpec ID -> encoded ROSpec, with its current state kept up to date
+        self.rospecs = {}
+        self.held_reports = []
+        with open(CAPS_FILE, 'rb') as caps:
+            self._caps = caps.read()
+
+    def trackROSpecs(self, msgtype, body):
+        if msgtype in self.failing:
+            return
+        if msgtype == 20:  # ADD_ROSPEC
+            rospecid, = struct.unpack('!I', body[4:8])
+            self.rospecs[rospecid] = bytearray(body)
+        elif msgtype in (24, 25):  # ENABLE_ROSPEC, DISABLE_ROSPEC
+            rospecid, = struct.unpack('!I', body)
+            for key, rospec in self.rospecs.items():
+                if rospecid in (0, key):
+                    rospec[9] = 2 if msgtype == 24 else 0  # Active, Disabled
+        elif msgtype == 21:  # DELETE_ROSPEC
+            rospecid, = struct.unpack('!I', body)
+            if rospecid == 0:
+                self.rospecs.clear()
+            self.rospecs.pop(rospecid, None)
+
+    def reboot(self):
+        """Forget the ROSpecs and held reports, as a power cycle would."""
+        self.rospecs.clear()
+        self.held_reports = []
+
+    def capabilities(self, msgid):
+        return self._caps[:6] + struct.pack('!I', msgid) + self._caps[10:]
+
+
+class FakeMessage(object):
+    def __init__(self, tags):
+        self.msgdict = {'RO_ACCESS_REPORT': {'TagReportData': tags}}
+
+
+class FakeClient(object):
+    """An inventorying LLRPClient that applies and records reconfigure()."""
+    state = LLRPClient.STATE_INVENTORYING
+    connected = True
+    peername = ('10.0.0.1', 5084)
+    peer_ip = '10.0.0.1'
+    reader_id = None
+
+    def __init__(self, **settings):
+        self.callbacks = []
+        self.reconfigured = []
+        for name, value in settings.items():
+            setattr(self, name, value)
+
+    def addMessageCallback(self, msg_type, cb):
+        self.callbacks.append(cb)
+
+    def removeMessageCallback(self, msg_type, cb):
+        if cb in self.callbacks:
+            self.callbacks.remove(cb)
+
+    def reconfigure(self, **settings):
+        self.reconfigured.append(settings)
+        for name, value in settings.items():
+            setattr(self, name, value)
+
+    def send_report(self, tags):
+        """Pass an RO_ACCESS_REPORT of `tags` to the message callbacks."""
+        for cb in self.callbacks:
+            cb(FakeMessage(tags))
@@ -0,0 +1,62 @@
+from __future__ import unicode_literals
+import unittest
+
+from sllurp.stream.aggregate import TagAggregator
+
+READER = ('10.0.0.1', 5084)
+
+
+def tag(epc, antenna=1, rssi=-60, count=1, first=None, last=None):
+    t = {'EPC-96': epc, 'AntennaID': (antenna,), 'PeakRSSI': (rssi,),
+         'TagSeenCount': (count,)}
+    if first is not None:
+        t['FirstSeenTimestampUTC'] = (first,)
+    if last is not None:
+        t['LastSeenTimestampUTC'] = (last,)
+    return t
+
+
+class TestTagAggregator(unittest.TestCase):
+    def setUp(self):
+        self.flushed = []
+        self.agg = TagAggregator(max_records=3, on_flush=self.flushed.append)
+
+    def test_aggregate(self):
+        self.agg.addReads(READER, [tag(b'aa', rssi=-70, first=1000000,
+                                       last=2000000),
+                                   tag(b'aa', rssi=-50, count=2,
+                                       last=3000000),
+                                   tag(b'aa', antenna=2)], now=10)
+        self.assertEqual(len(self.agg), 2)
+        rec = self.agg.get(b'aa', READER, 1)
+        self.assertEqual((rec.first_seen, rec.last_seen), (1, 3))
+        self.assertEqual((rec.count, rec.peak_rssi), (3, -50))
+        self.assertEqual(self.agg.get(b'aa', READER, 2).last_seen, 10)
+
+    def test_windows(self):
+        self.agg.addReads(READER, [tag(b'aa'), tag(b'bb'), tag(b'aa')])
+        summaries = self.agg.flush()
+        self.assertEqual(self.flushed, [summaries])
+        self.assertEqual([(s.epc, s.count, s.window_count)
+                          for s in summaries], [(b'aa', 2, 2), (b'bb', 1, 1)])
+
+        # only tags read since the last flush are summarized
+        self.agg.addReads(READER, [tag(b'bb')])
+        summaries = self.agg.flush()
+        self.assertEqual([(s.epc, s.count, s.window_count)
+                          for s in summaries], [(b'bb', 2, 1)])
+        self.assertEqual(self.agg.flush(), [])
+        self.assertEqual(len(self.flushed), 2)
+
+    def test_lru_eviction(self):
+        self.agg.addReads(READER, [tag(b'aa'), tag(b'bb'), tag(b'cc')])
+        self.agg.flush()
+        self.agg.addReads(READER, [tag(b'aa'), tag(b'dd')])
+        self.assertEqual(len(self.agg), 3)
+        self.assertEqual(self.agg.num_evicted, 1)
+        self.assertIsNone(self.agg.get(b'bb', READER, 1))
+
+        # evicted records with unsummarized reads are still summarized
+        self.agg.addReads(READER, [tag(b'ee'), tag(b'ff')])
+        epcs = sorted(s.epc for s in self.agg.flush())
+        self.assertEqual(epcs, [b'aa', b'dd', b'ee', b'ff'])
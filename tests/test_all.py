@@ -92,6 +92,65 @@ class TestROSpec(unittest.TestCase):
             [f['C1G2TagInventoryMask']['TagMask'] for f in filters],
             masks)
 
+    def test_tag_population(self):
+        rospec = sllurp.llrp.LLRPROSpec(None, 1, antennas=(1, 2),
+                                        tag_population={1: 32, 2: 4, 3: 8})
+        confs = rospec['ROSpec']['AISpec']['InventoryParameterSpec'][
+            'AntennaConfiguration']
+        self.assertEqual([conf['C1G2InventoryCommand'][
+            'C1G2SingulationControl']['TagPopulation'] for conf in confs],
+            [32, 4])
+        with self.assertRaises(sllurp.llrp.LLRPError):
+            sllurp.llrp.LLRPROSpec(None, 1, antennas=(1, 2),
+                                   tag_population={1: 32})
+
+    def test_antenna_dwell(self):
+        fx = FauxClient()
+        rospec = sllurp.llrp.LLRPROSpec(
+            {'ModeIdentifier': 1002, 'MaxTari': 7250}, 1, antennas=(1, 2),
+            antenna_dwell={1: 0.5, 2: {'n_tags': 10, 'timeout_ms': 200}})
+        aispecs = rospec['ROSpec']['AISpec']
+        self.assertEqual([a['AntennaIDs'] for a in aispecs], [[1], [2]])
+        self.assertEqual(aispecs[0]['AISpecStopTrigger'], {
+            'AISpecStopTriggerType': 'Duration',
+            'DurationTriggerValue': 500})
+        trigger = aispecs[1]['AISpecStopTrigger']['TagObservationTrigger']
+        self.assertEqual((trigger['NumberOfTags'], trigger['Timeout']),
+                         (10, 200))
+        self.assertEqual([
+            [conf['AntennaID'] for conf in
+             a['InventoryParameterSpec']['AntennaConfiguration']]
+            for a in aispecs], [[1], [2]])
+
+        encoded = sllurp.llrp_proto.encode('ROSpec')(rospec['ROSpec'])
+        first = sllurp.llrp_proto.encode('AISpec')(aispecs[0])
+        second = sllurp.llrp_proto.encode('AISpec')(aispecs[1])
+        self.assertIn(first + second, encoded)
+
+        with self.assertRaises(sllurp.llrp.LLRPError):
+            sllurp.llrp.LLRPROSpec(fx.reader_mode, 1, antennas=(1, 2),
+                                   antenna_dwell={1: 0.5})
+
+    def test_periodic(self):
+        rospec = sllurp.llrp.LLRPROSpec(
+            None, 1, duration_sec=2, start_trigger={'period': 60,
+                                                    'offset': 0.5})
+        boundary = rospec['ROSpec']['ROBoundarySpec']
+        self.assertEqual(boundary['ROSpecStartTrigger'], {
+            'ROSpecStartTriggerType': 'Periodic',
+            'PeriodicTriggerValue': {'Offset': 500, 'Period': 60000}})
+        self.assertEqual(boundary['ROSpecStopTrigger']['DurationTriggerValue'],
+                         2000)
+
+        encoded = sllurp.llrp_proto.encode('ROSpec')(rospec['ROSpec'])
+        self.assertIn(struct.pack('!HHB', 179, 17, 2) +
+                      struct.pack('!HHII', 180, 12, 500, 60000), encoded)
+
+        for duration in (None, 60):
+            with self.assertRaises(sllurp.llrp.LLRPError):
+                sllurp.llrp.LLRPROSpec(None, 1, duration_sec=duration,
+                                       start_trigger={'period': 60})
+
 
 class TestReaderEventNotification(unittest.TestCase):
     def test_decode(self):
@@ -203,6 +262,13 @@ class TestDecodeROAccessReport (unittest.TestCase):
         self._client.dataReceived(self._binr)
         self.assertEqual(self._tags_seen, 45)
 
+    def test_chunked(self):
+        """Messages split across reads are reassembled."""
+        self._client.state = sllurp.llrp.LLRPClient.STATE_INVENTORYING
+        for i in range(0, len(self._binr), 7):
+            self._client.dataReceived(self._binr[i:i + 7])
+        self.assertEqual(self._tags_seen, 45)
+
     def tearDown(self):
         pass
 
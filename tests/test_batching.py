@@ -0,0 +1,48 @@
+from __future__ import division, unicode_literals
+import unittest
+
+from twisted.internet import task
+
+from sllurp.tuning.batching import BatchingTuner
+from sim_reader import FakeClient, FakeMessage
+
+
+class TestBatchingTuner(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.clock.advance(1000)
+        self.proto = FakeClient(antennas=(1,), report_every_n_tags=1,
+                                report_timeout_ms=0)
+        self.tuner = BatchingTuner(self.proto, target_latency=0.5,
+                                   interval=5, min_interval=10,
+                                   clock=self.clock)
+
+    def run_reports(self, seconds, tags_per_second, n, delay=0.0):
+        """Reports of n tags, each arriving `delay` after it was filled."""
+        for _ in range(int(seconds * tags_per_second / n)):
+            self.clock.advance(n / tags_per_second)
+            read_at = self.clock.seconds() - n / tags_per_second - delay
+            tags = [{'EPC-96': b'aa', 'TagSeenCount': (1,),
+                     'LastSeenTimestampUTC': (int(read_at * 1e6),)}
+                    for _ in range(n)]
+            self.tuner.tag_cb(FakeMessage(tags))
+        self.tuner.tick()
+
+    def test_batch_for_target_latency(self):
+        self.run_reports(5, 200, 1)
+        self.assertEqual(self.proto.reconfigured, [
+            {'report_every_n_tags': 100, 'report_timeout_ms': 500}])
+
+        # close enough: left alone, and changes are rate-limited anyway
+        self.run_reports(5, 300, 100)
+        self.run_reports(5, 300, 100)
+        self.assertEqual(len(self.proto.reconfigured), 1)
+        self.assertAlmostEqual(self.tuner.history[0].before, 200)
+        self.assertAlmostEqual(self.tuner.history[0].after, 300)
+
+        # reports are late, so batch less than the rate alone suggests
+        self.run_reports(5, 4000, 100, delay=1.5)
+        latency = 100 / 4000 + 1.5
+        self.assertEqual(self.proto.reconfigured[-1],
+                         {'report_every_n_tags': int(2000 * 0.5 / latency),
+                          'report_timeout_ms': 500})
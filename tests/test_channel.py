@@ -0,0 +1,76 @@
+from __future__ import division, unicode_literals
+import unittest
+
+from twisted.internet import task
+
+from sllurp.tuning.channel import ChannelTuner, fixed_channels
+from sim_reader import FakeClient
+
+CAPABILITIES = {'RegulatoryCapabilities': {'UHFBandCapabilities': {
+    'FrequencyInformation': {
+        'Hopping': False,
+        'FixedFrequencyTable': {
+            'NumFrequencies': 4, 'Frequency1': 865700, 'Frequency2': 866300,
+            'Frequency3': 866900, 'Frequency4': 867500}}}}}
+
+
+class ChannelClient(FakeClient):
+    capabilities = CAPABILITIES
+
+    def __init__(self):
+        FakeClient.__init__(self, impinj_fixed_frequency_param={
+            'FixedFrequencyMode': 2, 'ChannelListIndex': [1]})
+
+    def report(self, seconds, rates):
+        """Read for a while, at `rates` reads/s on each channel."""
+        channels = self.impinj_fixed_frequency_param['ChannelListIndex']
+        tags = [{'EPC-96': b'aa', 'ChannelIndex': (ch,),
+                 'TagSeenCount': (int(rates[ch] * seconds / len(channels)),)}
+                for ch in channels]
+        self.send_report(tags)
+
+
+class TestChannelTuner(unittest.TestCase):
+    def test_fixed_channels(self):
+        self.assertEqual(fixed_channels(CAPABILITIES), [1, 2, 3, 4])
+        hopping = {'RegulatoryCapabilities': {'UHFBandCapabilities': {
+            'FrequencyInformation': {'Hopping': True, 'FrequencyHopTable0': {
+                'Frequency1': 902750}}}}}
+        self.assertEqual(fixed_channels(hopping), [])
+
+    def test_avoid_interference(self):
+        clock = task.Clock()
+        proto = ChannelClient()
+        tuner = ChannelTuner(proto, interval=10, min_interval=10,
+                             survey_interval=100, clock=clock)
+
+        def run(seconds, rates):
+            for _ in range(seconds // 10):
+                proto.report(10, rates)
+                clock.advance(10)
+                tuner.tick()
+
+        def channels():
+            return proto.impinj_fixed_frequency_param['ChannelListIndex']
+
+        # survey every channel first
+        jammed = {1: 100, 2: 100, 3: 10, 4: 80}
+        run(10, jammed)
+        self.assertEqual(channels(), [1, 2, 3, 4])
+        run(10, jammed)
+        self.assertEqual(tuner.yields, {1: 100, 2: 100, 3: 10, 4: 80})
+        self.assertEqual(channels(), [1, 2, 4])
+
+        # yields are kept up to date, but the choice stands until the survey
+        run(90, {1: 100, 2: 100, 3: 100, 4: 100})
+        self.assertEqual(channels(), [1, 2, 4])
+        run(10, {1: 100, 2: 100, 3: 100, 4: 100})
+        self.assertEqual(channels(), [1, 2, 3, 4])
+        run(10, {1: 100, 2: 100, 3: 100, 4: 100})
+        self.assertEqual(channels(), [1, 2, 3, 4])
+
+        # always keep min_channels
+        tuner.min_channels = 3
+        tuner.min_share = 0.9
+        run(100, {1: 10, 2: 100, 3: 20, 4: 30})
+        self.assertEqual(channels(), [2, 3, 4])
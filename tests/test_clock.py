@@ -0,0 +1,73 @@
+from __future__ import division, unicode_literals
+import random
+import unittest
+
+import pytest
+
+np = pytest.importorskip('numpy')
+from sllurp.stream.clock import ClockTracker, ReaderClock  # noqa: E402
+
+
+class FakeMessage(object):
+    def __init__(self, peername, msgdict):
+        self.peername = peername
+        self.msgdict = msgdict
+
+
+def reader_time(host, offset, skew, start=1000.0):
+    """The reader clock reading at a host time."""
+    return host - (offset + skew * (host - start))
+
+
+class TestReaderClock(unittest.TestCase):
+    def test_offset_and_skew(self):
+        rnd = random.Random(7)
+        rc = ReaderClock()
+        offset, skew = 3.2, 50e-6
+        host = 1000.0
+        while host < 1600:
+            sent = host
+            host += rnd.expovariate(1 / 0.02) + 0.001
+            rc.observe(reader_time(sent, offset, skew), host)
+            host += 0.2
+        self.assertAlmostEqual(rc.offset(host),
+                               offset + skew * (host - 1000), delta=0.005)
+        self.assertAlmostEqual(rc.skew, skew, delta=10e-6)
+        self.assertEqual(rc.num_steps, 0)
+
+    def test_step(self):
+        rc = ReaderClock(interval=1.0)
+        for i in range(20):
+            rc.observe(1000 + i - 2.0, 1000 + i + 0.01)
+        self.assertAlmostEqual(rc.offset(1020), 2.01)
+        # the reader's clock is set 5 seconds ahead
+        for i in range(20, 25):
+            rc.observe(1000 + i + 3.0, 1000 + i + 0.01)
+        self.assertEqual(rc.num_steps, 1)
+        self.assertAlmostEqual(rc.offset(1025), -2.99)
+
+
+class TestClockTracker(unittest.TestCase):
+    def test_normalize(self):
+        tracker = ClockTracker(clock=lambda: 2000.0)
+        r1 = ('10.0.0.1', 5084)
+        # reader 1 is 10 seconds behind; reports reach us after 5 ms
+        tags = [{'EPC-96': b'aa', 'LastSeenTimestampUTC': (1989990000,),
+                 'FirstSeenTimestampUTC': (1989000000,)},
+                {'EPC-96': b'bb', 'LastSeenTimestampUTC': (1989995000,)}]
+        tracker.tag_cb(FakeMessage(r1, {'RO_ACCESS_REPORT': {
+            'TagReportData': tags}}))
+        self.assertAlmostEqual(tracker.offset(r1), 10.005)
+        self.assertEqual(tags[0]['LastSeenTimestampUTC'], (1999995000,))
+        self.assertEqual(tags[0]['LastSeenTimestampReader'], (1989990000,))
+        self.assertEqual(tags[0]['FirstSeenTimestampUTC'], (1999005000,))
+        self.assertEqual(tags[1]['LastSeenTimestampUTC'], (2000000000,))
+
+        # reader events count too
+        r2 = ('10.0.0.2', 5084)
+        tracker.event_cb(FakeMessage(r2, {'READER_EVENT_NOTIFICATION': {
+            'ReaderEventNotificationData': {
+                'UTCTimestamp': {'Microseconds': 2001500000}}}}))
+        offsets = tracker.offsets()
+        self.assertEqual(sorted(offsets), [r1, r2])
+        self.assertAlmostEqual(offsets[r2], -1.5)
@@ -0,0 +1,54 @@
+from __future__ import division, unicode_literals
+import unittest
+
+from twisted.internet import task
+
+from sllurp.tuning.dwell import DwellScheduler
+from sim_reader import FakeClient
+
+
+class DwellClient(FakeClient):
+    def __init__(self):
+        FakeClient.__init__(self, antennas=(1, 2, 3), antenna_dwell=None)
+
+    def report(self, antenna, epcs):
+        tags = [{'EPC-96': '{:024x}'.format(i).encode('ascii'),
+                 'AntennaID': (antenna,)} for i in epcs]
+        self.send_report(tags)
+
+
+class TestDwellScheduler(unittest.TestCase):
+    def test_rebalance(self):
+        clock = task.Clock()
+        proto = DwellClient()
+        sched = DwellScheduler(proto, cycle=2.0, min_dwell=0.2, alpha=1.0,
+                               interval=10, min_interval=30, clock=clock)
+
+        # antenna 1 is a dock door with pallets going through; antenna 2
+        # reads the same shelf of tags over and over; antenna 3 sees nothing
+        shelf = range(10000, 10050)
+        for tick in range(3):
+            proto.report(1, range(tick * 30, tick * 30 + 30))
+            proto.report(1, range(tick * 30, tick * 30 + 30))
+            proto.report(2, shelf)
+            clock.advance(10)
+            sched.tick()
+
+        # the first tick counts the shelf too; the change is at once
+        self.assertEqual(proto.reconfigured[0]['antenna_dwell'],
+                         {1: 0.725, 2: 1.075, 3: 0.2})
+        self.assertEqual(sched.yields, {1: 3.0, 2: 0.0, 3: 0.0})
+        self.assertEqual(len(proto.reconfigured), 1)  # rate-limited
+
+        proto.report(1, range(90, 120))
+        clock.advance(10)
+        sched.tick()
+        self.assertEqual(proto.antenna_dwell, {1: 1.6, 2: 0.2, 3: 0.2})
+
+        # small changes are left alone
+        for tick in range(6):
+            proto.report(1, range(1000 + tick * 28, 1000 + tick * 28 + 28))
+            proto.report(3, [20000 + tick])
+            clock.advance(10)
+            sched.tick()
+        self.assertEqual(proto.antenna_dwell, {1: 1.6, 2: 0.2, 3: 0.2})
@@ -0,0 +1,96 @@
+from __future__ import unicode_literals
+from binascii import unhexlify
+import random
+import struct
+import unittest
+
+from sllurp.epc.filter import BloomFilter, BloomFrontedSet, EPCFilter, \
+    PrefixSet
+from sllurp.llrp import LLRPMessage
+from sim_reader import message, tag_report_data
+
+
+def epc_data_report(epc):
+    """TagReportData with a variable-length EPCData parameter."""
+    raw = unhexlify(epc)
+    epcdata = struct.pack('!HHH', 241, 6 + len(raw), len(raw) * 8) + raw
+    body = epcdata + struct.pack('!BH', 0x80 | 1, 2)
+    return struct.pack('!HH', 240, 4 + len(body)) + body
+
+
+class TestEPCFilter(unittest.TestCase):
+    def test_prefix_set(self):
+        rnd = random.Random(11)
+        prefixes = [bytes(bytearray(rnd.randrange(4)
+                                    for _ in range(rnd.randrange(1, 4))))
+                    for _ in range(30)]
+        ps = PrefixSet(prefixes)
+        self.assertLess(len(ps), len(set(prefixes)))
+        for _ in range(2000):
+            epc = bytes(bytearray(rnd.randrange(4) for _ in range(4)))
+            self.assertEqual(ps.match(epc),
+                             any(epc.startswith(p) for p in prefixes))
+
+    def test_allow_and_deny(self):
+        f = EPCFilter(allow=['00112233445566778899AABB'],
+                      allow_prefixes=['e28', '3034'],
+                      deny_prefixes=['e2801'])
+        self.assertTrue(f('00112233445566778899aabb'))
+        self.assertTrue(f(b'e28211223344556677889900'))
+        self.assertTrue(f('e28f11223344556677889900'))
+        self.assertTrue(f('303400000000000000000000'))
+        self.assertFalse(f('e28011223344556677889900'))
+        self.assertFalse(f('00112233445566778899aabc'))
+        self.assertEqual((f.num_accepted, f.num_rejected), (4, 2))
+
+        deny_only = EPCFilter(deny=['00112233445566778899aabb'])
+        self.assertFalse(deny_only('00112233445566778899aabb'))
+        self.assertTrue(deny_only('00112233445566778899aabc'))
+
+    def test_bloom(self):
+        rnd = random.Random(12)
+        members = set(bytes(bytearray(rnd.randrange(256) for _ in range(12)))
+                      for _ in range(5000))
+        bloom = BloomFilter(members, error_rate=0.01)
+        self.assertTrue(all(m in bloom for m in members))
+        others = [bytes(bytearray(rnd.randrange(256) for _ in range(12)))
+                  for _ in range(5000)]
+        false_positives = sum(o in bloom for o in others if o not in members)
+        self.assertLess(false_positives, 150)
+
+    def test_bloom_front(self):
+        listed = ['{:024x}'.format(i) for i in range(100)]
+        others = ['{:024x}'.format(i) for i in range(1000, 3000)]
+        allow = EPCFilter(allow=listed, bloom_error_rate=0.2)
+        deny = EPCFilter(deny=listed, bloom_error_rate=0.2)
+        self.assertIsInstance(allow.allow, BloomFrontedSet)
+
+        # Bloom filter hits that aren't listed don't count as listed
+        hits = [epc for epc in others if unhexlify(epc) in allow.allow.bloom]
+        self.assertTrue(hits)
+        self.assertFalse(any(allow(epc) for epc in hits))
+        hits = [epc for epc in others if unhexlify(epc) in deny.deny.bloom]
+        self.assertTrue(hits)
+        self.assertTrue(all(deny(epc) for epc in hits))
+
+        self.assertTrue(all(allow(epc) for epc in listed))
+        self.assertFalse(any(deny(epc) for epc in listed))
+
+    def test_filter_during_decode(self):
+        tags = [tag_report_data('{:024x}'.format(i)) for i in range(10)]
+        tags.append(epc_data_report('e2801160600002054cc2'))
+        msgbytes = message(61, b''.join(tags))
+        f = EPCFilter(allow=['{:024x}'.format(i) for i in (2, 3, 5)],
+                      allow_prefixes=['e28011'])
+        lmsg = LLRPMessage(msgbytes=msgbytes, epc_filter=f)
+        decoded = lmsg.msgdict['RO_ACCESS_REPORT']['TagReportData']
+        epcs = [t['EPCData']['EPC'] if 'EPCData' in t else t['EPC-96']
+                for t in decoded]
+        expected = ['{:024x}'.format(i).encode('ascii') for i in (2, 3, 5)]
+        self.assertEqual(epcs, expected + [b'e2801160600002054cc2'])
+        self.assertEqual(decoded[-1]['AntennaID'], (2,))
+        self.assertEqual(f.num_rejected, 7)
+
+        unfiltered = LLRPMessage(msgbytes=msgbytes)
+        self.assertEqual(
+            len(unfiltered.msgdict['RO_ACCESS_REPORT']['TagReportData']), 11)
@@ -0,0 +1,122 @@
+from __future__ import unicode_literals
+import logging
+
+from twisted.internet import reactor, defer
+from twisted.trial import unittest
+
+from sllurp.fleet import FleetManager
+from sllurp.llrp import LLRPClient
+from sllurp.llrp_errors import LLRPError
+from sim_reader import SimReaderFactory
+
+logging.getLogger('sllurp').setLevel(logging.WARNING)
+
+NUM_READERS = 500
+
+
+class TestFleetManager(unittest.TestCase):
+    timeout = 60
+
+    def setUp(self):
+        self.sim = SimReaderFactory()
+        self.ports = [reactor.listenTCP(0, self.sim, interface='127.0.0.1')
+                      for _ in range(NUM_READERS)]
+        self.hosts = ['127.0.0.1:{}'.format(p.getHost().port)
+                      for p in self.ports]
+        self.fleet = FleetManager(max_concurrent_connects=20,
+                                  connect_interval=0,
+                                  start_inventory=False)
+
+        # track how many connection attempts are in flight at once
+        self.in_flight = 0
+        self.max_in_flight = 0
+        connect = self.fleet._connect
+
+        def counting_connect(*args):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            d = connect(*args)
+
+            def done(result):
+                self.in_flight -= 1
+                return result
+            return d.addBoth(done)
+        self.fleet._connect = counting_connect
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        self.fleet.stopTrying()
+        for proto in list(self.fleet.protocols):
+            proto.transport.loseConnection()
+        for reader in list(self.sim.readers):
+            reader.transport.loseConnection()
+        yield defer.gatherResults([p.stopListening() for p in self.ports])
+        while self.fleet.protocols or self.sim.readers:
+            d = defer.Deferred()
+            reactor.callLater(0.01, d.callback, None)
+            yield d
+
+    @defer.inlineCallbacks
+    def test_connect_all(self):
+        results = yield self.fleet.connectAll(self.hosts)
+        self.assertEqual(len(results), NUM_READERS)
+        self.assertTrue(all(ok for ok, _ in results.values()))
+        self.assertEqual(len(self.fleet.readers), NUM_READERS)
+        self.assertLessEqual(self.max_in_flight, 20)
+
+        port = self.ports[123].getHost().port
+        proto = self.fleet.getReader('127.0.0.1', port)
+        self.assertIsInstance(proto, LLRPClient)
+        self.assertEqual(proto.peername, ('127.0.0.1', port))
+        self.assertEqual(len(self.fleet.getProtocols('127.0.0.1')),
+                         NUM_READERS)
+
+        states = self.fleet.getProtocolStates()
+        self.assertEqual(set(states), set(self.fleet.readers))
+        dead = ('127.0.0.1', 1)
+        self.assertEqual(
+            self.fleet.getProtocolStates([('127.0.0.1', port), dead]),
+            {('127.0.0.1', port): LLRPClient.getStateName(proto.state)})
+
+    @defer.inlineCallbacks
+    def test_duplicate_and_failed_connects(self):
+        host, port = '127.0.0.1', self.ports[0].getHost().port
+        yield self.fleet.addReader(host, port)
+        yield self.assertFailure(self.fleet.addReader(host, port), LLRPError)
+
+        # nothing listens here any more
+        dead = self.ports.pop()
+        dead_port = dead.getHost().port
+        yield dead.stopListening()
+        results = yield self.fleet.connectAll(
+            ['127.0.0.1:{}'.format(dead_port)])
+        ok, _ = results[('127.0.0.1', dead_port)]
+        self.assertFalse(ok)
+        self.assertIsNone(self.fleet.getReader('127.0.0.1', dead_port))
+
+    @defer.inlineCallbacks
+    def test_fleet_command_outcomes(self):
+        yield self.fleet.connectAll(self.hosts)
+
+        # wait until every reader has finished its connection handshake
+        while any(p.state != LLRPClient.STATE_CONNECTED
+                  for p in self.fleet.protocols):
+            d = defer.Deferred()
+            reactor.callLater(0.01, d.callback, None)
+            yield d
+
+        results = yield self.fleet.callReaders('pause',
+                                               kwargs={'force': True})
+        self.assertEqual(len(results), NUM_READERS)
+        self.assertTrue(all(ok for ok, _ in results.values()))
+        self.assertTrue(all(p.state == LLRPClient.STATE_PAUSED
+                            for p in self.fleet.protocols))
+
+        # invalid power index fails per reader, not for the whole fleet
+        bad = list(self.fleet.readers)[:3]
+        results = yield self.fleet.callReaders('setTxPower', ({1: 1000},),
+                                               readers=bad)
+        self.assertEqual(set(results), set(bad))
+        for ok, failure in results.values():
+            self.assertFalse(ok)
+            self.assertTrue(failure.check(LLRPError))
@@ -0,0 +1,124 @@
+from __future__ import unicode_literals
+import logging
+import struct
+
+from twisted.internet import reactor, defer
+from twisted.trial import unittest
+
+from sllurp.llrp import LLRPClient, LLRPClientFactory
+from sllurp.llrp_errors import LLRPError, ReaderConfigurationError
+from sllurp.llrp_proto import LLRPROSpec
+from sim_reader import SimReaderFactory, reader_event_gpi, wait
+
+logging.getLogger('sllurp').setLevel(logging.WARNING)
+
+SET_READER_CONFIG, ADD_ROSPEC = 3, 20
+
+
+def gpi_trigger_value(port, event, timeout_ms=0):
+    return struct.pack('!HHHBI', 181, 11, port, 0x80 if event else 0,
+                       timeout_ms)
+
+
+class TestGPITriggers(unittest.TestCase):
+    timeout = 30
+
+    def setUp(self):
+        self.sim = SimReaderFactory()
+        self.port = reactor.listenTCP(0, self.sim, interface='127.0.0.1')
+        # a photo-eye on GPI 2 starts inventory; it stops when the beam is
+        # clear again, or after 30 seconds
+        self.factory = LLRPClientFactory(
+            start_trigger={'gpi': 2},
+            stop_trigger={'gpi': 2, 'timeout': 30})
+        self.events = []
+        self.factory.addStateCallback(LLRPClient.STATE_CONNECTED,
+                                      self.watchEvents)
+
+    def watchEvents(self, proto):
+        proto.addMessageCallback('READER_EVENT_NOTIFICATION',
+                                 self.events.append)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        for reader in list(self.sim.readers):
+            reader.transport.loseConnection()
+        yield self.port.stopListening()
+        while self.factory.protocols or self.sim.readers:
+            yield wait()
+
+    def test_triggers(self):
+        rospec = LLRPROSpec(None, 1, start_trigger={'gpi': 1, 'event': False})
+        trigger = rospec['ROSpec']['ROBoundarySpec']['ROSpecStartTrigger']
+        self.assertEqual(trigger['ROSpecStartTriggerType'], 'GPI')
+        self.assertEqual(trigger['GPITriggerValue']['GPIEvent'], False)
+        self.assertRaises(LLRPError, LLRPROSpec, None, 1, duration_sec=1,
+                          stop_trigger={'gpi': 1})
+        self.assertRaises(LLRPError, LLRPROSpec, None, 1,
+                          start_trigger={'port': 1})
+
+    @defer.inlineCallbacks
+    def test_gpi_inventory(self):
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port,
+                           self.factory)
+        while not self.factory.protocols or self.factory.protocols[0].state \
+                != LLRPClient.STATE_INVENTORYING:
+            yield wait()
+
+        # GPI events are reported and GPI 2 is enabled
+        config = self.sim.bodies[SET_READER_CONFIG]
+        self.assertIn(struct.pack('!HHHB', 245, 7, 1, 0x80), config)
+        self.assertIn(struct.pack('!HHHBB', 225, 8, 2, 0x80, 0), config)
+
+        rospec = self.sim.bodies[ADD_ROSPEC]
+        self.assertIn(struct.pack('!HHB', 179, 16, 3) +
+                      gpi_trigger_value(2, True), rospec)
+        self.assertIn(struct.pack('!HHBI', 182, 20, 2, 0) +
+                      gpi_trigger_value(2, False, 30000), rospec)
+
+        self.sim.readers[0].send(reader_event_gpi(2, True))
+        while not self.events:
+            yield wait()
+        event = self.events[0].msgdict['READER_EVENT_NOTIFICATION'][
+            'ReaderEventNotificationData']
+        self.assertEqual(event['GPIEvent'],
+                         {'GPIPortNumber': 2, 'GPIEvent': True})
+
+    @defer.inlineCallbacks
+    def test_gpi_ports_change(self):
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port,
+                           self.factory)
+        while not self.factory.protocols or self.factory.protocols[0].state \
+                != LLRPClient.STATE_INVENTORYING:
+            yield wait()
+        proto = self.factory.protocols[0]
+        proto.capabilities['GeneralDeviceCapabilities'][
+            'GPIOCapabilities'] = {'NumGPIs': 4, 'NumGPOs': 4}
+        self.assertRaises(ReaderConfigurationError, proto.addROSpec, 2,
+                          start_trigger={'gpi': 5})
+        self.assertEqual(proto.extra_rospecs, {})
+
+        # a ROSpec triggered by another GPI enables that GPI first
+        del self.sim.received[:]
+        yield proto.addROSpec(2, start_trigger={'gpi': 3})
+        self.assertEqual(self.sim.received[:2], [SET_READER_CONFIG,
+                                                 ADD_ROSPEC])
+        self.assertEqual(proto.state, LLRPClient.STATE_INVENTORYING)
+        config = self.sim.bodies[SET_READER_CONFIG]
+        self.assertIn(struct.pack('!HHHBB', 225, 8, 2, 0x80, 0), config)
+        self.assertIn(struct.pack('!HHHBB', 225, 8, 3, 0x80, 0), config)
+
+        # GPI 2 is disabled once nothing uses it
+        del self.sim.received[:]
+        yield proto.reconfigure(start_trigger=None, stop_trigger=None)
+        while proto.state != LLRPClient.STATE_INVENTORYING:
+            yield wait()
+        self.assertEqual(self.sim.received.count(SET_READER_CONFIG), 1)
+        config = self.sim.bodies[SET_READER_CONFIG]
+        self.assertIn(struct.pack('!HHHBB', 225, 8, 2, 0, 0), config)
+        self.assertIn(struct.pack('!HHHBB', 225, 8, 3, 0x80, 0), config)
+
+        # nothing to resend if the GPIs stay the same
+        del self.sim.received[:]
+        yield proto.addROSpec(3, start_trigger={'gpi': 3})
+        self.assertNotIn(SET_READER_CONFIG, self.sim.received)
@@ -0,0 +1,150 @@
+from __future__ import unicode_literals
+import logging
+import os
+import sys
+import tempfile
+
+from twisted.internet import reactor, defer
+from twisted.trial import unittest
+
+from sllurp.llrp import LLRPClient, LLRPClientFactory
+from sllurp.handoff import is_writing, offerHandoff, takeOver
+from sim_reader import SimReaderFactory, ro_access_report, tag_report_data, \
+    wait
+
+logging.getLogger('sllurp').setLevel(logging.WARNING)
+
+NUM_READERS = 20
+
+DELETE_ROSPEC = 21
+
+
+class TestHandoff(unittest.TestCase):
+    timeout = 30
+
+    if not sys.platform.startswith('linux') or sys.version_info[0] < 3:
+        skip = 'socket handoff needs SCM_RIGHTS (Linux, Python 3)'
+
+    def setUp(self):
+        self.sim = SimReaderFactory()
+        self.ports = [reactor.listenTCP(0, self.sim, interface='127.0.0.1')
+                      for _ in range(NUM_READERS)]
+        self.old = LLRPClientFactory(reconnect=True)
+        self.new = LLRPClientFactory()
+        self.reports = []
+        self.new.addTagReportCallback(self.reports.append)
+        self.path = os.path.join(tempfile.mkdtemp(), 'handoff.sock')
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        for reader in list(self.sim.readers):
+            reader.transport.loseConnection()
+        yield defer.gatherResults([p.stopListening() for p in self.ports])
+        while self.old.protocols or self.new.protocols or self.sim.readers:
+            yield wait()
+
+    @defer.inlineCallbacks
+    def test_handoff(self):
+        for p in self.ports:
+            reactor.connectTCP('127.0.0.1', p.getHost().port, self.old)
+        while (len(self.old.protocols) < NUM_READERS or
+               any(p.state != LLRPClient.STATE_INVENTORYING
+                   for p in self.old.protocols)):
+            yield wait()
+        peernames = sorted(p.peername for p in self.old.protocols)
+        rospecs = {p.peername: p.rospec for p in self.old.protocols}
+
+        offered = offerHandoff(self.old, self.path)
+        adopted = yield takeOver(self.new, self.path)
+        handed = yield offered
+        self.assertEqual(sorted(handed), peernames)
+        self.assertEqual(sorted(p.peername for p in adopted), peernames)
+        while self.old.protocols:
+            yield wait()
+
+        # readers stayed connected and were not reset
+        self.assertEqual(len(self.sim.readers), NUM_READERS)
+        del self.sim.received[:]
+        for proto in self.new.protocols:
+            self.assertEqual(proto.state, LLRPClient.STATE_INVENTORYING)
+            self.assertEqual(proto.rospec, rospecs[proto.peername])
+
+        # the new process gets reports and can talk to the readers
+        for reader in self.sim.readers:
+            reader.send(ro_access_report(
+                [tag_report_data('00112233445566778899aabb')]))
+        yield self.new.pauseInventory()
+        while len(self.reports) < NUM_READERS or any(
+                p.state != LLRPClient.STATE_PAUSED
+                for p in self.new.protocols):
+            yield wait()
+        self.assertEqual(set(self.sim.received), {25})  # DISABLE_ROSPEC
+
+    @defer.inlineCallbacks
+    def test_handoff_extra_rospec(self):
+        self.old = LLRPClientFactory(
+            reconnect=True, extra_rospecs={2: {'priority': 0, 'antennas': (2,),
+                                               'duration': 0.5,
+                                               'start_trigger': {'gpi': 1}}})
+        reactor.connectTCP('127.0.0.1', self.ports[0].getHost().port,
+                           self.old)
+        while not self.old.protocols or \
+                self.old.protocols[0].state != LLRPClient.STATE_INVENTORYING:
+            yield wait()
+        rospecs = self.old.protocols[0].rospecs
+        self.assertEqual(self.old.protocols[0]._gpi_ports, [1])
+
+        offered = offerHandoff(self.old, self.path)
+        proto, = yield takeOver(self.new, self.path)
+        yield offered
+        self.assertEqual(proto.rospecs, rospecs)
+        self.assertEqual(proto._gpi_ports, [1])
+
+        # the new process can still remove the ROSpec the old one added
+        del self.sim.received[:]
+        yield proto.removeROSpec(2)
+        self.assertEqual(self.sim.received, [DELETE_ROSPEC])
+        self.assertEqual(sorted(proto.rospecs), [1])
+
+    @defer.inlineCallbacks
+    def test_old_process_closes_its_sockets(self):
+        reactor.connectTCP('127.0.0.1', self.ports[0].getHost().port,
+                           self.old)
+        while not self.old.protocols or \
+                self.old.protocols[0].state != LLRPClient.STATE_INVENTORYING:
+            yield wait()
+        old = self.old.protocols[0]
+        reader = self.sim.readers[0]
+        lost = []
+        reader.connectionLost = lost.append
+
+        offered = offerHandoff(self.old, self.path)
+        new, = yield takeOver(self.new, self.path)
+        yield offered
+        while self.old.protocols:
+            yield wait()
+
+        # the old process's loseConnection() closed only its own descriptor
+        self.assertFalse(old.transport.connected)
+        self.assertEqual(old.transport.fileno(), -1)
+        yield wait(0.1)
+        self.assertEqual(lost, [])
+        self.assertEqual(self.sim.readers, [reader])
+
+        # and the connection still works both ways
+        reader.send(ro_access_report(
+            [tag_report_data('00112233445566778899aabb')]))
+        del self.sim.received[:]
+        yield new.pause()
+        self.assertEqual(self.sim.received, [25])  # DISABLE_ROSPEC
+        self.assertEqual(len(self.reports), 1)
+        del reader.connectionLost
+
+    def test_is_writing(self):
+        # a transport whose buffers can't be found might still be writing
+        self.assertTrue(is_writing(object()))
+
+    @defer.inlineCallbacks
+    def test_no_process_to_take_over(self):
+        adopted = yield takeOver(self.new, self.path)
+        self.assertEqual(adopted, [])
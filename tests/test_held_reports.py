@@ -0,0 +1,143 @@
+from __future__ import unicode_literals
+import logging
+
+from twisted.internet import reactor, defer
+from twisted.trial import unittest
+
+from sllurp.llrp import LLRPClient, LLRPClientFactory
+from sllurp.llrp_proto import encode
+from sim_reader import SimReaderFactory, ro_access_report, tag_report_data, \
+    wait
+
+logging.getLogger('sllurp').setLevel(logging.WARNING)
+
+BACKLOG = 1000
+BATCH = 10
+
+
+def report(i):
+    return ro_access_report([tag_report_data('{:024x}'.format(i))])
+
+
+class TestHeldReports(unittest.TestCase):
+    timeout = 30
+
+    def setUp(self):
+        self.sim = SimReaderFactory()
+        self.port = reactor.listenTCP(0, self.sim, interface='127.0.0.1')
+        self.factory = LLRPClientFactory(reconnect=True,
+                                         hold_events_and_reports=True,
+                                         held_report_batch_size=BATCH)
+        self.factory.initialDelay = 0.01
+        self.epcs = []
+        self.factory.addTagReportCallback(self.gotReport)
+
+        # count reactor iterations to see how many reports each one delivers
+        self.tick = 0
+        self.ticks = []
+        self.ticker = reactor.callLater(0, self.advance)
+
+    def advance(self):
+        self.tick += 1
+        self.ticker = reactor.callLater(0, self.advance)
+
+    def gotReport(self, lmsg):
+        for tag in lmsg.msgdict['RO_ACCESS_REPORT']['TagReportData']:
+            self.epcs.append(int(tag['EPC-96'], 16))
+            self.ticks.append(self.tick)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        self.ticker.cancel()
+        self.factory.stopTrying()
+        for reader in list(self.sim.readers):
+            reader.transport.loseConnection()
+        yield self.port.stopListening()
+        while self.factory.protocols or self.sim.readers:
+            yield wait()
+
+    def test_encode_events_and_reports(self):
+        self.assertEqual(
+            encode('EventsAndReports')(
+                {'HoldEventsAndReportsUponReconnect': True}),
+            b'\x00\xe2\x00\x05\x80')
+
+    @defer.inlineCallbacks
+    def test_resume_and_drain(self):
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port,
+                           self.factory)
+        while not self.factory.protocols or \
+                self.factory.protocols[0].state != \
+                LLRPClient.STATE_INVENTORYING:
+            yield wait()
+        rospec = self.factory.protocols[0].rospec
+
+        # connection drops; the reader keeps inventorying and holds reports
+        self.sim.held_reports = [report(i) for i in range(BACKLOG)]
+        del self.sim.received[:]
+        self.sim.readers[0].transport.loseConnection()
+        while 64 not in self.sim.received:  # ENABLE_EVENTS_AND_REPORTS
+            yield wait(0.001)
+        proto = self.factory.protocols[0]
+        self.assertEqual(proto.state, LLRPClient.STATE_INVENTORYING)
+        self.assertEqual(proto.rospec, rospec)
+
+        # live report right behind the backlog
+        self.sim.readers[0].send(report(BACKLOG))
+        while len(self.epcs) < BACKLOG + 1:
+            yield wait()
+
+        self.assertEqual(self.epcs, list(range(BACKLOG + 1)))
+        per_tick = max(self.ticks.count(t) for t in set(self.ticks))
+        self.assertLessEqual(per_tick, 2 * BATCH)
+
+        # resumed without resetting the reader or re-adding the ROSpec, once
+        # the reader confirmed it still has it
+        self.assertIn(26, self.sim.received)  # GET_ROSPECS
+        for msgtype in (20, 21, 41):  # ADD/DELETE_ROSPEC, DELETE_ACCESSSPEC
+            self.assertNotIn(msgtype, self.sim.received)
+
+    @defer.inlineCallbacks
+    def test_reader_rebooted(self):
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port,
+                           self.factory)
+        while not self.factory.protocols or \
+                self.factory.protocols[0].state != \
+                LLRPClient.STATE_INVENTORYING:
+            yield wait()
+
+        # the reader reboots, losing its ROSpec, while we're away
+        del self.sim.received[:]
+        self.sim.reboot()
+        self.sim.readers[0].transport.loseConnection()
+        while 20 not in self.sim.received:  # ADD_ROSPEC
+            yield wait()
+        while self.factory.protocols[0].state != \
+                LLRPClient.STATE_INVENTORYING:
+            yield wait()
+        self.assertLess(self.sim.received.index(26),  # GET_ROSPECS
+                        self.sim.received.index(20))
+        self.assertEqual(list(self.sim.rospecs), [1])
+
+        self.sim.readers[0].send(report(1))
+        while not self.epcs:
+            yield wait()
+        self.assertEqual(self.epcs, [1])
+
+    @defer.inlineCallbacks
+    def test_settings_changed(self):
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port,
+                           self.factory)
+        while not self.factory.protocols or \
+                self.factory.protocols[0].state != \
+                LLRPClient.STATE_INVENTORYING:
+            yield wait()
+
+        # the reader still runs the old ROSpec, but we want another one
+        del self.sim.received[:]
+        self.factory.client_args['session'] = 1
+        self.sim.readers[0].transport.loseConnection()
+        while 20 not in self.sim.received:  # ADD_ROSPEC
+            yield wait()
+        self.assertNotIn(26, self.sim.received)  # GET_ROSPECS
+        self.assertIn(21, self.sim.received)  # DELETE_ROSPEC
@@ -0,0 +1,73 @@
+from __future__ import unicode_literals
+import logging
+
+from twisted.internet import reactor, defer
+from twisted.trial import unittest
+
+from sllurp.llrp import LLRPClient, LLRPServerFactory
+from sim_reader import SimReaderFactory, wait
+
+logging.getLogger('sllurp').setLevel(logging.WARNING)
+
+NUM_READERS = 50
+
+
+class TestReaderInitiatedConnections(unittest.TestCase):
+    timeout = 30
+
+    def setUp(self):
+        self.macs = ['00162500{:08x}'.format(i) for i in range(NUM_READERS)]
+        config = {mac: {'tag_population': 100 + i}
+                  for i, mac in enumerate(self.macs)}
+        config['127.0.0.1'] = {'session': 1}
+        self.server = LLRPServerFactory(reader_config=config,
+                                        start_inventory=False)
+        self.port = self.server.listen(0, interface='127.0.0.1')
+        self.sims = []
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        for sim in self.sims:
+            for reader in list(sim.readers):
+                reader.transport.loseConnection()
+        yield self.port.stopListening()
+        while self.server.protocols:
+            yield wait()
+
+    @defer.inlineCallbacks
+    def test_many_readers(self):
+        port = self.port.getHost().port
+        for mac in self.macs:
+            sim = SimReaderFactory(mac=bytes(bytearray.fromhex(mac)))
+            self.sims.append(sim)
+            reactor.connectTCP('127.0.0.1', port, sim)
+
+        while (len(self.server.protocols) < NUM_READERS or
+               any(p.state != LLRPClient.STATE_CONNECTED
+                   for p in self.server.protocols)):
+            yield wait()
+
+        self.assertEqual(sorted(self.server.readers_by_id), self.macs)
+        for i, mac in enumerate(self.macs):
+            proto = self.server.readers_by_id[mac]
+            self.assertEqual(proto.reader_id, mac)
+            self.assertEqual(proto.peername[0], '127.0.0.1')
+            # settings by IP address and by reader ID both apply
+            self.assertEqual(proto.session, 1)
+            self.assertEqual(proto.tag_population, 100 + i)
+            singulation = proto.getROSpec()['ROSpec']['AISpec'][
+                'InventoryParameterSpec']['AntennaConfiguration'][0][
+                'C1G2InventoryCommand']['C1G2SingulationControl']
+            self.assertEqual(singulation['TagPopulation'], 100 + i)
+
+    @defer.inlineCallbacks
+    def test_bad_reader_config(self):
+        self.server.reader_config = lambda reader_id, host: (
+            {'antennas': [99]} if reader_id else None)
+        sim = SimReaderFactory()
+        self.sims.append(sim)
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port, sim)
+        yield wait(0.2)
+        # the reader only has 4 antennas, so it's dropped
+        self.assertFalse(sim.readers)
+        self.assertFalse(self.server.readers_by_id)
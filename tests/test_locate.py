@@ -0,0 +1,66 @@
+from __future__ import division, unicode_literals
+import math
+import random
+import unittest
+
+import pytest
+
+np = pytest.importorskip('numpy')
+from sllurp.stream.locate import Locator  # noqa: E402
+
+
+def tag(epc, antenna, rssi, count=1):
+    return {'EPC-96': epc, 'AntennaID': (antenna,), 'PeakRSSI': (rssi,),
+            'TagSeenCount': (count,)}
+
+
+class TestLocator(unittest.TestCase):
+    def test_zones(self):
+        located = []
+        loc = Locator(zones={'dock': [1, 2], 'door': [('r2', 1)]},
+                      on_locate=located.extend)
+        loc.addReads('r1', [tag(b'aa', 1, -50), tag(b'aa', 2, -55),
+                            tag(b'bb', 2, -70), tag(b'cc', 3, -40)])
+        loc.addReads('r2', [tag(b'aa', 1, -60, count=3),
+                            tag(b'bb', 1, -45)])
+        locations = {found.epc: found for found in loc.locate()}
+        self.assertEqual(located, list(locations.values()))
+
+        self.assertEqual(locations[b'aa'].zone, 'dock')
+        self.assertEqual(locations[b'aa'].reads, 5)
+        power = [10 ** -5, 10 ** -5.5, 3 * 10 ** -6]
+        self.assertAlmostEqual(locations[b'aa'].confidence,
+                               sum(power[:2]) / sum(power))
+        self.assertEqual(locations[b'bb'].zone, 'door')
+        self.assertIsNone(locations[b'aa'].position)
+        # antenna 3 of r1 is neither placed nor zoned
+        self.assertNotIn(b'cc', locations)
+
+        # each window starts afresh
+        self.assertEqual(loc.locate(), [])
+
+    def test_weighted_centroid(self):
+        rnd = random.Random(2)
+        grid = {(h, a): (x, y) for h, x in (('r1', 0.0), ('r2', 4.0))
+                for a, y in ((1, 0.0), (2, 4.0))}
+        loc = Locator(antennas=grid)
+        truth = {}
+        for i in range(200):
+            epc = b'%04x' % i
+            x, y = rnd.uniform(0, 4), rnd.uniform(0, 4)
+            truth[epc] = (x, y)
+            for (host, ant), (ax, ay) in grid.items():
+                d = math.hypot(x - ax, y - ay) + 0.5
+                loc.addReads(host, [tag(epc, ant, -40 - 20 * math.log10(d))])
+        for found in loc.locate():
+            # expected: the centroid with weights 1 / d^2
+            x, y = truth[found.epc]
+            weights = {k: 1 / (math.hypot(x - p[0], y - p[1]) + 0.5) ** 2
+                       for k, p in grid.items()}
+            total = sum(weights.values())
+            for axis in range(2):
+                expected = sum(w * grid[k][axis]
+                               for k, w in weights.items()) / total
+                self.assertAlmostEqual(found.position[axis], expected,
+                                       delta=0.02)
+            self.assertIsNone(found.zone)
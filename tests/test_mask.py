@@ -0,0 +1,109 @@
+from __future__ import unicode_literals
+import itertools
+import logging
+import random
+import struct
+
+from twisted.internet import reactor, defer
+from twisted.trial import unittest
+
+from sllurp.epc.mask import compile_masks, format_mask, parse_mask, \
+    range_masks
+from sllurp.epc.sgtin_96 import parse_sgtin_96, sgtin_96_masks
+from sllurp.llrp import LLRPClient, LLRPClientFactory
+from sim_reader import SimReaderFactory, wait
+
+logging.getLogger('sllurp').setLevel(logging.WARNING)
+
+ADD_ROSPEC = 20
+
+
+def matches(masks, bits):
+    return any(bits.startswith(parse_mask(mask)) for mask in masks)
+
+
+class TestCompileMasks(unittest.TestCase):
+    def test_masks(self):
+        self.assertEqual(parse_mask(format_mask('10110')), '10110')
+        self.assertEqual(format_mask('10110000'), 'b0')
+        self.assertEqual(range_masks(0, 15, 4), [''])
+        self.assertEqual(range_masks(3, 3, 4, '1'), ['10011'])
+        self.assertRaises(ValueError, range_masks, 3, 16, 4)
+
+    def test_optimal(self):
+        # against every choice of up to max_masks prefixes of 6-bit values
+        rnd = random.Random(5)
+        values = ['{:06b}'.format(v) for v in range(64)]
+        prefixes = [''.join(bits) for n in range(7)
+                    for bits in itertools.product('01', repeat=n)]
+        for _ in range(20):
+            targets = rnd.sample(values, rnd.randrange(1, 6))
+            candidates = [p for p in prefixes
+                          if any(t.startswith(p) for t in targets)]
+            for max_masks in (1, 2, 3):
+                masks = compile_masks([format_mask(t) for t in targets],
+                                      max_masks=max_masks, width=6)
+                self.assertLessEqual(len(masks), max_masks)
+                self.assertTrue(all(matches(masks, t) for t in targets))
+                best = min(
+                    sum(any(v.startswith(p) for p in combo) for v in values)
+                    for n in range(1, max_masks + 1)
+                    for combo in itertools.combinations(candidates, n)
+                    if all(any(t.startswith(p) for p in combo)
+                           for t in targets))
+                self.assertEqual(sum(matches(masks, v) for v in values), best)
+
+    def test_sgtin_range(self):
+        masks = sgtin_96_masks('0614141', 812345, 812350, filter_value=3)
+        compiled = compile_masks(masks, max_masks=2)
+        for item in range(812340, 812356):
+            epc = '{:096b}'.format(
+                (0x30 << 88) | (3 << 85) | (5 << 82) | (614141 << 58) |
+                (item << 38) | 6789)
+            self.assertEqual(matches(masks, epc), 812345 <= item <= 812350)
+            if 812345 <= item <= 812350:
+                self.assertTrue(matches(compiled, epc))
+                self.assertEqual(parse_sgtin_96(
+                    '{:024x}'.format(int(epc, 2)))['item_reference'],
+                    str(item).zfill(6))
+
+
+class TestTagFilterTargets(unittest.TestCase):
+    timeout = 30
+
+    def setUp(self):
+        self.sim = SimReaderFactory()
+        self.port = reactor.listenTCP(0, self.sim, interface='127.0.0.1')
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        for reader in list(self.sim.readers):
+            reader.transport.loseConnection()
+        yield self.port.stopListening()
+        while self.factory.protocols or self.sim.readers:
+            yield wait()
+
+    @defer.inlineCallbacks
+    def test_pushed_to_reader(self):
+        targets = ['3074257bf7194e4000001a85', '3074257bf7194e4000001a86',
+                   '3074257bf7194e4000001a87', 'e2801160600002']
+        self.factory = LLRPClientFactory(tag_filter_targets=targets)
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port,
+                           self.factory)
+        while not self.factory.protocols or self.factory.protocols[0].state \
+                != LLRPClient.STATE_INVENTORYING:
+            yield wait()
+
+        # the simulated reader takes two filters
+        proto = self.factory.protocols[0]
+        self.assertEqual(proto.tag_filter_mask,
+                         ['3074257bf7194e4000001a84/94', 'e2801160600002'])
+        rospec = self.sim.bodies[ADD_ROSPEC]
+        # MB 1, pointer 0x20, 94 bits; then Select_Unselect
+        self.assertIn(struct.pack('!HHBHH', 332, 21, 0x40, 0x20, 94) +
+                      bytes(bytearray.fromhex('3074257bf7194e4000001a84')) +
+                      struct.pack('!HHB', 334, 5, 0), rospec)
+        # then Select_DoNothing, so that either mask selects a tag
+        self.assertIn(struct.pack('!HHBHH', 332, 16, 0x40, 0x20, 56) +
+                      bytes(bytearray.fromhex('e2801160600002')) +
+                      struct.pack('!HHB', 334, 5, 1), rospec)
@@ -0,0 +1,89 @@
+from __future__ import unicode_literals
+import random
+import unittest
+
+from twisted.internet import task
+
+from sllurp.stream.merge import ReportMerger
+
+
+def tag(epc, when):
+    return {'EPC-96': epc, 'LastSeenTimestampUTC': (int(when * 1e6),)}
+
+
+def when(read):
+    return read[1]['LastSeenTimestampUTC'][0]
+
+
+class TestReportMerger(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.clock.advance(1000)
+        self.out = []
+        self.merger = ReportMerger(lateness=0.5, on_tags=self.out.extend,
+                                   clock=self.clock)
+        self.merger.start()
+
+    def test_random_interleaving(self):
+        rnd = random.Random(5)
+        readers = [('10.0.0.{}'.format(i), 5084) for i in range(5)]
+        # each reader reports every 20-100 ms; reports reach us after 0-300 ms
+        arrivals = []
+        for reader in readers:
+            t = 1000.0
+            arrival = t
+            while t < 1010:
+                tags = []
+                for _ in range(rnd.randrange(1, 10)):
+                    t += rnd.uniform(0, 0.02)
+                    tags.append(tag(b'%04x' % rnd.randrange(100), t))
+                # one connection delivers reports in order
+                arrival = max(arrival, t + rnd.uniform(0, 0.3))
+                arrivals.append((arrival, reader, tags))
+                t += rnd.uniform(0.02, 0.1)
+        arrivals.sort(key=lambda a: a[0])
+        total = sum(len(a[2]) for a in arrivals)
+
+        for at, reader, tags in arrivals:
+            self.clock.advance(at - self.clock.seconds())
+            self.merger.addReads(reader, tags)
+            self.assertLessEqual(len(self.merger), total)
+        self.clock.advance(1)
+        self.assertEqual(len(self.merger), 0)
+        self.assertEqual(len(self.out), total)
+        self.assertEqual(self.merger.late, 0)
+        stamps = [when(r) for r in self.out]
+        self.assertEqual(stamps, sorted(stamps))
+
+    def test_every_reader_ahead(self):
+        self.merger.addReads('a', [tag(b'01', 1000.0)])
+        self.merger.addReads('b', [tag(b'00', 999.9)])
+        self.clock.advance(0.5)
+        self.assertEqual(len(self.out), 2)
+
+        # released as soon as the other reader has caught up
+        self.merger.addReads('a', [tag(b'02', 1001.0)])
+        self.merger.addReads('b', [tag(b'03', 1000.9)])
+        self.assertEqual([r[1]['EPC-96'] for r in self.out],
+                         [b'00', b'01', b'03'])
+        self.merger.addReads('b', [tag(b'04', 1001.1)])
+        self.assertEqual([r[1]['EPC-96'] for r in self.out],
+                         [b'00', b'01', b'03', b'02'])
+
+    def test_late_arrivals(self):
+        self.merger.addReads('a', [tag(b'01', 1000.0)])
+        self.assertEqual(self.out, [])
+        self.clock.advance(0.5)
+        self.assertEqual([r[0] for r in self.out], ['a'])
+
+        self.merger.addReads('b', [tag(b'02', 999.8), tag(b'03', 1000.2)])
+        self.assertEqual(self.merger.late, 1)
+        self.assertEqual(dict(self.merger.late_by_reader), {'b': 1})
+        self.assertEqual([r[1]['EPC-96'] for r in self.out], [b'01', b'02'])
+
+        self.merger.drop_late = True
+        self.merger.addReads('c', [tag(b'04', 999.9)])
+        self.assertEqual(self.merger.late, 2)
+        self.merger.stop()
+        self.assertEqual([r[1]['EPC-96'] for r in self.out],
+                         [b'01', b'02', b'03'])
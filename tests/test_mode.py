@@ -0,0 +1,105 @@
+from __future__ import division, unicode_literals
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from twisted.internet import task
+
+from sllurp.llrp import LLRPMessage
+from sllurp.tuning.mode import ModeBenchmark, ModeCache, \
+    capability_fingerprint, mode_table
+from sim_reader import CAPS_FILE, FakeClient
+
+# distinct EPCs and reads per report, by mode
+PERFORMANCE = {2: (10, 20), 3: (30, 60), 1000: (30, 90)}
+
+
+def load_capabilities():
+    with open(CAPS_FILE, 'rb') as capsfile:
+        lmsg = LLRPMessage(msgbytes=capsfile.read())
+    return lmsg.msgdict['GET_READER_CAPABILITIES_RESPONSE']
+
+
+class ModeClient(FakeClient):
+    def __init__(self, capabilities):
+        FakeClient.__init__(self, capabilities=capabilities,
+                            mode_identifier=None)
+
+    def report(self):
+        unique, reads = PERFORMANCE[self.mode_identifier]
+        tags = [{'EPC-96': '{:024x}'.format(i).encode('ascii'),
+                 'TagSeenCount': (reads // unique,)} for i in range(unique)]
+        self.send_report(tags)
+
+
+class TestModeBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.capabilities = load_capabilities()
+        self.clock = task.Clock()
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.tmpdir, 'sub', 'modes.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def benchmark(self, proto, **kwargs):
+        bench = ModeBenchmark(proto, round_time=10, settle=2,
+                              clock=self.clock, **kwargs)
+        chosen = []
+        bench.run().addCallback(chosen.append)
+        for _ in bench.candidates():
+            if chosen:
+                break
+            self.clock.advance(1)
+            proto.report()  # settling: not counted
+            self.clock.advance(1)
+            for _ in range(10):
+                proto.report()
+                self.clock.advance(1)
+        return bench, chosen
+
+    def test_fingerprint(self):
+        self.assertEqual([mode['ModeIdentifier'] for mode in
+                          mode_table(self.capabilities)][:3], [2, 3, 1000])
+        fingerprint = capability_fingerprint(self.capabilities)
+        self.assertEqual(fingerprint,
+                         capability_fingerprint(load_capabilities()))
+        self.capabilities['GeneralDeviceCapabilities'][
+            'ReaderFirmwareVersion'] = b'5.0.0.0'
+        self.assertNotEqual(fingerprint,
+                            capability_fingerprint(self.capabilities))
+
+    def test_benchmark(self):
+        proto = ModeClient(self.capabilities)
+        bench, chosen = self.benchmark(proto, modes=[2, 3, 1000],
+                                       cache=ModeCache(self.cache_path))
+        self.assertEqual(chosen, [1000])
+        self.assertEqual(proto.mode_identifier, 1000)
+        self.assertEqual([tuple(r) for r in bench.results],
+                         [(2, 1.0, 20.0), (3, 3.0, 60.0),
+                          (1000, 3.0, 90.0)])
+
+        with open(self.cache_path) as cachefile:
+            cached = json.load(cachefile)
+        fingerprint = capability_fingerprint(self.capabilities)
+        self.assertEqual(cached['10.0.0.1'][fingerprint]['best'], 1000)
+
+        # cached: pinned straight away
+        proto = ModeClient(self.capabilities)
+        bench = ModeBenchmark(proto, cache=ModeCache(self.cache_path),
+                              clock=self.clock)
+        chosen = []
+        bench.run().addCallback(chosen.append)
+        self.assertEqual(chosen, [1000])
+        self.assertEqual(proto.reconfigured, [{'mode_identifier': 1000}])
+        self.assertEqual(bench.results[0], (2, 1.0, 20.0))
+
+    def test_invalid_mode(self):
+        proto = ModeClient(self.capabilities)
+        bench = ModeBenchmark(proto, modes=[2, 7], clock=self.clock)
+        failures = []
+        bench.run().addErrback(failures.append)
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(proto.reconfigured, [])
@@ -0,0 +1,111 @@
+from __future__ import division, unicode_literals
+import math
+import random
+import unittest
+
+import pytest
+
+np = pytest.importorskip('numpy')
+from sllurp.stream.phase import (PhaseTracker, channel_frequencies,  # noqa
+                                 APPROACHING, RECEDING, SPEED_OF_LIGHT)
+
+FREQS = {1: 902750e3, 2: 915250e3, 3: 927250e3}
+
+
+def tag(epc, phase, when, channel=1, antenna=1, doppler=None):
+    t = {'EPC-96': epc, 'AntennaID': (antenna,), 'ChannelIndex': (channel,),
+         'LastSeenTimestampUTC': (int(when * 1e6),),
+         'ImpinjPhase': int(round(phase * 4096 / (2 * math.pi))) % 4096}
+    if doppler is not None:
+        t['RFDopplerFrequency'] = int(round(doppler * 16))
+    return t
+
+
+class TestPhaseTracker(unittest.TestCase):
+    def moving_tag(self, speed, rnd):
+        """Reads of a tag moving at `speed`, hopping channels."""
+        offsets = {ch: rnd.uniform(0, 2 * math.pi) for ch in FREQS}
+        reads = []
+        for i in range(600):
+            when = 1000 + i * 0.005
+            channel = 1 + (i // 50) % 3
+            distance = 1 + speed * (when - 1000)
+            lam = SPEED_OF_LIGHT / FREQS[channel]
+            phase = 4 * math.pi * distance / lam + offsets[channel]
+            reads.append((tag(b'aa', phase, when, channel), phase))
+        return reads
+
+    def test_unwrap_and_velocity(self):
+        rnd = random.Random(3)
+        changes = []
+        tracker = PhaseTracker(frequencies=FREQS, on_direction=lambda *a:
+                               changes.append(a))
+        reads = self.moving_tag(1.0, rnd)
+        i = 0
+        while i < len(reads):
+            n = rnd.randrange(1, 40)
+            batch = reads[i:i + n]
+            rnd.shuffle(batch)  # order within a report doesn't matter
+            tracker.addReads('r1', [t for t, _ in batch])
+            i += n
+
+        for dwell in range(0, len(reads), 50):
+            # within a dwell on one channel, the unwrapped phase tracks the
+            # true phase up to a multiple of 2 pi
+            diffs = [t['UnwrappedPhase'] - phase
+                     for t, phase in reads[dwell:dwell + 50]]
+            for d in diffs:
+                self.assertAlmostEqual(d, diffs[0], delta=0.01)
+            self.assertAlmostEqual(
+                (diffs[0] + 0.1) % (2 * math.pi), 0.1, delta=0.01)
+        velocities = [t['RadialVelocity'] for t, _ in reads
+                      if t['RadialVelocity'] is not None]
+        self.assertGreater(len(velocities), 500)
+        self.assertAlmostEqual(np.median(velocities), 1.0, delta=0.05)
+        self.assertAlmostEqual(tracker.getVelocity(b'aa', 'r1', 1), 1.0,
+                               delta=0.1)
+        self.assertEqual(tracker.direction(b'aa', 'r1', 1), RECEDING)
+        self.assertEqual(changes, [(b'aa', 'r1', 1, RECEDING)])
+
+    def test_approaching(self):
+        tracker = PhaseTracker(frequencies=FREQS)
+        reads = self.moving_tag(-0.5, random.Random(4))
+        tracker.addReads('r1', [t for t, _ in reads])
+        self.assertAlmostEqual(tracker.getVelocity(b'aa', 'r1', 1), -0.5,
+                               delta=0.05)
+        self.assertEqual(tracker.direction(b'aa', 'r1', 1), APPROACHING)
+
+    def test_doppler_fallback(self):
+        tracker = PhaseTracker(frequencies=FREQS)
+        # too far apart to unwrap; only the Doppler shift gives a velocity
+        reads = [tag(b'bb', 0, 1000, doppler=-12.5),
+                 tag(b'bb', 1, 1001, doppler=-12.5)]
+        v = tracker.addReads('r1', reads)
+        expected = SPEED_OF_LIGHT / FREQS[1] * 12.5 / 2
+        self.assertTrue(np.allclose(v, expected))
+        self.assertAlmostEqual(reads[1]['UnwrappedPhase'],
+                               reads[1]['ImpinjPhase'] * 2 * math.pi / 4096)
+        v = tracker.addReads('r1', [tag(b'cc', 0, 1002)])
+        self.assertTrue(np.isnan(v[0]))
+        self.assertIsNone(tracker.getVelocity(b'cc', 'r1', 1))
+
+    def test_forget(self):
+        tracker = PhaseTracker()
+        tracker.addReads('r1', [tag(b'aa', 0, 1000),
+                                tag(b'bb', 0, 1000, antenna=2)])
+        tracker.addReads('r1', [tag(b'bb', 0.1, 1005, antenna=2)])
+        tracker.forget(1001)
+        self.assertEqual(len(tracker), 1)
+        self.assertEqual(list(tracker.cells), [(b'bb', 'r1', 2, 1)])
+        tracker.addReads('r1', [tag(b'bb', 0.2, 1005.01, antenna=2)])
+        self.assertIsNotNone(tracker.getVelocity(b'bb', 'r1', 2))
+
+    def test_channel_frequencies(self):
+        caps = {'RegulatoryCapabilities': {'UHFBandCapabilities': {
+            'FrequencyInformation': {
+                'Hopping': True,
+                'FrequencyHopTable0': {'HopTableId': 1, 'NumHops': 2,
+                                       'Frequency1': 902750,
+                                       'Frequency2': 903250}}}}}
+        self.assertEqual(channel_frequencies(caps),
+                         {1: 902750e3, 2: 903250e3})
@@ -0,0 +1,136 @@
+from __future__ import unicode_literals
+import logging
+
+from twisted.internet import reactor, defer, task
+from twisted.trial import unittest
+
+from sllurp.llrp import LLRPClient, LLRPClientFactory
+from sllurp.tuning.population import PopulationTuner
+from sim_reader import SimReaderFactory, ro_access_report, tag_report_data, \
+    wait
+
+logging.getLogger('sllurp').setLevel(logging.WARNING)
+
+
+def populations(proto):
+    antconfs = proto.rospec['ROSpec']['AISpec']['InventoryParameterSpec'][
+        'AntennaConfiguration']
+    return {conf['AntennaID']: conf['C1G2InventoryCommand'][
+        'C1G2SingulationControl']['TagPopulation'] for conf in antconfs}
+
+
+class TestPopulationTuner(unittest.TestCase):
+    timeout = 30
+
+    def setUp(self):
+        self.sim = SimReaderFactory()
+        self.port = reactor.listenTCP(0, self.sim, interface='127.0.0.1')
+        self.factory = LLRPClientFactory(antennas=(1, 2), tag_population=4)
+        self.reads = 0
+        self.factory.addTagReportCallback(self.gotReport)
+        self.clock = task.Clock()
+
+    def gotReport(self, lmsg):
+        self.reads += len(lmsg.msgdict['RO_ACCESS_REPORT']['TagReportData'])
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        for reader in list(self.sim.readers):
+            reader.transport.loseConnection()
+        yield self.port.stopListening()
+        while self.factory.protocols or self.sim.readers:
+            yield wait()
+
+    @defer.inlineCallbacks
+    def inventorying(self):
+        while not self.factory.protocols or \
+                self.factory.protocols[0].state != \
+                LLRPClient.STATE_INVENTORYING:
+            yield wait()
+        defer.returnValue(self.factory.protocols[0])
+
+    @defer.inlineCallbacks
+    def report(self, antenna, epcs):
+        expected = self.reads + len(epcs)
+        self.sim.readers[0].send(ro_access_report(
+            [tag_report_data('{:024x}'.format(i), antenna=antenna)
+             for i in epcs]))
+        while self.reads < expected:
+            yield wait()
+
+    @defer.inlineCallbacks
+    def test_tune(self):
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port,
+                           self.factory)
+        proto = yield self.inventorying()
+        changes = []
+        tuner = PopulationTuner(proto, interval=5, min_interval=30,
+                                on_change=changes.append, clock=self.clock)
+        self.assertEqual(populations(proto), {1: 4, 2: 4})
+
+        yield self.report(1, range(2000))
+        yield self.report(2, range(3))
+        self.clock.advance(5)
+        tuner.tick()
+        del self.sim.received[:]
+        proto = yield self.inventorying()
+        self.assertIn(20, self.sim.received)  # ADD_ROSPEC
+        self.assertEqual(populations(proto), {1: 2000, 2: 4})
+
+        # throughput after the change is recorded
+        yield self.report(1, range(1000))
+        self.clock.advance(5)
+        tuner.tick()
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0].settings,
+                         {'tag_population': {1: 2000, 2: 4}})
+        self.assertEqual(changes[0].before, 2003 / 5)
+        self.assertEqual(changes[0].after, 1000 / 5)
+        self.assertEqual(tuner.history, changes)
+
+        # within the band: nothing to do
+        self.clock.advance(60)
+        yield self.report(1, range(1500))
+        tuner.tick()
+        self.assertIsNone(tuner._pending)
+
+        # the population shrinks
+        self.clock.advance(31)
+        yield self.report(1, range(100))
+        tuner.tick()
+        proto = yield self.inventorying()
+        self.assertEqual(populations(proto), {1: 100, 2: 4})
+
+    @defer.inlineCallbacks
+    def test_attach_dropped_connection(self):
+        tuners = PopulationTuner.attach(self.factory, clock=self.clock)
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port,
+                           self.factory)
+        proto = yield self.inventorying()
+        tuner = tuners[proto]
+        self.assertTrue(tuner._ticker.running)
+
+        # the reader goes away without a polite goodbye
+        self.sim.readers[0].transport.loseConnection()
+        while self.factory.protocols:
+            yield wait()
+        self.assertEqual(proto.state, LLRPClient.STATE_INVENTORYING)
+        self.assertEqual(tuners, {})
+        self.assertFalse(tuner._ticker.running)
+        tuner.tick()  # a late tick leaves the closed connection alone
+        self.assertEqual(len(tuner.rates), 0)
+
+    @defer.inlineCallbacks
+    def test_stop(self):
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port,
+                           self.factory)
+        proto = yield self.inventorying()
+        tuner = PopulationTuner(proto, clock=self.clock)
+        yield self.report(1, range(3))
+        self.assertEqual(tuner._reads, 3)
+
+        tuner.stop()
+        yield self.report(1, range(3, 10))
+        self.assertEqual(tuner._reads, 3)
+        self.assertNotIn(tuner.tag_cb,
+                         proto._message_callbacks['RO_ACCESS_REPORT'])
@@ -0,0 +1,73 @@
+from __future__ import division, unicode_literals
+import unittest
+
+from twisted.internet import task
+
+from sllurp.tuning.power import PowerTuner
+from sim_reader import FakeClient
+
+# index -> dBm
+TX_POWER_TABLE = [0] + [10 + 0.5 * i for i in range(40)]
+
+
+class PowerClient(FakeClient):
+    tx_power_table = TX_POWER_TABLE
+
+    def __init__(self, tx_power):
+        FakeClient.__init__(self, antennas=(1, 2), tx_power=tx_power)
+
+    def report(self):
+        """Each antenna has 50 tags; above index 28 it reads its neighbour's.
+
+        Own tags are read 3 times each, other zones' tags once.
+        """
+        top = len(self.tx_power_table) - 1
+        tags = []
+        for antenna, other in ((1, 2), (2, 1)):
+            index = self.tx_power[antenna] or top
+            for i in range(min(50, 2 * index)):
+                tags.append(tag(antenna, antenna * 100 + i, 3))
+            for i in range(max(0, index - 28)):
+                tags.append(tag(antenna, other * 100 + i, 1))
+        self.send_report(tags)
+
+
+def tag(antenna, epc, count):
+    return {'EPC-96': '{:024x}'.format(epc).encode('ascii'),
+            'AntennaID': (antenna,), 'TagSeenCount': (count,)}
+
+
+class TestPowerTuner(unittest.TestCase):
+    def test_search(self):
+        clock = task.Clock()
+        proto = PowerClient({1: 0, 2: 10})
+        done = []
+        tuner = PowerTuner(proto, interval=5, min_interval=10,
+                           on_done=done.append, clock=clock)
+        for _ in range(200):
+            if done:
+                break
+            proto.report()
+            clock.advance(5)
+            tuner.tick()
+
+        # the lowest power that reads all of its own zone
+        self.assertEqual(done, [{1: 25, 2: 25}])
+        self.assertEqual(tuner.final, {1: 25, 2: 25})
+        self.assertEqual(proto.tx_power, {1: 25, 2: 25})
+
+        trials = [t for t in tuner.trials if t.antenna == 1]
+        self.assertEqual(trials[0].index, 40)
+        self.assertEqual(trials[0].dbm, 29.5)
+        self.assertAlmostEqual(trials[0].foreign, 12 / (150 + 12))
+        self.assertEqual(trials[0].unique, 50)
+        self.assertEqual(trials[1].index, 32)
+        self.assertEqual(len(tuner.history), len(proto.reconfigured) - 1)
+
+        # nothing more to do
+        changes = len(proto.reconfigured)
+        for _ in range(10):
+            proto.report()
+            clock.advance(5)
+            tuner.tick()
+        self.assertEqual(len(proto.reconfigured), changes)
@@ -0,0 +1,81 @@
+from __future__ import unicode_literals
+import random
+import unittest
+
+from twisted.internet import task
+
+from sllurp.stream.presence import PresenceTracker, TimerWheel
+
+
+def tag(epc, antenna=1):
+    return {'EPC-96': epc, 'AntennaID': (antenna,)}
+
+
+class TestTimerWheel(unittest.TestCase):
+    def test_against_naive(self):
+        """Timers expire on the tick they were last scheduled for."""
+        rnd = random.Random(42)
+        wheel = TimerWheel(resolution=1, slot_bits=4, levels=3)
+        deadlines = {}
+        expired_at = {}
+        for tick in range(1, 6000):
+            for _ in range(rnd.randrange(4)):
+                key = rnd.randrange(300)
+                when = tick + rnd.choice((1, 5, 20, 200, 3000, 10000))
+                wheel.schedule(key, when)
+                deadlines[key] = when
+                if rnd.random() < 0.02:
+                    wheel.cancel(key)
+                    del deadlines[key]
+            for key, _ in wheel.advance(tick):
+                expired_at[key] = tick
+                self.assertEqual(deadlines.pop(key), tick)
+            self.assertFalse([k for k, d in deadlines.items() if d <= tick])
+        self.assertEqual(len(wheel), len(deadlines))
+        self.assertTrue(expired_at)
+
+
+class TestPresenceTracker(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.events = []
+        self.tracker = PresenceTracker(
+            zones={'dock': [1, 2], 'door': [('10.0.0.2', 1)]},
+            departure_timeout=5, zone_timeouts={'door': 1},
+            on_arrival=lambda *ev: self.events.append(('arrive',) + ev),
+            on_departure=lambda *ev: self.events.append(('depart',) + ev),
+            clock=self.clock)
+        self.tracker.start()
+
+    def tearDown(self):
+        self.tracker.stop()
+
+    def test_arrival_departure(self):
+        self.tracker.addReads('10.0.0.1', [tag(b'aa', 1), tag(b'aa', 2)])
+        self.tracker.addReads('10.0.0.2', [tag(b'aa', 1), tag(b'bb', 3)])
+        self.assertEqual(self.events, [
+            ('arrive', b'aa', 'dock', 0),
+            ('arrive', b'aa', 'door', 0),
+            ('arrive', b'bb', ('10.0.0.2', 3), 0),
+        ])
+        del self.events[:]
+
+        # reads keep the tag present in the dock
+        for _ in range(8):
+            self.clock.advance(1)
+            self.tracker.addReads('10.0.0.1', [tag(b'aa', 2)])
+        self.assertEqual(self.events, [('depart', b'aa', 'door', 0),
+                                       ('depart', b'bb', ('10.0.0.2', 3), 0)])
+        self.assertEqual(self.tracker.present('dock'), [b'aa'])
+
+        self.clock.pump([0.1] * 60)
+        self.assertEqual(self.events[-1], ('depart', b'aa', 'dock', 8))
+        self.assertEqual(len(self.tracker), 0)
+
+    def test_many_tags(self):
+        epcs = [('{:024x}'.format(i)).encode() for i in range(100000)]
+        self.tracker.addReads('10.0.0.1', [tag(epc) for epc in epcs])
+        self.assertEqual(len(self.tracker), 100000)
+        self.clock.pump([0.1] * 51)
+        self.assertEqual(len(self.tracker), 0)
+        self.assertEqual(len(self.events), 200000)
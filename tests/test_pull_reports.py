@@ -0,0 +1,66 @@
+from __future__ import unicode_literals
+import logging
+
+from twisted.internet import reactor, defer
+from twisted.trial import unittest
+
+from sllurp.llrp import LLRPClient, LLRPClientFactory
+from sim_reader import SimReaderFactory, ro_access_report, tag_report_data, \
+    wait
+
+logging.getLogger('sllurp').setLevel(logging.WARNING)
+
+NUM_TAGS = 20000
+
+
+class TestPullReports(unittest.TestCase):
+    timeout = 30
+
+    def setUp(self):
+        self.sim = SimReaderFactory()
+        self.port = reactor.listenTCP(0, self.sim, interface='127.0.0.1')
+        self.factory = LLRPClientFactory(report_pull_interval=0.02)
+        self.epcs = []
+        self.factory.addTagReportCallback(self.gotReport)
+
+    def gotReport(self, lmsg):
+        for tag in lmsg.msgdict['RO_ACCESS_REPORT']['TagReportData']:
+            self.epcs.append(int(tag['EPC-96'], 16))
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        for reader in list(self.sim.readers):
+            reader.transport.loseConnection()
+        yield self.port.stopListening()
+        while self.factory.protocols or self.sim.readers:
+            yield wait()
+
+    @defer.inlineCallbacks
+    def test_pull(self):
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port,
+                           self.factory)
+        while not self.factory.protocols or \
+                self.factory.protocols[0].state != \
+                LLRPClient.STATE_INVENTORYING:
+            yield wait()
+        proto = self.factory.protocols[0]
+        self.assertEqual(proto.rospec['ROSpec']['ROReportSpec']
+                         ['ROReportTrigger'], 'None')
+
+        # one big buffered report, as a reader would send after a while
+        self.sim.held_reports = [ro_access_report(
+            [tag_report_data('{:024x}'.format(i))
+             for i in range(NUM_TAGS)])]
+        while len(self.epcs) < NUM_TAGS:
+            yield wait()
+        self.assertEqual(self.epcs, list(range(NUM_TAGS)))
+        self.assertIn(60, self.sim.received)  # GET_REPORT
+
+        # stopping collects what's still buffered
+        self.sim.held_reports = [ro_access_report([tag_report_data(
+            '{:024x}'.format(NUM_TAGS))])]
+        proto._report_puller.stop()
+        proto._report_puller.start(3600, now=False)
+        yield proto.stopPolitely()
+        self.assertEqual(len(self.epcs), NUM_TAGS + 1)
+        self.assertFalse(proto._report_puller.running)
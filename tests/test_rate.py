@@ -0,0 +1,51 @@
+from __future__ import division, unicode_literals
+import random
+import unittest
+
+from sllurp.stream.rate import ReadRates
+
+
+def tag(epc, antenna, channel, count=1):
+    return {'EPC-96': epc, 'AntennaID': (antenna,), 'ChannelIndex': (channel,),
+            'TagSeenCount': (count,)}
+
+
+class TestReadRates(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rnd = random.Random(9)
+        rates = ReadRates(window=5)
+        reads = []
+        now = 1000.0
+        for _ in range(3000):
+            now += rnd.uniform(0, 0.01)
+            reader = rnd.choice(['r1', 'r2'])
+            t = tag(b'%02x' % rnd.randrange(30), rnd.randrange(1, 3),
+                    rnd.randrange(1, 4), rnd.randrange(1, 3))
+            rates.addReads(reader, [t], now=now)
+            reads.append((int(now), reader, t))
+
+        def expected(match):
+            end = int(now)
+            window = [(s, r, t) for s, r, t in reads
+                      if end - 5 <= s < end and match(r, t)]
+            total = sum(t['TagSeenCount'][0] for _, _, t in window)
+            unique = len(set((s, t['EPC-96']) for s, _, t in window))
+            return total / 5, unique / 5
+
+        self.assertEqual(rates.rate(now=now), expected(lambda r, t: True))
+        snap = rates.snapshot('antenna', now=now)
+        self.assertEqual(len(snap), 4)
+        self.assertEqual(snap[('r2', 1)], expected(
+            lambda r, t: r == 'r2' and t['AntennaID'] == (1,)))
+        self.assertEqual(rates.rate(('r1', 2, 3), now=now), expected(
+            lambda r, t: r == 'r1' and t['AntennaID'] == (2,) and
+            t['ChannelIndex'] == (3,)))
+        self.assertEqual(sorted(rates.snapshot('reader', now=now)),
+                         [('r1',), ('r2',)])
+
+    def test_idle(self):
+        rates = ReadRates(window=3)
+        rates.addReads('r1', [tag(b'aa', 1, 1)], now=100.5)
+        self.assertEqual(rates.rate(('r1',), now=101.0), (1 / 3, 1 / 3))
+        self.assertEqual(rates.rate(('r1',), now=104.0), (0.0, 0.0))
+        self.assertEqual(rates.rate(('r9',), now=104.0), (0.0, 0.0))
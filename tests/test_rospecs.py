@@ -0,0 +1,131 @@
+from __future__ import unicode_literals
+import logging
+
+from twisted.internet import reactor, defer
+from twisted.trial import unittest
+
+from sllurp.llrp import LLRPClient, LLRPClientFactory
+from sllurp.llrp_errors import LLRPError, ReaderConfigurationError
+from sllurp.stream.tags import tag_epc, tags_by_rospec
+from sim_reader import SimReaderFactory, ro_access_report, tag_report_data, \
+    wait
+
+logging.getLogger('sllurp').setLevel(logging.WARNING)
+
+ADD_ROSPEC, DELETE_ROSPEC, ENABLE_ROSPEC = 20, 21, 24
+
+
+class TestMultipleROSpecs(unittest.TestCase):
+    timeout = 30
+
+    def setUp(self):
+        self.sim = SimReaderFactory()
+        self.port = reactor.listenTCP(0, self.sim, interface='127.0.0.1')
+        # a conveyor on antenna 2 takes precedence over shelves on antenna 1
+        self.factory = LLRPClientFactory(
+            antennas=(1,), rospec_priority=7,
+            extra_rospecs={2: {'priority': 0, 'antennas': (2,),
+                               'duration': 0.5, 'session': 0}})
+        self.reports = []
+        self.factory.addTagReportCallback(self.reports.append)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        for reader in list(self.sim.readers):
+            reader.transport.loseConnection()
+        yield self.port.stopListening()
+        while self.factory.protocols or self.sim.readers:
+            yield wait()
+
+    @defer.inlineCallbacks
+    def inventorying(self):
+        while not self.factory.protocols or \
+                self.factory.protocols[0].state != \
+                LLRPClient.STATE_INVENTORYING:
+            yield wait()
+        defer.returnValue(self.factory.protocols[0])
+
+    @defer.inlineCallbacks
+    def test_rospecs(self):
+        reactor.connectTCP('127.0.0.1', self.port.getHost().port,
+                           self.factory)
+        proto = yield self.inventorying()
+        self.assertEqual(self.sim.received.count(ADD_ROSPEC), 2)
+        self.assertEqual(self.sim.received.count(ENABLE_ROSPEC), 2)
+        self.assertEqual(sorted(proto.rospecs), [1, 2])
+        main, conveyor = proto.rospecs[1]['ROSpec'], proto.rospecs[2]['ROSpec']
+        self.assertEqual((main['ROSpecID'], main['Priority']), (1, 7))
+        self.assertEqual((conveyor['ROSpecID'], conveyor['Priority']), (2, 0))
+        self.assertEqual(conveyor['AISpec']['AntennaIDs'], (2,))
+        self.assertEqual(conveyor['ROBoundarySpec']['ROSpecStopTrigger'][
+            'DurationTriggerValue'], 500)
+        self.assertEqual(main['ROBoundarySpec']['ROSpecStopTrigger'][
+            'ROSpecStopTriggerType'], 'Null')
+
+        # reports are attributed by ROSpecID
+        self.sim.readers[0].send(ro_access_report([
+            tag_report_data('{:024x}'.format(1), antenna=1, rospec_id=1),
+            tag_report_data('{:024x}'.format(2), antenna=2, rospec_id=2),
+            tag_report_data('{:024x}'.format(3), antenna=2, rospec_id=2)]))
+        while not self.reports:
+            yield wait()
+        groups = tags_by_rospec(self.reports[0])
+        self.assertEqual(sorted(groups), [1, 2])
+        self.assertEqual([tag_epc(tag) for tag in groups[2]],
+                         [b'000000000000000000000002',
+                          b'000000000000000000000003'])
+
+        # ROSpecs can come and go while inventorying
+        started = []
+        self.factory.addStateCallback(LLRPClient.STATE_INVENTORYING,
+                                      started.append)
+        yield proto.addROSpec(3, priority=3, antennas=(1,), duration=1)
+        self.assertEqual(proto.state, LLRPClient.STATE_INVENTORYING)
+        self.assertEqual(started, [])
+        self.assertEqual(self.sim.received.count(ADD_ROSPEC), 3)
+        self.assertEqual(sorted(proto.rospecs), [1, 2, 3])
+        self.assertRaises(LLRPError, proto.addROSpec, 3)
+
+        yield proto.removeROSpec(3)
+        self.assertEqual(proto.state, LLRPClient.STATE_INVENTORYING)
+        self.assertEqual(self.sim.received.count(DELETE_ROSPEC), 2)
+        self.assertEqual(sorted(proto.rospecs), [1, 2])
+
+        # pausing disables every ROSpec, not just the main one
+        yield proto.pause()
+        self.assertEqual(proto.state, LLRPClient.STATE_PAUSED)
+        self.assertEqual({i: r[9] for i, r in self.sim.rospecs.items()},
+                         {1: 0, 2: 0})
+        yield proto.resume()
+        self.assertEqual(proto.state, LLRPClient.STATE_INVENTORYING)
+        self.assertEqual({i: r[9] for i, r in self.sim.rospecs.items()},
+                         {1: 2, 2: 2})
+
+        # one the reader refuses is forgotten, and inventory carries on
+        self.sim.failing.add(ADD_ROSPEC)
+        yield proto.addROSpec(4, priority=3, antennas=(1,), duration=1)
+        self.sim.failing.clear()
+        self.assertEqual(proto.state, LLRPClient.STATE_INVENTORYING)
+        self.assertEqual(sorted(proto.rospecs), [1, 2])
+        self.assertEqual(sorted(proto.extra_rospecs), [2])
+        self.assertEqual(self.sim.received.count(ENABLE_ROSPEC), 4)
+        self.assertEqual(started, [])
+
+        # all of them are rebuilt when settings change
+        del self.sim.received[:]
+        proto.reconfigure(session=1)
+        proto = yield self.inventorying()
+        self.assertEqual(self.sim.received.count(ADD_ROSPEC), 2)
+        self.assertEqual(proto.rospecs[1]['ROSpec']['AISpec'][
+            'InventoryParameterSpec']['AntennaConfiguration'][0][
+            'C1G2InventoryCommand']['C1G2SingulationControl']['Session'], 1)
+        self.assertEqual(proto.rospecs[2]['ROSpec']['AISpec'][
+            'InventoryParameterSpec']['AntennaConfiguration'][0][
+            'C1G2InventoryCommand']['C1G2SingulationControl']['Session'], 0)
+
+        # settings the reader can't take are rolled back
+        mode = proto.mode_identifier
+        self.assertRaises(ReaderConfigurationError, proto.reconfigure,
+                          session=2, mode_identifier=12345)
+        self.assertEqual((proto.session, proto.mode_identifier), (1, mode))
+        self.assertEqual(proto.state, LLRPClient.STATE_INVENTORYING)
@@ -0,0 +1,70 @@
+from __future__ import division, unicode_literals
+import math
+import random
+import unittest
+
+import pytest
+
+np = pytest.importorskip('numpy')
+from sllurp.stream.rssi import SignalTracker  # noqa: E402
+
+
+def tag(epc, antenna, rssi=None, impinj_rssi=None, count=1):
+    t = {'EPC-96': epc, 'AntennaID': (antenna,), 'TagSeenCount': (count,)}
+    if rssi is not None:
+        t['PeakRSSI'] = (rssi,)
+    if impinj_rssi is not None:
+        t['ImpinjPeakRSSI'] = impinj_rssi
+    return t
+
+
+class TestSignalTracker(unittest.TestCase):
+    def test_matches_sequential_ewma(self):
+        rnd = random.Random(1)
+        alpha = 0.3
+        tracker = SignalTracker(capacity=64, alpha=alpha, antennas=2)
+        expected = {}
+        for batch in range(50):
+            tags = []
+            for _ in range(rnd.randrange(1, 40)):
+                epc = b'%02x' % rnd.randrange(20)
+                ant = rnd.randrange(1, 5)
+                rssi = rnd.randrange(-80, -30)
+                tags.append(tag(epc, ant, rssi))
+                key = (epc, ant)
+                if key in expected:
+                    expected[key] = (1 - alpha) * expected[key] + \
+                        alpha * rssi
+                else:
+                    expected[key] = rssi
+            tracker.addReads('r1', tags, now=1000 + batch)
+        for (epc, ant), value in expected.items():
+            rssi, _ = tracker.get(epc, 'r1', ant, now=1049)
+            self.assertAlmostEqual(rssi, value)
+        self.assertEqual(len(tracker.antennas), 4)
+
+    def test_rate_and_impinj_rssi(self):
+        tracker = SignalTracker(rate_time_constant=2.0)
+        tracker.addReads('r1', [tag(b'aa', 1, -60, impinj_rssi=-6150,
+                                    count=4)], now=100)
+        rssi, rate = tracker.get(b'aa', 'r1', 1, now=100)
+        self.assertEqual(rssi, -61.5)
+        self.assertAlmostEqual(rate, 2.0)
+        _, rate = tracker.get(b'aa', 'r1', 1, now=102)
+        self.assertAlmostEqual(rate, 2.0 / math.e)
+        self.assertIsNone(tracker.get(b'aa', 'r1', 2))
+        self.assertIsNone(tracker.get(b'bb', 'r1', 1))
+
+        tracker.addReads('r1', [tag(b'aa', 2, -40)], now=103)
+        self.assertEqual(tracker.strongest(b'aa'), ('r1', 2))
+
+    def test_eviction(self):
+        tracker = SignalTracker(capacity=16)
+        for i in range(16):
+            tracker.addReads('r1', [tag(b'%02x' % i, 1, -50)], now=i)
+        tracker.addReads('r1', [tag(b'00', 1, -50), tag(b'ff', 1, -40)],
+                         now=20)
+        self.assertEqual(len(tracker), 15)  # dropped 01 and 02, added ff
+        self.assertIn(b'00', tracker.slots)
+        self.assertNotIn(b'01', tracker.slots)
+        self.assertEqual(tracker.get(b'ff', 'r1', 1, now=20)[0], -40)
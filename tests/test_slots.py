@@ -0,0 +1,122 @@
+from __future__ import division, unicode_literals
+import logging
+
+from twisted.internet import reactor, defer, task
+from twisted.trial import unittest
+
+from sllurp.fleet import FleetManager, SlotCoordinator, plan_slots
+from sllurp.llrp import LLRPClient
+from sim_reader import SimReaderFactory, ro_access_report, tag_report_data, \
+    wait
+
+logging.getLogger('sllurp').setLevel(logging.WARNING)
+
+INVENTORYING = LLRPClient.STATE_INVENTORYING
+PAUSED = LLRPClient.STATE_PAUSED
+
+
+class TestPlanSlots(unittest.TestCase):
+    def test_plan_slots(self):
+        self.assertEqual(plan_slots([]), [])
+        self.assertEqual(plan_slots([['a', 'b', 'c']]), [['a'], ['b'], ['c']])
+        # a ring of four needs two slots
+        slots = plan_slots([['a', 'b'], ['b', 'c'], ['c', 'd'], ['d', 'a']])
+        self.assertEqual(slots, [['a', 'c'], ['b', 'd']])
+
+
+class TestSlotCoordinator(unittest.TestCase):
+    timeout = 30
+
+    def setUp(self):
+        self.sim = SimReaderFactory()
+        self.ports = [reactor.listenTCP(0, self.sim, interface='127.0.0.1')
+                      for _ in range(4)]
+        self.keys = [('127.0.0.1', p.getHost().port) for p in self.ports]
+        self.fleet = FleetManager(connect_interval=0)
+        self.clock = task.Clock()
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        self.fleet.stopTrying()
+        for proto in list(self.fleet.protocols):
+            proto.transport.loseConnection()
+        for reader in list(self.sim.readers):
+            reader.transport.loseConnection()
+        yield defer.gatherResults([p.stopListening() for p in self.ports])
+        while self.fleet.protocols or self.sim.readers:
+            yield wait()
+
+    @defer.inlineCallbacks
+    def settle(self, states):
+        """Wait until each reader is in the given state."""
+        while any(self.fleet.readers[self.keys[i]].state != state
+                  for i, state in enumerate(states)):
+            yield wait()
+
+    def report(self, reader, epcs):
+        port = self.keys[reader][1]
+        sim = [r for r in self.sim.readers
+               if r.transport.getHost().port == port][0]
+        sim.send(ro_access_report([tag_report_data('{:024x}'.format(epc))
+                                   for epc in epcs]))
+
+    @defer.inlineCallbacks
+    def test_rotate(self):
+        yield self.fleet.connectAll('127.0.0.1:{}'.format(key[1])
+                                    for key in self.keys)
+        yield self.settle([INVENTORYING] * 4)
+        # readers 0 and 2 both overlap reader 1; reader 3 is on its own
+        a, b, c, d = self.keys
+        coord = SlotCoordinator(
+            self.fleet, [[a, b], ['127.0.0.1:{}'.format(b[1]), c]],
+            slot=5, clock=self.clock)
+        self.assertEqual(coord.slots, [[b], sorted([a, c])])
+
+        coord.start()
+        yield self.settle([PAUSED, INVENTORYING, PAUSED, INVENTORYING])
+        self.clock.advance(5)
+        yield self.settle([INVENTORYING, PAUSED, INVENTORYING, INVENTORYING])
+        self.clock.advance(5)
+        yield self.settle([PAUSED, INVENTORYING, PAUSED, INVENTORYING])
+        yield coord.stop()
+        self.assertFalse(coord.running)
+        # stop() waits for the paused readers to resume
+        self.assertEqual([self.fleet.readers[key].state for key in self.keys],
+                         [INVENTORYING] * 4)
+
+        # net distinct EPCs per second, free-running and time-sliced
+        result = []
+        coord.compare(duration=10).addCallback(result.append)
+        yield wait(0.1)
+        self.report(0, range(10))
+        self.report(1, range(5, 15))
+        self.report(3, range(100, 105))
+        yield wait(0.1)
+        self.clock.advance(10)
+        yield self.settle([PAUSED, INVENTORYING, PAUSED, INVENTORYING])
+        self.report(1, range(30))
+        self.report(3, range(100, 110))
+        yield wait(0.1)
+        self.clock.advance(5)
+        yield self.settle([INVENTORYING, PAUSED, INVENTORYING, INVENTORYING])
+        self.report(0, range(30, 40))
+        yield wait(0.1)
+        self.clock.advance(5)
+        self.assertEqual(result, [{'free': 2.0, 'sliced': 5.0}])
+        self.assertEqual(coord.comparison, result[0])
+        self.assertTrue(coord.running)
+        coord.stop()
+
+    @defer.inlineCallbacks
+    def test_rotate_pause_failed(self):
+        yield self.fleet.connectAll('127.0.0.1:{}'.format(key[1])
+                                    for key in self.keys)
+        yield self.settle([INVENTORYING] * 4)
+        a, b, c, d = self.keys
+        coord = SlotCoordinator(self.fleet, [[a, b, c]], clock=self.clock)
+
+        # the readers that should be quiet aren't, and rotate() says so
+        self.sim.failing.add(25)  # DISABLE_ROSPEC
+        unpaused = yield coord.rotate()
+        self.assertEqual(unpaused, sorted(coord._members(coord.slots[1:])))
+        yield self.settle([INVENTORYING] * 4)